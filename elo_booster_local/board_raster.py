@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Compositeur raster d'échiquiers
+Cases, teintes et pièces pré-rendues une fois par taille dans un atlas NumPy,
+puis chaque échiquier est assemblé par découpage de tableaux + alpha blending.
+Chaque pièce est rendue sur chaque case avec la transformation exacte de chess.svg
+(même position au sous-pixel près) ; les atlas sont mis en cache (.cache/atlas/)
+"""
+import ctypes, io, re, sys, tempfile, threading, time, zlib
+import numpy as np
+import chess, chess.svg
+from PIL import Image
+from svglib.svglib import svg2rlg
+from reportlab import Version as RL_VERSION
+from reportlab.graphics import renderPM
+from reportlab.graphics.shapes import Drawing, Group, Path
+from reportlab.lib.utils import ImageReader
+from build_cache import DiskCache, content_key
+from display_list import source_key
+
+SQUARE_COLORS = {"square light": "#F0D9B5", "square dark": "#B58863"}
+SVG_DPI = 150        # même résolution que le rendu svglib/renderPM historique
+SVG_PX = 0.75        # svglib convertit les px SVG en points
+ATLAS_KEY = source_key('board_raster.py')
+CURVE_STEPS = 16     # segments par courbe : moins d'un dixième de pixel d'écart à la taille d'une case
+
+# libart (renderPM) perturbe les sommets des tracés avec rand() de la libc : sans graine fixe,
+# un rendu dépend de tous ceux qui l'ont précédé dans le processus
+try:
+    _libc = ctypes.CDLL(None)
+    _libc.srand
+except (OSError, TypeError, AttributeError):
+    _libc = None
+_render_lock = threading.Lock()
+
+
+def _rgb(color):
+    color = color.lstrip('#')
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4)), (int(color[6:8], 16) if len(color) == 8 else 255)
+
+
+def _flatten(node, steps=CURVE_STEPS):
+    """Courbes de Bézier remplacées par des segments : aplaties par libart, certaines courbes
+    des pièces (points de contrôle confondus) font fuir le remplissage jusqu'au bord du canvas"""
+    for child in getattr(node, 'contents', ()):
+        if not isinstance(child, Path):
+            _flatten(child, steps)
+            continue
+        points, operators, i, x0, y0 = [], [], 0, 0, 0
+        for op in child.operators:
+            if op == 2:                      # curveTo
+                x1, y1, x2, y2, x3, y3 = child.points[i:i + 6]
+                for t in (n / steps for n in range(1, steps + 1)):
+                    u = 1 - t
+                    x = u * u * u * x0 + 3 * u * t * (u * x1 + t * x2) + t * t * t * x3
+                    y = u * u * u * y0 + 3 * u * t * (u * y1 + t * y2) + t * t * t * y3
+                    if (x, y) != tuple(points[-2:]):
+                        points += [x, y]
+                        operators.append(1)
+                x0, y0 = x3, y3
+                i += 6
+            elif op == 3:                    # closePath
+                operators.append(3)
+            else:                            # moveTo, lineTo
+                x0, y0 = child.points[i:i + 2]
+                points += [x0, y0]
+                operators.append(op)
+                i += 2
+        child.points, child.operators = points, operators
+
+
+def render_drawing(drawing, bg=0xFFFFFF, dpi=SVG_DPI):
+    """Rendu renderPM reproductible : courbes aplaties, même graine pour chaque appel, un
+    rendu à la fois"""
+    _flatten(drawing)
+    with _render_lock:
+        if _libc is not None:
+            _libc.srand(1)
+        return np.asarray(renderPM.drawToPIL(drawing, dpi=dpi, bg=bg), dtype=np.uint8)[..., :3]
+
+
+def _fit(pixels, h, w, bg):
+    out = np.full((h, w, 3), bg & 0xFF, np.uint8)
+    h, w = min(h, pixels.shape[0]), min(w, pixels.shape[1])
+    out[:h, :w] = pixels[:h, :w]
+    return out
+
+
+class BoardAtlas:
+    """Atlas d'une taille d'échiquier : fond (marges + coordonnées), cases et sprites des pièces.
+    sprites[symbole] : pièce prémultipliée et 255 - alpha à la taille de l'échiquier, une par case"""
+
+    def __init__(self, size, coordinates, cache=None):
+        empty = chess.svg.board(chess.Board(None), size=size, coordinates=coordinates, colors=SQUARE_COLORS)
+        viewbox = float(re.search(r'viewBox="0 0 ([\d.]+)', empty).group(1))
+        self.px = round(size * SVG_PX * SVG_DPI / 72)
+        scale = self.px / viewbox
+        self.margin = (viewbox - 8 * chess.svg.SQUARE_SIZE) / 2
+        self.edges = [round((self.margin + i * chess.svg.SQUARE_SIZE) * scale) for i in range(9)]
+        self.tiles = {}
+
+        cache = cache if cache is not None else DiskCache('atlas')
+        key = content_key(ATLAS_KEY, RL_VERSION, chess.__version__, size, coordinates)
+        data = cache.get(key)
+        if data is None:
+            self.base, self.sprites = self._render(empty, size, coordinates)
+            data = b''.join([self.base.tobytes()] + [a.tobytes() for s in 'PNBRQKpnbrqk' for a in self.sprites[s]])
+            cache.put(key, zlib.compress(data, 1))
+        else:
+            self._load(zlib.decompress(data))
+
+    def _load(self, data):
+        px = self.px
+        arrays = np.frombuffer(data, np.uint8)
+        self.base = arrays[:px * px * 3].reshape(px, px, 3)
+        offset, self.sprites = px * px * 3, {}
+        for symbol in 'PNBRQKpnbrqk':
+            premul = arrays[offset:offset + px * px * 3].reshape(px, px, 3)
+            inv_alpha = arrays[offset + px * px * 3:offset + px * px * 4].reshape(px, px, 1)
+            self.sprites[symbol] = (premul, inv_alpha)
+            offset += px * px * 4
+
+    def _render(self, empty, size, coordinates):
+        px = self.px
+        drawing = svg2rlg(io.BytesIO(empty.encode()))
+        base = _fit(render_drawing(drawing), px, px, 0xFFFFFF)
+        height = round(drawing.height * SVG_DPI / 72)
+        k = SVG_DPI / 72
+
+        # Un échiquier avec chaque pièce : les groupes svglib de chess.svg, déplacés de case en case
+        board = chess.Board(None)
+        for square, symbol in zip(chess.SQUARES, 'PNBRQKpnbrqk'):
+            board.set_piece_at(square, chess.Piece.from_symbol(symbol))
+        full = svg2rlg(io.BytesIO(chess.svg.board(board, size=size, coordinates=coordinates).encode()))
+        top = full.contents[0]
+        pieces = {}
+        for group in top.contents:
+            if isinstance(group, Group) and group.transform[:4] == (1, 0, 0, 1):
+                col = round((group.transform[4] - self.margin) / chess.svg.SQUARE_SIZE)
+                row = round((group.transform[5] - self.margin) / chess.svg.SQUARE_SIZE)
+                piece = board.piece_at(chess.square(col, 7 - row))
+                if piece:
+                    pieces[piece.symbol()] = group
+
+        sprites = {}
+        for symbol, group in pieces.items():
+            premul = np.zeros((px, px, 3), np.uint8)
+            inv_alpha = np.full((px, px, 1), 255, np.uint8)
+            for square in chess.SQUARES:
+                y0, y1, x0, x1 = self.box(square)
+                col, row = chess.square_file(square), 7 - chess.square_rank(square)
+                group.transform = (1, 0, 0, 1, self.margin + col * chess.svg.SQUARE_SIZE,
+                                   self.margin + row * chess.svg.SQUARE_SIZE)
+                top.contents = [group]
+                # Case seule : l'échiquier entier décalé d'un nombre entier de pixels
+                tile = Drawing((x1 - x0) / k, (y1 - y0) / k)
+                tile.add(Group(top, transform=(1, 0, 0, 1, -x0 / k, -(height - y1) / k)))
+                on_white = _fit(render_drawing(tile, 0xFFFFFF), y1 - y0, x1 - x0, 0xFFFFFF).astype(np.int16)
+                on_black = _fit(render_drawing(tile, 0x000000), y1 - y0, x1 - x0, 0x000000).astype(np.int16)
+                # Alpha déduit de deux rendus (fond blanc / fond noir)
+                inv_alpha[y0:y1, x0:x1, 0] = np.clip((on_white - on_black).max(axis=2), 0, 255)
+                premul[y0:y1, x0:x1] = on_black
+            sprites[symbol] = (premul, inv_alpha)
+        return base, sprites
+
+    def box(self, square):
+        col, row = chess.square_file(square), 7 - chess.square_rank(square)
+        return self.edges[row], self.edges[row + 1], self.edges[col], self.edges[col + 1]
+
+    def tile(self, square, symbol=None, color=None):
+        """Case pré-composée (fond ou teinte + pièce), calculée une fois par combinaison"""
+        y0, y1, x0, x1 = self.box(square)
+        key = (square, symbol, color)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.base[y0:y1, x0:x1].astype(np.uint16)
+            if color is not None:
+                rgb, a = _rgb(color)
+                tile = (tile * (255 - a) + np.array(rgb, np.uint16) * a + 127) // 255
+            if symbol is not None:
+                premul, inv_alpha = self.sprites[symbol]
+                tile = np.minimum(premul[y0:y1, x0:x1] + (tile * inv_alpha[y0:y1, x0:x1] + 127) // 255, 255)
+            tile = self.tiles[key] = tile.astype(np.uint8)
+        return tile
+
+    def compose(self, board, fill=None):
+        """Retourne le tableau RGB (px, px, 3) de l'échiquier"""
+        img = self.base.copy()
+        fill = fill or {}
+        pieces = board.piece_map()
+        for square in set(fill) | set(pieces):
+            piece = pieces.get(square)
+            y0, y1, x0, x1 = self.box(square)
+            img[y0:y1, x0:x1] = self.tile(square, piece and piece.symbol(), fill.get(square))
+        return img
+
+
+class BoardRaster:
+    """Backend raster de board_png / board_mini : un atlas par (taille, coordonnées)"""
+
+    def __init__(self):
+        self.atlases = {}
+        self.lock = threading.Lock()         # renderPM n'est pas réentrant : un atlas construit à la fois
+
+    def atlas(self, size, coordinates):
+        key = (size, coordinates)
+        if key not in self.atlases:
+            with self.lock:
+                if key not in self.atlases:
+                    self.atlases[key] = BoardAtlas(size, coordinates)
+        return self.atlases[key]
+
+    def render(self, fen, fill=None, size=400, coordinates=True):
+        return self.atlas(size, coordinates).compose(chess.Board(fen), fill)
+
+    def png(self, fen, fill=None, size=400, coordinates=True):
+        """PNG en mémoire (aperçus, backend historique) ; le PDF reçoit render() tel quel (RawImage)"""
+        buf = io.BytesIO()
+        Image.fromarray(self.render(fen, fill, size, coordinates)).save(buf, 'PNG', compress_level=1)
+        buf.seek(0)
+        return buf
+
+
+def benchmark(count=2000):
+    """Construction des atlas, débit du compositeur et écart moyen avec le rendu SVG historique"""
+    with tempfile.TemporaryDirectory() as root:
+        t0 = time.perf_counter()
+        fresh = BoardAtlas(400, True, DiskCache('atlas', root, remote=None))
+        cold = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        BoardAtlas(400, True, DiskCache('atlas', root, remote=None))
+        warm = time.perf_counter() - t0
+    with tempfile.TemporaryDirectory() as root:
+        BoardAtlas(220, False, DiskCache('atlas', root, remote=None))   # autre rendu avant, même processus
+        again = BoardAtlas(400, True, DiskCache('atlas', root, remote=None))
+    same = np.array_equal(fresh.base, again.base) and all(
+        np.array_equal(a, b) for s in fresh.sprites for a, b in zip(fresh.sprites[s], again.sprites[s]))
+    print(f"📊 atlas 400px : {cold:.2f} s à froid, {warm * 1000:.0f} ms depuis le cache — "
+          f"{'✅ identique' if same else '❌ différent'} après un autre atlas")
+    raster = BoardRaster()
+    fens = []
+    board = chess.Board()
+    for move in 'e2e4 e7e5 g1f3 b8c6 f1c4 g8f6 d2d3 f8c5 c2c3 d7d6 e1g1 e8g8'.split():
+        board.push_uci(move)
+        fens.append(board.fen())
+    fill = {chess.E4: '#90EE90', chess.F7: '#FFB6C1'}
+    for size, coords in ((400, True), (220, False)):
+        raster.atlas(size, coords)
+        t0 = time.perf_counter()
+        for i in range(count):
+            raster.render(fens[i % len(fens)], fill, size, coords)
+        compose = count / (time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        for i in range(count // 4):
+            raster.png(fens[i % len(fens)], fill, size, coords)
+        encoded = (count // 4) / (time.perf_counter() - t0)
+
+        svg = chess.svg.board(chess.Board(fens[-1]), size=size, coordinates=coords, colors=SQUARE_COLORS, fill=fill)
+        t0 = time.perf_counter()
+        ref = render_drawing(svg2rlg(io.BytesIO(svg.encode())))
+        svg_rate = 1 / (time.perf_counter() - t0)
+        ours = raster.render(fens[-1], fill, size, coords)
+        h, w = min(ref.shape[0], ours.shape[0]), min(ref.shape[1], ours.shape[1])
+        diff = np.abs(ref[:h, :w].astype(int) - ours[:h, :w].astype(int))
+        print(f"📊 {size}px coords={coords}: {compose:.0f} échiquiers/s (PNG : {encoded:.0f}/s) "
+              f"vs SVG {svg_rate:.1f}/s — écart moyen {diff.mean():.2f}/255, "
+              f"{100 * (diff.max(axis=2) > 32).mean():.2f}% pixels différents")
+
+        # Jusqu'au flux Flate du PDF : PNG → ImageReader → pixels → zlib, ou pixels → zlib
+        n = count // 4
+        t0 = time.perf_counter()
+        for i in range(n):
+            zlib.compress(ImageReader(raster.png(fens[i % len(fens)], fill, size, coords)).getRGBData())
+        via_png = (time.perf_counter() - t0) * 1000 / n
+        t0 = time.perf_counter()
+        for i in range(n):
+            zlib.compress(raster.render(fens[i % len(fens)], fill, size, coords).tobytes())
+        raw = (time.perf_counter() - t0) * 1000 / n
+        print(f"   ⏱️ {'board_png' if coords else 'board_mini'} → PDF : via PNG {via_png:.2f} ms/échiquier, "
+              f"pixels bruts {raw:.2f} ms/échiquier ({via_png / raw:.1f}×)")
+
+
+if __name__ == '__main__':
+    benchmark(*map(int, sys.argv[1:2]))
@@ -0,0 +1,190 @@
+"""
+Elo Booster - Cache de build adressé par contenu
+Les entrées sont des octets rangés sous leur clé (sha256) dans .cache/<espace>/.
+Avec ELO_CACHE_URL, un cache HTTP partagé (développeurs, CI) complète le disque local :
+GET /<espace>/<clé> sur un défaut local, PUT après chaque écriture (cf. cache_server.py).
+Les entrées distantes sont signées (HMAC-SHA256, clé partagée ELO_CACHE_SECRET) et vérifiées
+avant d'être utilisées : le serveur ne peut pas substituer de contenu.
+"""
+import contextlib, hashlib, hmac, os, sys, tempfile, urllib.error, urllib.request
+from metrics import CACHE
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+# Cache distant : URL de base, clé de signature (obligatoire), jeton optionnel,
+# ELO_CACHE_READONLY=1 pour lire sans publier
+REMOTE_URL = os.environ.get('ELO_CACHE_URL')
+REMOTE_SECRET = os.environ.get('ELO_CACHE_SECRET')
+REMOTE_TOKEN = os.environ.get('ELO_CACHE_TOKEN')
+REMOTE_READONLY = os.environ.get('ELO_CACHE_READONLY') == '1'
+REMOTE_TIMEOUT = 5
+
+
+def content_key(*parts):
+    """Clé sha256 stable à partir de morceaux str/bytes/nombres"""
+    h = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = repr(part).encode('utf-8')
+        h.update(len(part).to_bytes(8, 'little'))
+        h.update(part)
+    return h.hexdigest()
+
+
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextlib.contextmanager
+def atomic_path(path):
+    """Chemin temporaire (.<nom>.*.partial) à côté de `path`, renommé sur `path` seulement si le
+    bloc réussit : un fichier final n'est jamais partiel, même si le processus meurt en écrivant"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.partial', dir=directory)
+    os.close(fd)
+    try:
+        yield tmp
+        with open(tmp, 'rb') as f:
+            os.fsync(f.fileno())             # contenu sur disque avant le renommage
+        os.chmod(tmp, 0o666 & ~_UMASK)       # droits d'un fichier ouvert normalement (mkstemp : 0600)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def atomic_write(path, data):
+    with atomic_path(path) as tmp:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def sign(secret, namespace, key, data):
+    """HMAC-SHA256 d'une entrée, lié à son espace et à sa clé (pas de rejeu sous une autre clé)"""
+    return hmac.new(secret.encode('utf-8'), f'{namespace}/{key}'.encode() + data, hashlib.sha256).digest()
+
+
+class RemoteCache:
+    """Client du cache HTTP : GET / PUT par clé. Le corps stocké est signature HMAC (32 octets)
+    + données ; une entrée dont la signature ne correspond pas est ignorée comme absente.
+    Au premier échec réseau le serveur est ignoré pour le reste du processus"""
+
+    def __init__(self, url, secret, token=None, readonly=False, timeout=REMOTE_TIMEOUT):
+        self.url, self.secret, self.token = url.rstrip('/'), secret, token
+        self.readonly, self.timeout = readonly, timeout
+        self.down = False
+        self.hits = self.misses = self.uploads = self.rejected = 0
+
+    def _request(self, method, namespace, key, data=None):
+        req = urllib.request.Request(f'{self.url}/{namespace}/{key}', data=data, method=method)
+        if self.token:
+            req.add_header('Authorization', f'Bearer {self.token}')
+        if data is not None:
+            req.add_header('X-Content-SHA256', hashlib.sha256(data).hexdigest())
+        return urllib.request.urlopen(req, timeout=self.timeout)
+
+    def _unreachable(self, error):
+        self.down = True
+        print(f"⚠️ Cache distant {self.url} indisponible ({error}) : cache local seul", file=sys.stderr)
+
+    def get(self, namespace, key):
+        if self.down:
+            return None
+        try:
+            with self._request('GET', namespace, key) as resp:
+                body = resp.read()
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                self._unreachable(e)
+            self.misses += 1
+            return None
+        except (urllib.error.URLError, OSError) as e:
+            self._unreachable(e)
+            return None
+        mac, data = body[:32], body[32:]
+        if not hmac.compare_digest(mac, sign(self.secret, namespace, key, data)):
+            # Transfert tronqué, entrée altérée ou signée avec une autre clé : jamais décodée
+            if not self.rejected:
+                print(f"⚠️ Cache distant {self.url} : signature invalide pour {namespace}/{key}, "
+                      f"entrée ignorée (ELO_CACHE_SECRET différent ?)", file=sys.stderr)
+            self.rejected += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, namespace, key, data):
+        if self.down or self.readonly:
+            return
+        try:
+            self._request('PUT', namespace, key, sign(self.secret, namespace, key, data) + data).close()
+            self.uploads += 1
+        except (urllib.error.URLError, OSError) as e:
+            self._unreachable(e)
+
+
+_remotes = {}
+
+
+def remote_cache(url=REMOTE_URL):
+    """Client partagé par tous les espaces du processus (None sans ELO_CACHE_URL ou sans clé)"""
+    if not url:
+        return None
+    if url not in _remotes:
+        if REMOTE_SECRET:
+            _remotes[url] = RemoteCache(url, REMOTE_SECRET, REMOTE_TOKEN, REMOTE_READONLY)
+        else:
+            print(f"⚠️ ELO_CACHE_URL sans ELO_CACHE_SECRET : cache distant {url} ignoré", file=sys.stderr)
+            _remotes[url] = None
+    return _remotes[url]
+
+
+class DiskCache:
+    def __init__(self, namespace, root=CACHE_DIR, remote=REMOTE_URL):
+        self.namespace = namespace
+        self.dir = os.path.join(root, namespace)
+        self.remote = remote_cache(remote)
+
+    def _path(self, key):
+        return os.path.join(self.dir, key[:2], key)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+            CACHE.inc(1, ('disk', self.namespace, 'hit'))
+            return data
+        except FileNotFoundError:
+            CACHE.inc(1, ('disk', self.namespace, 'miss'))
+        if self.remote is None:
+            return None
+        data = self.remote.get(self.namespace, key)
+        CACHE.inc(1, ('remote', self.namespace, 'miss' if data is None else 'hit'))
+        if data is not None:
+            self._write(key, data)           # les builds suivants restent hors ligne
+        return data
+
+    def put(self, key, data):
+        self._write(key, data)
+        if self.remote:
+            self.remote.put(self.namespace, key, data)
+
+    def _write(self, key, data):
+        """Écriture atomique : un lecteur concurrent ne voit jamais d'entrée partielle"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key)) or (self.remote is not None and self.get(key) is not None)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Journal de reprise des builds longs
+Une ligne JSON par unité terminée (fiche, édition...) : identifiant, clé des entrées, sha256 de
+chaque fichier produit. Chaque entrée est écrite d'un bloc et synchronisée sur disque (fsync)
+avant de passer à la suite ; une dernière ligne tronquée par un arrêt brutal est ignorée puis
+effacée à la réouverture. Au redémarrage, une unité dont la clé n'a pas changé et dont les
+fichiers sont intacts (même sha256) n'est pas refaite.
+"""
+import json, os, sys, time
+from build_cache import file_hash
+
+
+class BuildJournal:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        good = 0
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break                # écriture interrompue : ligne incomplète
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    self.entries[entry['unit']] = entry
+                    good += len(line)
+            if good != os.path.getsize(path):
+                with open(path, 'r+b') as f:
+                    f.truncate(good)
+        self.file = open(path, 'ab')
+
+    def completed(self, unit, key):
+        """Unité déjà faite avec les mêmes entrées, fichiers présents et intacts"""
+        entry = self.entries.get(unit)
+        if entry is None or entry['key'] != key:
+            return False
+        return all(os.path.exists(path) and file_hash(path) == digest for path, digest in entry['outputs'].items())
+
+    def record(self, unit, key, outputs=()):
+        """Point de reprise : à appeler une fois les fichiers de l'unité écrits à leur place finale"""
+        entry = {'unit': unit, 'key': key, 'outputs': {os.path.abspath(p): file_hash(p) for p in outputs},
+                 'time': round(time.time(), 3)}
+        self.file.write(json.dumps(entry, ensure_ascii=False).encode() + b'\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.entries[unit] = entry
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    journal = BuildJournal(sys.argv[1])
+    for unit, entry in journal.entries.items():
+        state = '✅' if journal.completed(unit, entry['key']) else '⚠️'
+        print(f"{state} {unit} ({len(entry['outputs'])} fichiers)")
+    journal.close()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Serveur de cache de build
+Implémentation locale du protocole de build_cache.RemoteCache, pour travailler hors ligne ou
+servir un cache d'équipe : GET, HEAD et PUT /<espace>/<clé>, corps opaque vérifié par son sha256
+(en-tête X-Content-SHA256), stockage dans le même format que .cache/. GET /stats : compteurs.
+Le serveur ne signe ni ne vérifie les entrées (les clients le font avec ELO_CACHE_SECRET) ;
+hors de l'adresse de bouclage, il exige un jeton.
+"""
+import argparse, hashlib, hmac, ipaddress, json, os, re, secrets, shutil, subprocess, sys, tempfile, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from build_cache import DiskCache
+
+PATH = re.compile(r'^/([a-z_]+)/([0-9a-f]{64})$')
+MAX_BODY = 64 * 1024 * 1024
+
+
+class CacheHandler(BaseHTTPRequestHandler):
+    server_version = 'EloBoosterCache/1'
+
+    def _entry(self):
+        """(cache de l'espace, clé) ou None après avoir répondu 4xx"""
+        token = self.server.token
+        if token and not hmac.compare_digest(self.headers.get('Authorization', ''), f'Bearer {token}'):
+            self.send_error(401)
+            return None
+        match = PATH.match(self.path)
+        if not match:
+            self.send_error(404)
+            return None
+        namespace, key = match.groups()
+        return DiskCache(namespace, root=self.server.root, remote=None), key
+
+    def _send(self, code, body=b'', content_type='application/octet-stream'):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if body:
+            self.send_header('X-Content-SHA256', hashlib.sha256(body).hexdigest())
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            return self._send(200, json.dumps(self.server.stats).encode(), 'application/json')
+        entry = self._entry()
+        if entry:
+            cache, key = entry
+            data = cache.get(key)
+            self.server.count('hits' if data is not None else 'misses')
+            if data is None:
+                return self.send_error(404)
+            self._send(200, data)
+
+    do_HEAD = do_GET
+
+    def do_PUT(self):
+        entry = self._entry()
+        if not entry:
+            return
+        cache, key = entry
+        length = int(self.headers.get('Content-Length', -1))
+        if not 0 <= length <= MAX_BODY:
+            return self.send_error(411 if length < 0 else 413)
+        data = self.rfile.read(length)
+        digest = self.headers.get('X-Content-SHA256')
+        if digest and digest != hashlib.sha256(data).hexdigest():
+            return self.send_error(400, 'X-Content-SHA256 ne correspond pas au corps')
+        cache.put(key, data)                 # écriture atomique : deux PUT concurrents sont sans danger
+        self.server.count('puts')
+        self._send(201)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class CacheServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, root, host='127.0.0.1', port=8765, token=None, verbose=False):
+        super().__init__((host, port), CacheHandler)
+        if not token and not ipaddress.ip_address(self.server_address[0]).is_loopback:
+            self.server_close()
+            raise ValueError(f"{host} n'est pas une adresse de bouclage : jeton requis (--token ou ELO_CACHE_TOKEN)")
+        self.root, self.token, self.verbose = root, token, verbose
+        self.stats = {'hits': 0, 'misses': 0, 'puts': 0}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+
+def serve_in_thread(root, port=0, **options):
+    """Serveur en arrière-plan (port libre par défaut) ; retourne le serveur, server.url pour ELO_CACHE_URL"""
+    server = CacheServer(root, port=port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+_BUILD = """
+import os, time, build_cache, generate_en
+t0 = time.perf_counter()
+generate_en.EloBoosterPremium(os.devnull, optimize=False).generate_complete('data_en')
+remote = build_cache.remote_cache()
+print(time.perf_counter() - t0, remote.hits, remote.misses, remote.uploads)
+"""
+
+
+def benchmark():
+    """Deux copies neuves du dépôt (sans .cache/) : la première remplit le serveur, la seconde en profite"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        server = serve_in_thread(os.path.join(tmp, 'server'))
+        env = dict(os.environ, ELO_CACHE_URL=server.url, ELO_CACHE_SECRET=secrets.token_hex(16))
+        for name in ('ci', 'dev'):
+            checkout = os.path.join(tmp, name)
+            shutil.copytree(here, checkout, ignore=shutil.ignore_patterns('.cache', '*.pdf', '__pycache__'))
+            out = subprocess.run([sys.executable, '-c', _BUILD], cwd=checkout, env=env,
+                                 capture_output=True, text=True, check=True)
+            seconds, hits, misses, uploads = out.stdout.split()[-4:]
+            print(f"📊 {name} : {float(seconds):.2f} s, {hits} entrées du cache distant, "
+                  f"{misses} absentes, {uploads} publiées")
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['benchmark']:
+        benchmark()
+        sys.exit()
+    parser = argparse.ArgumentParser(description="Serveur de cache de build (GET/PUT par clé)")
+    parser.add_argument('root', nargs='?', default='cache_server_data', help="répertoire de stockage")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--token', default=os.environ.get('ELO_CACHE_TOKEN'), help="jeton Bearer exigé")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    try:
+        server = CacheServer(args.root, args.host, args.port, args.token, args.verbose)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"✅ Cache servi sur {server.url} depuis {os.path.abspath(args.root)}")
+    print(f"   export ELO_CACHE_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {server.stats}")
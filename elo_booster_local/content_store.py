@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Base de contenu SQLite
+Ouvertures, variantes et pièges de chaque langue dans une base SQLite (mode WAL : plusieurs
+éditeurs et workers de build lisent en parallèle), indexée par niveau, taux de victoire et
+fichier. Import / export aller-retour exact des JSON de data_en/ et data_fr/.
+"""
+import argparse, glob, json, os, sqlite3
+from corpus import opening_from_dict
+
+LOCALES = {'en': 'data_en', 'fr': 'data_fr'}
+LEVELS = (('Beginner', ('Beginner', 'Débutant')), ('Advanced', ('Advanced', 'Avancé')))
+
+# (colonne, type) dans l'ordre des clés des JSON ; 'json' : valeur sérialisée
+OPENING_FIELDS = (('name', 'text'), ('alt_name', 'text'), ('moves', 'text'), ('uci_moves', 'text'),
+                  ('complexity', 'text'), ('white_win', 'num'), ('black_win', 'num'), ('draw', 'num'),
+                  ('games', 'num'), ('eval', 'text'), ('champions', 'text'), ('idea', 'text'),
+                  ('highlights_green', 'json'), ('highlights_red', 'json'), ('errors_white', 'json'),
+                  ('errors_black', 'json'), ('development', 'json'))
+VARIANT_FIELDS = (('name', 'text'), ('moves', 'text'), ('uci', 'text'), ('eval', 'text'),
+                  ('white_win', 'num'), ('black_win', 'num'), ('draw', 'num'), ('games', 'num'),
+                  ('highlights', 'json'), ('white_plan', 'text'), ('black_plan', 'text'))
+TRAP_FIELDS = (('name', 'text'), ('fen', 'text'), ('highlights', 'json'), ('desc', 'text'), ('eval', 'text'))
+SQL_TYPES = {'text': 'TEXT', 'num': 'REAL', 'json': 'TEXT'}
+
+
+def _columns(fields):
+    return ', '.join(f'"{name}" {SQL_TYPES[kind]}' for name, kind in fields)
+
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS openings (
+    locale TEXT NOT NULL, file_id TEXT NOT NULL, level TEXT NOT NULL,
+    {_columns(OPENING_FIELDS)}, extra TEXT,
+    PRIMARY KEY (locale, file_id));
+CREATE TABLE IF NOT EXISTS variants (
+    locale TEXT NOT NULL, file_id TEXT NOT NULL, idx INTEGER NOT NULL,
+    {_columns(VARIANT_FIELDS)}, extra TEXT,
+    PRIMARY KEY (locale, file_id, idx));
+CREATE TABLE IF NOT EXISTS traps (
+    locale TEXT NOT NULL, file_id TEXT NOT NULL, idx INTEGER NOT NULL,
+    {_columns(TRAP_FIELDS)}, extra TEXT,
+    PRIMARY KEY (locale, file_id, idx));
+CREATE TABLE IF NOT EXISTS sources (
+    locale TEXT NOT NULL, file_id TEXT NOT NULL, text TEXT NOT NULL,
+    PRIMARY KEY (locale, file_id));
+CREATE INDEX IF NOT EXISTS openings_level ON openings (locale, level, white_win);
+CREATE INDEX IF NOT EXISTS openings_white_win ON openings (locale, white_win);
+CREATE INDEX IF NOT EXISTS openings_file ON openings (file_id);
+"""
+
+
+def level_of(complexity):
+    """Niveau normalisé (même règle que categorize_and_sort, toutes langues)"""
+    for level, words in LEVELS:
+        if any(word in (complexity or '') for word in words):
+            return level
+    return 'Intermediate'
+
+
+def _row(data, fields):
+    """dict JSON → valeurs des colonnes + clés inconnues (extra) pour rester sans perte"""
+    values = []
+    for name, kind in fields:
+        value = data.get(name)
+        values.append(json.dumps(value, ensure_ascii=False) if kind == 'json' and value is not None else value)
+    known = {name for name, _ in fields} | {'variants', 'traps'}
+    extra = {k: v for k, v in data.items() if k not in known}
+    return values + [json.dumps(extra, ensure_ascii=False) if extra else None]
+
+
+def _dict(row, fields):
+    """Ligne SQLite → dict JSON (colonnes NULL = clé absente)"""
+    data = {}
+    for name, kind in fields:
+        value = row[name]
+        if value is None:
+            continue
+        if kind == 'json':
+            value = json.loads(value)
+        elif kind == 'num' and float(value).is_integer():
+            value = int(value)
+        data[name] = value
+    if row['extra']:
+        data.update(json.loads(row['extra']))
+    return data
+
+
+class ContentStore:
+    def __init__(self, path, readonly=False):
+        if readonly:
+            self.db = sqlite3.connect(f'file:{os.path.abspath(path)}?mode=ro', uri=True, timeout=30)
+        else:
+            self.db = sqlite3.connect(path, timeout=30)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            self.db.executescript(SCHEMA)
+        self.db.row_factory = sqlite3.Row
+
+    def close(self):
+        self.db.close()
+
+    # === IMPORT / EXPORT ===
+    def import_dir(self, locale, data_dir):
+        """Remplace la langue `locale` par le contenu de data_dir (une transaction)"""
+        files = sorted(glob.glob(os.path.join(data_dir, '*.json')))
+        with self.db:
+            self.db.execute('BEGIN IMMEDIATE')
+            for table in ('openings', 'variants', 'traps', 'sources'):
+                self.db.execute(f'DELETE FROM {table} WHERE locale = ?', (locale,))
+            for path in files:
+                with open(path, encoding='utf-8', newline='') as f:
+                    text = f.read()
+                self.put(locale, os.path.basename(path), json.loads(text), text)
+        return len(files)
+
+    def put(self, locale, file_id, data, source=None):
+        """Écrit une fiche ; `source` : texte JSON d'origine, réutilisé tel quel à l'export"""
+        for table in ('openings', 'variants', 'traps'):
+            self.db.execute(f'DELETE FROM {table} WHERE locale = ? AND file_id = ?', (locale, file_id))
+        self._insert('openings', (locale, file_id, level_of(data.get('complexity'))), data, OPENING_FIELDS)
+        for i, var in enumerate(data.get('variants', [])):
+            self._insert('variants', (locale, file_id, i), var, VARIANT_FIELDS)
+        for i, trap in enumerate(data.get('traps', [])):
+            self._insert('traps', (locale, file_id, i), trap, TRAP_FIELDS)
+        if source is None:
+            source = json.dumps(data, indent=2, ensure_ascii=False) + '\n'
+        self.db.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?)', (locale, file_id, source))
+
+    def _insert(self, table, key, data, fields):
+        values = list(key) + _row(data, fields)
+        self.db.execute(f'INSERT INTO {table} VALUES ({", ".join("?" * len(values))})', values)
+
+    def get(self, locale, file_id):
+        """Fiche reconstruite en dict JSON (ordre des clés des fichiers)"""
+        row = self.db.execute('SELECT * FROM openings WHERE locale = ? AND file_id = ?', (locale, file_id)).fetchone()
+        return row and self._assemble(row)
+
+    def _assemble(self, row):
+        locale, file_id = row['locale'], row['file_id']
+        data = _dict(row, OPENING_FIELDS)
+        data['traps'] = [_dict(r, TRAP_FIELDS) for r in self.db.execute(
+            'SELECT * FROM traps WHERE locale = ? AND file_id = ? ORDER BY idx', (locale, file_id))]
+        data['variants'] = [_dict(r, VARIANT_FIELDS) for r in self.db.execute(
+            'SELECT * FROM variants WHERE locale = ? AND file_id = ? ORDER BY idx', (locale, file_id))]
+        return data
+
+    def export_dir(self, locale, out_dir):
+        """Réécrit les JSON ; texte d'origine à l'identique si la fiche n'a pas été modifiée.
+        Retourne le nombre de fichiers effectivement écrits"""
+        os.makedirs(out_dir, exist_ok=True)
+        written = 0
+        for row in self.db.execute('SELECT * FROM openings WHERE locale = ? ORDER BY file_id', (locale,)).fetchall():
+            data = self._assemble(row)
+            source = self.db.execute('SELECT text FROM sources WHERE locale = ? AND file_id = ?',
+                                     (locale, row['file_id'])).fetchone()
+            if source and json.loads(source['text']) == data:
+                text = source['text']
+            else:
+                text = json.dumps(data, indent=2, ensure_ascii=False) + '\n'
+            path = os.path.join(out_dir, row['file_id'])
+            if os.path.exists(path):
+                with open(path, encoding='utf-8', newline='') as f:
+                    if f.read() == text:
+                        continue
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(text)
+            written += 1
+        return written
+
+    # === REQUÊTES ===
+    def select(self, locale, level=None, min_white_win=None, files=None):
+        """file_id des fiches retenues (une requête indexée), par taux de victoire décroissant"""
+        sql, params = 'SELECT file_id FROM openings WHERE locale = ?', [locale]
+        if level:
+            sql += ' AND level = ?'
+            params.append(level)
+        if min_white_win is not None:
+            sql += ' AND white_win > ?'
+            params.append(min_white_win)
+        if files:
+            sql += f' AND file_id IN ({", ".join("?" * len(files))})'
+            params += list(files)
+        return [r['file_id'] for r in self.db.execute(sql + ' ORDER BY white_win DESC, file_id', params)]
+
+    def openings(self, locale, **query):
+        """Opening (corpus.py) des fiches retenues, dans l'ordre des fichiers comme load_corpus"""
+        return [opening_from_dict(self.get(locale, file_id), file_id)
+                for file_id in sorted(self.select(locale, **query))]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Base de contenu SQLite")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('import', 'export'):
+        cmd = sub.add_parser(name)
+        cmd.add_argument('db')
+        cmd.add_argument('--locale', choices=LOCALES, action='append')
+        cmd.add_argument('--out', help="répertoire de sortie (export ; défaut : data_<langue>)")
+    query = sub.add_parser('query')
+    query.add_argument('db')
+    query.add_argument('--locale', default='en', choices=LOCALES)
+    query.add_argument('--level', choices=('Beginner', 'Intermediate', 'Advanced'))
+    query.add_argument('--min-white-win', type=float)
+    args = parser.parse_args()
+
+    if args.command == 'query':
+        store = ContentStore(args.db, readonly=True)
+        for file_id in store.select(args.locale, args.level, args.min_white_win):
+            print(file_id)
+    else:
+        store = ContentStore(args.db)
+        for locale in args.locale or LOCALES:
+            if args.command == 'import':
+                print(f"📥 {locale} : {store.import_dir(locale, LOCALES[locale])} fiches importées")
+            else:
+                out = args.out or LOCALES[locale]
+                print(f"📤 {locale} : {store.export_dir(locale, out)} fichiers écrits dans {out}")
+    store.close()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Modèle du corpus
+Ouvertures, variantes, pièges et objectifs de développement en classes à __slots__ :
+chaînes internées, tuples au lieu de listes, valeurs par défaut et validation
+appliquées une seule fois au chargement. Le rendu lit des attributs, sans .get().
+"""
+import functools, glob, json, os, re, sys, time
+import chess
+
+_intern = sys.intern
+
+
+class DevelopmentHint:
+    __slots__ = ('piece_name', 'goal')
+
+    def __init__(self, piece_name, goal):
+        self.piece_name, self.goal = piece_name, goal
+
+
+class Trap:
+    __slots__ = ('name', 'fen', 'highlights', 'desc', 'eval')
+
+    def __init__(self, name, fen, highlights, desc, eval=None):
+        self.name, self.fen, self.highlights, self.desc, self.eval = name, fen, highlights, desc, eval
+
+
+class Variant:
+    __slots__ = ('name', 'moves', 'uci', 'fen', 'eval', 'white_win', 'black_win', 'draw', 'games',
+                 'highlights', 'white_plan', 'black_plan')
+
+    def __init__(self, name, moves, uci, fen, eval, white_win, black_win, draw, games,
+                 highlights, white_plan, black_plan):
+        self.name, self.moves, self.uci, self.fen, self.eval = name, moves, uci, fen, eval
+        self.white_win, self.black_win, self.draw, self.games = white_win, black_win, draw, games
+        self.highlights, self.white_plan, self.black_plan = highlights, white_plan, black_plan
+
+
+class Opening:
+    """Une fiche d'ouverture ; `file` (nom du JSON) sert d'identifiant de page et de lien"""
+    __slots__ = ('file', 'name', 'alt_name', 'moves', 'uci_moves', 'fen', 'complexity', 'eval',
+                 'white_win', 'black_win', 'draw', 'games', 'champions', 'idea',
+                 'highlights_green', 'highlights_red', 'errors_white', 'errors_black',
+                 'development', 'traps', 'variants')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields[name])
+
+
+# === CHARGEMENT ===
+def _text(data, key, where, default=''):
+    value = data.get(key, default)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{where} : '{key}' doit être une chaîne")
+    return _intern(value)
+
+
+def _number(data, key, where, required=False):
+    value = data.get(key)
+    if value is None:
+        if required:
+            raise ValueError(f"{where} : '{key}' manquant")
+        return None
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        raise ValueError(f"{where} : '{key}' doit être un nombre")
+    return value
+
+
+def _texts(data, key, where):
+    values = data.get(key, [])
+    if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+        raise ValueError(f"{where} : '{key}' doit être une liste de chaînes")
+    return tuple(_intern(v) for v in values)
+
+
+def _squares(data, key, where):
+    """Cases valides uniquement (les autres sont signalées une fois et écartées)"""
+    squares = []
+    for name in _texts(data, key, where):
+        if name in chess.SQUARE_NAMES:
+            squares.append(name)
+        else:
+            print(f"⚠️ {where} : case '{name}' ignorée ({key})")
+    return tuple(squares)
+
+
+@functools.lru_cache(maxsize=None)
+def _replay(uci):
+    """(FEN finale, erreur) ; mémoïsé : les lignes sont identiques d'une langue à l'autre"""
+    board = chess.Board()
+    try:
+        for move in uci.split():
+            board.push_uci(move)
+    except ValueError as e:
+        return None, str(e)
+    return _intern(board.fen()), None
+
+
+def _final_fen(uci, where):
+    fen, error = _replay(uci)
+    if error:
+        print(f"⚠️ {where} : {error}")
+    return fen
+
+
+def _hint(value, where):
+    # [piece_name, goal] ou {"piece_name": X, "goal": Y}
+    if isinstance(value, list) and len(value) == 2:
+        value = {'piece_name': value[0], 'goal': value[1]}
+    if not isinstance(value, dict):
+        raise ValueError(f"{where} : entrée de 'development' invalide")
+    return DevelopmentHint(_text(value, 'piece_name', where), _text(value, 'goal', where))
+
+
+def _trap(data, where):
+    where = f"{where} / {data.get('name', '?')}"
+    fen = _text(data, 'fen', where)
+    try:
+        chess.Board(fen)
+    except ValueError as e:
+        raise ValueError(f"{where} : FEN invalide ({e})")
+    return Trap(_text(data, 'name', where), fen, _squares(data, 'highlights', where),
+                _text(data, 'desc', where), _text(data, 'eval', where, None))
+
+
+def _variant(data, where):
+    where = f"{where} / {data.get('name', '?')}"
+    uci = _text(data, 'uci', where)
+    return Variant(_text(data, 'name', where), _text(data, 'moves', where), uci, _final_fen(uci, where),
+                   _text(data, 'eval', where, None),
+                   _number(data, 'white_win', where, True), _number(data, 'black_win', where, True),
+                   _number(data, 'draw', where), _number(data, 'games', where),
+                   _squares(data, 'highlights', where),
+                   _text(data, 'white_plan', where), _text(data, 'black_plan', where))
+
+
+def opening_from_dict(data, file_id):
+    """Valide un JSON d'ouverture et construit l'Opening correspondant"""
+    where = file_id
+    if not isinstance(data.get('name'), str):
+        raise ValueError(f"{where} : 'name' manquant")
+    uci_moves = _text(data, 'uci_moves', where)
+    return Opening(
+        file=_intern(file_id), name=_text(data, 'name', where), alt_name=_text(data, 'alt_name', where),
+        moves=_text(data, 'moves', where), uci_moves=uci_moves, fen=_final_fen(uci_moves, where),
+        complexity=_text(data, 'complexity', where), eval=_text(data, 'eval', where, None),
+        white_win=_number(data, 'white_win', where, True), black_win=_number(data, 'black_win', where, True),
+        draw=_number(data, 'draw', where), games=_number(data, 'games', where),
+        champions=_text(data, 'champions', where), idea=_text(data, 'idea', where),
+        highlights_green=_squares(data, 'highlights_green', where),
+        highlights_red=_squares(data, 'highlights_red', where),
+        errors_white=_texts(data, 'errors_white', where), errors_black=_texts(data, 'errors_black', where),
+        development=tuple(_hint(v, where) for v in data.get('development', [])),
+        traps=tuple(_trap(t, where) for t in data.get('traps', [])),
+        variants=tuple(_variant(v, where) for v in data.get('variants', [])),
+    )
+
+
+def load_opening(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return opening_from_dict(data, os.path.basename(path))
+
+
+def load_corpus(data_dir='data_en'):
+    """Toutes les ouvertures d'un répertoire, triées par nom de fichier"""
+    return [load_opening(path) for path in sorted(glob.glob(os.path.join(data_dir, '*.json')))]
+
+
+_WS = re.compile(r'\s*')
+_INDENT = re.compile(r'[ \t]*')
+_decoder = json.JSONDecoder()
+
+
+def _value_spans(text, i, path, spans):
+    """Positions (début, fin) de chaque valeur JSON du texte, indexées par chemin (clés et indices)"""
+    i = start = _WS.match(text, i).end()
+    if text[i] in '{[':
+        close = '}' if text[i] == '{' else ']'
+        i = _WS.match(text, i + 1).end()
+        index = 0
+        while text[i] != close:
+            if close == '}':
+                key, i = _decoder.raw_decode(text, i)
+                i = _WS.match(text, i).end() + 1  # ':'
+            else:
+                key, index = index, index + 1
+            i = _WS.match(text, _value_spans(text, i, path + (key,), spans)).end()
+            if text[i] == ',':
+                i = _WS.match(text, i + 1).end()
+        end = i + 1
+    else:
+        end = _decoder.raw_decode(text, i)[1]
+    spans[path] = (start, end)
+    return end
+
+
+def patch_json(text, updates):
+    """Remplace ou ajoute des valeurs ({chemin: valeur}) dans un texte JSON sans toucher
+    au reste de sa mise en forme (lignes vides, tableaux sur une ligne, indentation)"""
+    spans = {}
+    _value_spans(text, 0, (), spans)
+    edits, order, filled = [], list(updates), set()
+    for n, (path, value) in enumerate(updates.items()):
+        encoded = json.dumps(value, ensure_ascii=False)
+        if path in spans:
+            start, end = spans[path]
+            if text[start:end] != encoded:
+                edits.append((start, n, end, encoded))
+            continue
+        # Clé absente : insérée après la clé précédente de `updates` dans le même objet
+        # (à défaut après son dernier membre), avec la même indentation
+        parent, key = path[:-1], json.dumps(path[-1], ensure_ascii=False)
+        anchor = next((p for p in reversed(order[:n]) if p[:-1] == parent and p in spans), None)
+        siblings = [p for p in spans if len(p) == len(path) and p[:-1] == parent]
+        if anchor is None and siblings:
+            anchor = max(siblings, key=lambda p: spans[p][0])
+        if anchor is not None:
+            line = text.rfind('\n', 0, spans[anchor][0]) + 1
+            # Objet écrit sur une ligne : il y reste
+            sep = ', ' if line <= spans[parent][0] else ',\n' + _INDENT.match(text, line).group()
+            edits.append((spans[anchor][1], n, spans[anchor][1], f'{sep}{key}: {encoded}'))
+        else:
+            start = spans[parent][0] + 1
+            edits.append((start, n, start, f'{", " if parent in filled else ""}{key}: {encoded}'))
+            filled.add(parent)
+    for start, _, end, encoded in sorted(edits, reverse=True):
+        text = text[:start] + encoded + text[end:]
+    return text
+
+
+def _deep_size(obj, seen):
+    """Octets occupés par obj et tout ce qu'il référence (objets partagés comptés une fois)"""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_size(v, seen) for v in obj)
+    elif hasattr(obj, '__slots__'):
+        size += sum(_deep_size(getattr(obj, name), seen) for name in obj.__slots__)
+    return size
+
+
+def benchmark(data_dirs=('data_en', 'data_fr')):
+    """Mémoire et temps de chargement : dicts JSON bruts vs modèle
+    (le modèle est plus lent à charger : rejeu des lignes UCI et contrôle des FEN)"""
+    def raw(data_dir):
+        return [json.load(open(p, encoding='utf-8')) for p in sorted(glob.glob(os.path.join(data_dir, '*.json')))]
+
+    for label, load in (('dicts JSON', raw), ('modèle', load_corpus)):
+        _replay.cache_clear()
+        t0 = time.perf_counter()
+        corpus = [op for data_dir in data_dirs for op in load(data_dir)]
+        elapsed = time.perf_counter() - t0
+        size = _deep_size(corpus, set())
+        print(f"📊 {label} : {len(corpus)} ouvertures, {size / len(corpus) / 1024:.1f} Ko/ouverture, "
+              f"{elapsed * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    benchmark()
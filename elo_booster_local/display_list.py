@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Listes d'affichage
+Les appels canvas d'une page (setFillColor, drawString, roundRect, drawImage...) sont
+enregistrés une fois en une liste d'opérations sérialisable, mise en cache selon les
+entrées de la page, puis rejouée sur le canvas PDF ou sur un aperçu raster (PIL).
+"""
+import functools, hashlib, io, marshal, os, sys, time, zlib
+from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from build_cache import DiskCache
+from metrics import CACHE
+from pdf_output import RawImage
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FORMAT = 2                                   # à incrémenter si l'encodage des opérations change
+# Seules méthodes rejouées : l'API de dessin reproduite par RasterCanvas, plus les gabarits
+DRAW_OPS = frozenset({'setFillColor', 'setStrokeColor', 'setLineWidth', 'setFont', 'drawString',
+                      'drawRightString', 'drawCentredString', 'rect', 'roundRect', 'line', 'drawImage',
+                      'saveState', 'restoreState', 'translate', 'doForm', 'template'})
+
+
+def source_key(*paths):
+    """Empreinte du code de mise en page : une modification invalide les listes en cache"""
+    h = hashlib.sha256()
+    for path in paths:
+        path = os.path.join(HERE, path)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+def value_key(obj):
+    """Valeur hashable et stable (repr) d'un objet du corpus et de ses sous-objets"""
+    if hasattr(obj, '__slots__'):
+        return (type(obj).__name__,) + tuple(value_key(getattr(obj, name)) for name in obj.__slots__)
+    if isinstance(obj, (list, tuple)):
+        return tuple(value_key(v) for v in obj)
+    return obj
+
+
+@functools.lru_cache(maxsize=512)
+def _reader(png):
+    """ImageReader décodé une fois par image (les octets PNG mettent leur hash en cache)"""
+    return ImageReader(io.BytesIO(png))
+
+
+@functools.lru_cache(maxsize=512)
+def _raw(sha, width, height, deflated):
+    """RawImage partagée par les rejeux : son flux Flate est intégré tel quel au PDF"""
+    return RawImage(width, height, deflated=deflated, name=sha)
+
+
+class DisplayList:
+    """ops : [(méthode, args, kwargs)] ; images : {sha256: PNG} référencées par ('png', sha256)
+    et {sha256: (largeur, hauteur, pixels Flate)} référencées par ('raw', sha256)"""
+    __slots__ = ('ops', 'images')
+
+    def __init__(self, ops, images):
+        self.ops, self.images = ops, images
+
+    def to_bytes(self):
+        return marshal.dumps((FORMAT, self.ops, self.images))
+
+    @classmethod
+    def from_bytes(cls, data):
+        try:
+            version, ops, images = marshal.loads(data)
+        except (EOFError, ValueError, TypeError):
+            return None
+        if version != FORMAT or not all(op[0] in DRAW_OPS for op in ops):
+            return None                      # entrée d'un autre format ou opération inconnue : absente
+        return cls(ops, images)
+
+    def _decode(self, value, image, raw):
+        if isinstance(value, tuple) and value:
+            if value[0] == 'rgb':
+                return colors.Color(*value[1:])
+            if value[0] == 'png':
+                return image(self.images[value[1]])
+            if value[0] == 'raw':
+                return raw(value[1], *self.images[value[1]])
+        return value
+
+    def replay(self, canvas, template=None, image=_reader, raw=_raw):
+        """Rejoue sur `canvas` ; template(kind, *args) dessine les gabarits de page_templates"""
+        for name, args, kwargs in self.ops:
+            if name not in DRAW_OPS:
+                raise ValueError(f"opération de liste d'affichage non autorisée : {name!r}")
+            if name == 'template':
+                if template:
+                    template(*args)
+                continue
+            getattr(canvas, name)(*[self._decode(a, image, raw) for a in args],
+                                  **{k: self._decode(v, image, raw) for k, v in kwargs.items()})
+
+
+class Recorder:
+    """Remplace le canvas pendant la mise en page : chaque appel de dessin devient une opération"""
+
+    def __init__(self):
+        self.ops, self.images = [], {}
+        self.font = ('Helvetica', 12)
+
+    def _encode(self, value):
+        if isinstance(value, colors.Color):
+            return ('rgb', value.red, value.green, value.blue, value.alpha)
+        if isinstance(value, ImageReader):
+            png = value.fp.getvalue()
+            sha = hashlib.sha256(png).hexdigest()
+            self.images[sha] = png
+            return ('png', sha)
+        if isinstance(value, RawImage):
+            self.images[value.name] = (value.width, value.height, value.stream())
+            return ('raw', value.name)
+        return value
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def record(*args, **kwargs):
+            self.ops.append((name, tuple(self._encode(a) for a in args),
+                             {k: self._encode(v) for k, v in kwargs.items()}))
+        return record
+
+    def setFont(self, name, size, leading=None):
+        self.font = (name, size)
+        self.ops.append(('setFont', (name, size) if leading is None else (name, size, leading), {}))
+
+    def stringWidth(self, text, font=None, size=None):
+        return pdfmetrics.stringWidth(text, font or self.font[0], size or self.font[1])
+
+    def template(self, kind, *args):
+        self.ops.append(('template', (kind,) + args, {}))
+
+    def display_list(self):
+        return DisplayList(self.ops, self.images)
+
+
+class DisplayListCache:
+    """Listes d'affichage par clé : mémoire puis .cache/pages/"""
+
+    def __init__(self, namespace='pages'):
+        self.disk = DiskCache(namespace)
+        self.memory = {}
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        dl = self.memory.get(key)
+        CACHE.inc(1, ('memory', self.disk.namespace, 'miss' if dl is None else 'hit'))
+        if dl is None:
+            data = self.disk.get(key)
+            dl = data and DisplayList.from_bytes(data)
+            if dl:
+                self.memory[key] = dl
+        if dl:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return dl
+
+    def put(self, key, dl):
+        self.memory[key] = dl
+        self.disk.put(key, dl.to_bytes())
+
+
+# === APERÇU RASTER ===
+def _font_file(name):
+    """(police TrueType livrée avec ReportLab, facteur de taille) : Vera est plus large
+    qu'Helvetica, le facteur garde la largeur des lignes mesurée par stringWidth"""
+    from reportlab import __file__ as rl
+    bold = 'Bold' in name
+    return os.path.join(os.path.dirname(rl), 'fonts', 'VeraBd.ttf' if bold else 'Vera.ttf'), 0.84 if bold else 0.88
+
+
+class RasterCanvas:
+    """Sous-ensemble de l'API canvas ReportLab dessiné avec PIL (aperçus, miniatures)"""
+
+    def __init__(self, width, height, dpi=72):
+        from PIL import Image, ImageDraw
+        self.width, self.height, self.scale = width, height, dpi / 72
+        self.image = Image.new('RGB', (round(width * self.scale), round(height * self.scale)), 'white')
+        self.draw = ImageDraw.Draw(self.image)
+        self.fill = self.stroke = (0, 0, 0)
+        self.line_width = 1
+        self.font = ('Helvetica', 12)
+        self.origin, self.states = (0, 0), []
+        self.fonts = {}
+
+    def _xy(self, x, y):
+        return ((x + self.origin[0]) * self.scale, (self.height - y - self.origin[1]) * self.scale)
+
+    def _box(self, x, y, w, h):
+        (x0, y1), (x1, y0) = self._xy(x, y), self._xy(x + w, y + h)
+        return [min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)]
+
+    @staticmethod
+    def _rgb(color):
+        return tuple(round(v * 255) for v in (color.red, color.green, color.blue))
+
+    def setFillColor(self, color):
+        self.fill = self._rgb(color)
+
+    def setStrokeColor(self, color):
+        self.stroke = self._rgb(color)
+
+    def setLineWidth(self, width):
+        self.line_width = width
+
+    def setFont(self, name, size, leading=None):
+        self.font = (name, size)
+
+    def _pil_font(self):
+        from PIL import ImageFont
+        key = (self.font[0], self.font[1])
+        if key not in self.fonts:
+            path, factor = _font_file(key[0])
+            self.fonts[key] = ImageFont.truetype(path, max(round(key[1] * factor * self.scale), 1))
+        return self.fonts[key]
+
+    def stringWidth(self, text, font=None, size=None):
+        return pdfmetrics.stringWidth(text, font or self.font[0], size or self.font[1])
+
+    def drawString(self, x, y, text, anchor='ls'):
+        self.draw.text(self._xy(x, y), text, fill=self.fill, font=self._pil_font(), anchor=anchor)
+
+    def drawRightString(self, x, y, text):
+        self.drawString(x, y, text, 'rs')
+
+    def drawCentredString(self, x, y, text):
+        self.drawString(x, y, text, 'ms')
+
+    def rect(self, x, y, w, h, fill=False, stroke=True):
+        self.draw.rectangle(self._box(x, y, w, h), fill=self.fill if fill else None,
+                            outline=self.stroke if stroke else None, width=max(1, round(self.line_width * self.scale)))
+
+    def roundRect(self, x, y, w, h, radius, fill=False, stroke=True):
+        self.draw.rounded_rectangle(self._box(x, y, w, h), radius * self.scale, fill=self.fill if fill else None,
+                                    outline=self.stroke if stroke else None,
+                                    width=max(1, round(self.line_width * self.scale)))
+
+    def line(self, x1, y1, x2, y2):
+        self.draw.line([self._xy(x1, y1), self._xy(x2, y2)], fill=self.stroke,
+                       width=max(1, round(self.line_width * self.scale)))
+
+    def drawImage(self, image, x, y, width, height, **kwargs):
+        box = [round(v) for v in self._box(x, y, width, height)]
+        self.image.paste(image.resize((box[2] - box[0], box[3] - box[1])), box[:2])
+
+    def saveState(self):
+        self.states.append((self.fill, self.stroke, self.line_width, self.font, self.origin))
+
+    def restoreState(self):
+        self.fill, self.stroke, self.line_width, self.font, self.origin = self.states.pop()
+
+    def translate(self, dx, dy):
+        self.origin = (self.origin[0] + dx, self.origin[1] + dy)
+
+    def doForm(self, name):
+        pass                                 # renvois de page : hors aperçu
+
+
+def render_raster(dl, width, height, dpi=72, template=None):
+    """Image PIL de la liste d'affichage ; template(canvas, kind, *args) dessine un gabarit"""
+    from PIL import Image
+    raster = RasterCanvas(width, height, dpi)
+    dl.replay(raster, template and (lambda *args: template(raster, *args)),
+              image=lambda png: Image.open(io.BytesIO(png)).convert('RGB'),
+              raw=lambda sha, w, h, deflated: Image.frombytes('RGB', (w, h), zlib.decompress(deflated)))
+    return raster.image
+
+
+def benchmark(script='generate_en', data_dir='data_en', repeat=3):
+    """Temps d'une fiche : mise en page complète vs rejeu de la liste enregistrée"""
+    import importlib
+    from reportlab.pdfgen import canvas
+    from page_templates import PAGE_TEMPLATES
+    gen = importlib.import_module(script)
+    openings = gen.load_all_openings(data_dir)
+    pdf = gen.EloBoosterPremium(os.devnull, optimize=False, display_lists=False)
+
+    def layout():
+        for op in openings:
+            pdf.draw_opening(op)
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        layout()
+    direct = (time.perf_counter() - t0) / repeat
+    lists = []
+    for op in openings:
+        pdf.c, real = Recorder(), pdf.c
+        pdf.draw_opening(op)
+        lists.append(pdf.c.display_list())
+        pdf.c = real
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for dl in lists:
+            dl.replay(pdf.c, pdf.use_template)
+    replay = (time.perf_counter() - t0) / repeat
+    ops = sum(len(dl.ops) for dl in lists)
+    size = sum(len(dl.to_bytes()) for dl in lists)
+    print(f"📊 {len(openings)} fiches, {ops / len(openings):.0f} opérations/fiche, "
+          f"{size / len(openings) / 1024:.0f} Ko/fiche en cache")
+    print(f"   ⏱️ mise en page {direct * 1000 / len(openings):.1f} ms/fiche, "
+          f"rejeu {replay * 1000 / len(openings):.1f} ms/fiche")
+    preview = render_raster(lists[0], pdf.width, pdf.height, 100,
+                            lambda c, kind, *args: PAGE_TEMPLATES[kind](c, pdf.hex, pdf.width, pdf.height, *args))
+    preview.save('display_list_preview.png')
+    print(f"   ✅ Aperçu raster : display_list_preview.png ({openings[0].name})")
+
+
+if __name__ == '__main__':
+    import display_list                      # mêmes classes que celles importées par les générateurs
+    display_list.benchmark(*sys.argv[1:3])
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Plan de build des éditions
+Le fichier de travail (editions.json) décrit toutes les éditions : livres complets par langue et
+par format, mini-livres par niveau, extraits. Il est compilé en un graphe de tâches (lecture,
+FEN, validation, échiquier, mise en page de fiche, assemblage) dont chaque nœud est identifié
+par ce qu'il calcule : une tâche commune à plusieurs éditions n'existe qu'une fois. Les tâches
+FEN, échiquier et fiche sont ajoutées au graphe dès que le contenu qui les définit est lu.
+Le graphe est exécuté par un pool de threads, les tâches prêtes par chemin critique décroissant ;
+le bilan chiffre le travail évité par la déduplication.
+"""
+import argparse, glob, heapq, importlib, io, json, os, threading, time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import redirect_stdout
+from build_cache import content_key
+from build_journal import BuildJournal
+from content_store import level_of
+from corpus import _replay, opening_from_dict
+from display_list import Recorder, source_key
+from metrics import QUEUE_DEPTH
+from page_geometry import GEOMETRIES
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+JOB_FILE = os.path.join(HERE, 'editions.json')
+# Coût estimé (s) d'une tâche avant toute mesure ; remplacé ensuite par la moyenne mesurée
+ESTIMATES = {'load': 0.0005, 'fen': 0.0002, 'validate': 0.002, 'board': 0.01, 'sheet': 0.02, 'assemble': 0.3}
+KINDS = tuple(ESTIMATES)
+
+
+class Task:
+    __slots__ = ('id', 'order', 'kind', 'fn', 'args', 'expand', 'deps', 'succs', 'waiting', 'rank', 'result',
+                 'seconds')
+
+    def __init__(self, id, order, kind, fn, args, expand):
+        self.id, self.order, self.kind, self.fn, self.args, self.expand = id, order, kind, fn, args, expand
+        self.deps, self.succs = [], []
+        self.waiting, self.rank, self.result, self.seconds = 0, 0.0, None, None
+
+    def key(self):
+        """Priorité dans la file : chemin critique le plus long d'abord, puis ordre de création"""
+        return -self.rank, self.order, self
+
+
+class TaskGraph:
+    """Graphe de tâches dédoublonnées par identifiant, extensible pendant l'exécution"""
+
+    def __init__(self):
+        self.tasks = {}
+        self.measured = {kind: [0.0, 0] for kind in KINDS}
+        self.fresh = []                      # tâches créées depuis le dernier calcul des rangs
+
+    def add(self, id, kind, fn, args=(), deps=(), expand=None):
+        task = self.tasks.get(id)
+        if task is None:
+            task = self.tasks[id] = Task(id, len(self.tasks), kind, fn, args, expand)
+            self.fresh.append(task)
+        for dep in deps:
+            self.depend(task, dep)
+        return task
+
+    def depend(self, task, dep):
+        if dep not in task.deps:
+            task.deps.append(dep)
+            dep.succs.append(task)
+            if dep.seconds is None:
+                task.waiting += 1
+
+    def cost(self, task):
+        if task.seconds is not None:
+            return task.seconds
+        total, count = self.measured[task.kind]
+        return total / count if count else ESTIMATES[task.kind]
+
+    def rank(self):
+        """Longueur du chemin critique depuis chaque tâche jusqu'à la fin du build"""
+        order, seen = [], set()
+        for root in self.tasks.values():
+            stack = [(root, False)]
+            while stack:
+                task, done = stack.pop()
+                if done:
+                    order.append(task)
+                elif id(task) not in seen:
+                    seen.add(id(task))
+                    stack.append((task, True))
+                    stack.extend((succ, False) for succ in task.succs if id(succ) not in seen)
+        for task in order:                   # successeurs avant prédécesseurs
+            task.rank = self.cost(task) + max((succ.rank for succ in task.succs), default=0.0)
+
+    def run(self, workers=None):
+        """Exécute le graphe ; retourne la durée murale"""
+        t0 = time.perf_counter()
+        workers = workers or os.cpu_count()
+        self.rank()
+        self.fresh = []
+        ready = [t.key() for t in self.tasks.values() if t.waiting == 0]
+        heapq.heapify(ready)
+        running = {}
+        with ThreadPoolExecutor(workers) as pool:
+            while ready or running:
+                while ready and len(running) < workers:
+                    task = heapq.heappop(ready)[2]
+                    running[pool.submit(_timed, task)] = task
+                QUEUE_DEPTH.set(len(ready), ('tasks',))
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                candidates = {}
+                for future in done:
+                    task = running.pop(future)
+                    future.result()
+                    self.measured[task.kind][0] += task.seconds
+                    self.measured[task.kind][1] += 1
+                    for succ in task.succs:
+                        succ.waiting -= 1
+                        candidates[succ.id] = succ
+                    if task.expand:          # peut ajouter des dépendances aux successeurs
+                        task.expand(self, task)
+                if self.fresh:               # nouvelles tâches : chemins critiques et file recalculés
+                    candidates.update((t.id, t) for t in self.fresh)
+                    self.fresh = []
+                    self.rank()
+                    ready = [t.key() for _, _, t in ready]
+                    heapq.heapify(ready)
+                for task in candidates.values():
+                    if task.waiting == 0 and task.seconds is None:
+                        heapq.heappush(ready, task.key())
+        QUEUE_DEPTH.set(0, ('tasks',))
+        return time.perf_counter() - t0
+
+    def closure(self, task):
+        """Toutes les tâches dont dépend `task`, elle comprise"""
+        seen, stack = {}, [task]
+        while stack:
+            t = stack.pop()
+            if t.id not in seen:
+                seen[t.id] = t
+                stack.extend(t.deps)
+        return seen.values()
+
+
+def _timed(task):
+    t0 = time.perf_counter()
+    task.result = task.fn(*task.args)
+    task.seconds = time.perf_counter() - t0
+
+
+# === TÂCHES ===
+def _load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _named_bytes(path):
+    with open(path, 'rb') as f:
+        return os.path.basename(path).encode() + f.read()
+
+
+def _validate(load, file_id):
+    return opening_from_dict(load.result, file_id)
+
+
+_svg_lock = threading.Lock()
+
+
+def _board(pdf, method, args):
+    if pdf.raster is None:                   # rendu svglib/renderPM : pas de rendus concurrents
+        with _svg_lock:
+            return getattr(pdf, method)(*args)
+    return getattr(pdf, method)(*args)
+
+
+def _selected(op, query):
+    """Sélection des éditions, mêmes critères que ContentStore.select"""
+    return ((not query.get('level') or level_of(op.complexity) == query['level'])
+            and (query.get('min_white_win') is None or op.white_win > query['min_white_win'])
+            and (not query.get('files') or op.file in query['files']))
+
+
+class EditionPlan:
+    """Compile un fichier de travail en TaskGraph et l'exécute"""
+
+    def __init__(self, job=JOB_FILE, out_dir='.', optimize=True, journal=None, **options):
+        with open(job, encoding='utf-8') as f:
+            self.editions = json.load(f)['editions']
+        self.out_dir, self.optimize, self.options = out_dir, optimize, options
+        # Points de reprise : éditions (PDF vérifiés par sha256) et fiches déjà produites
+        self.journal = journal
+        self.graph = TaskGraph()
+        self.protos, self.modules, self.data_keys = {}, {}, {}
+        self.local = threading.local()
+        self.assembles, self.resumed = {}, {}
+        for edition in self.editions:
+            self._compile(edition)
+
+    def _proto(self, script):
+        """Instance partagée par script : échiquiers, mesures de texte, listes d'affichage, compresseur.
+        Échiquiers et atlas sont communs aux langues (mêmes clés, un seul rendu)"""
+        if script not in self.protos:
+            module = self.modules[script] = importlib.import_module(script)
+            proto = module.EloBoosterPremium(os.devnull, optimize=False, **self.options)
+            if self.protos:
+                first = next(iter(self.protos.values()))
+                proto.raster, proto.boards = first.raster, first.boards
+            self.protos[script] = proto
+        return self.protos[script]
+
+    def _instance(self, script, geometry):
+        """Générateur de mise en page propre au thread, pour un script et un format"""
+        instances = self.local.__dict__.setdefault('instances', {})
+        if (script, geometry) not in instances:
+            instances[script, geometry] = self.modules[script].EloBoosterPremium(
+                os.devnull, optimize=False, geometry=geometry, shared=self.protos[script], **self.options)
+        return instances[script, geometry]
+
+    def _edition_key(self, edition, paths):
+        """Entrées d'une édition : sa description, le code du générateur, le contenu des JSON, les options"""
+        data_dir = edition['data']
+        if data_dir not in self.data_keys:
+            self.data_keys[data_dir] = content_key(*(_named_bytes(p) for p in paths))
+        module = self.modules[edition['script']]
+        code = source_key('pdf_output.py', 'page_geometry.py', 'corpus.py', 'pawn_structures.py', 'content_store.py')
+        return content_key(edition, module.LAYOUT_KEY, code, self.data_keys[data_dir], self.optimize,
+                           sorted(self.options.items()))
+
+    def _compile(self, edition):
+        script, data_dir, geometry = edition['script'], edition['data'], edition.get('format', 'a4')
+        if data_dir.endswith('.db'):
+            raise ValueError(f"{edition['name']} : editions.py lit un répertoire JSON")
+        self._proto(script)
+        paths = sorted(glob.glob(os.path.join(HERE, data_dir, '*.json')))
+        output = os.path.join(self.out_dir, edition.get('output') or
+                              GEOMETRIES[geometry].output_path(self.modules[script].OUTPUT_PDF))
+        key = self._edition_key(edition, paths)
+        unit = f"edition:{edition['name']}"
+        if self.journal and self.journal.completed(unit, key):
+            self.resumed[edition['name']] = output
+            return
+        for stale in glob.glob(os.path.join(os.path.dirname(os.path.abspath(output)),
+                                            f'.{os.path.basename(output)}.*.partial')):
+            os.remove(stale)                 # écriture interrompue d'un run précédent
+        validates = []
+        for path in paths:
+            file_id = os.path.basename(path)
+            load = self.graph.add(('load', data_dir, file_id), 'load', _load, (path,), expand=self._expand_load)
+            validate = self.graph.add(('validate', data_dir, file_id), 'validate', _validate, (load, file_id),
+                                      deps=(load,), expand=self._expand_validate)
+            validates.append(validate)
+        self.assembles[edition['name']] = self.graph.add(
+            ('assemble', edition['name']), 'assemble', self._assemble, (edition, output, validates), deps=validates,
+            expand=lambda graph, task: self.checkpoint(unit, key, [output]))
+
+    def checkpoint(self, unit, key, outputs=()):
+        if self.journal:
+            self.journal.record(unit, key, outputs)
+
+    def _expand_load(self, graph, load):
+        """Une tâche FEN par ligne de coups (commune aux langues), avant la validation"""
+        data = load.result
+        validate = graph.tasks[('validate',) + load.id[1:]]
+        lines = [data.get('uci_moves', '')] + [v.get('uci', '') for v in data.get('variants', [])]
+        for uci in lines:
+            if isinstance(uci, str) and uci:
+                graph.depend(validate, graph.add(('fen', uci), 'fen', _replay, (uci,)))
+
+    def _expand_validate(self, graph, validate):
+        """Fiches (et leurs échiquiers) de l'ouverture pour chaque édition qui la retient"""
+        op = validate.result
+        data_dir = validate.id[1]
+        for edition in self.editions:
+            if (edition['name'] not in self.assembles or edition['data'] != data_dir
+                    or not _selected(op, edition.get('query', {}))):
+                continue
+            script, geometry = edition['script'], edition.get('format', 'a4')
+            proto = self.protos[script]
+            pdf = self._instance(script, geometry)
+            unit, key = f'sheet:{script}:{geometry}:{data_dir}/{op.file}', pdf.sheet_key(op)
+            cached = proto.display_lists and proto.display_lists.get(key)
+            if cached and self.journal and self.journal.completed(unit, key):
+                continue                     # fiche faite par un run précédent : l'assemblage la rejoue
+            sheet = graph.add(('sheet', script, geometry, data_dir, op.file), 'sheet', self._sheet,
+                              (script, geometry, op), deps=(validate,),
+                              expand=lambda graph, task, unit=unit, key=key: self.checkpoint(unit, key))
+            graph.depend(self.assembles[edition['name']], sheet)
+            if cached:
+                continue                     # fiche en cache : rejouée telle quelle, sans échiquier
+            for method, args in pdf.sheet.boards(op):
+                graph.depend(sheet, graph.add(('board', method) + args, 'board', _board, (proto, method, args)))
+
+    def _sheet(self, script, geometry, op):
+        pdf = self._instance(script, geometry)
+        pdf.c = Recorder()
+        pdf.generate_opening(op)             # liste d'affichage enregistrée ou déjà en mémoire
+
+    def _assemble(self, edition, output, validates):
+        script = edition['script']
+        openings = [v.result for v in validates if _selected(v.result, edition.get('query', {}))]
+        pdf = self.modules[script].EloBoosterPremium(output, optimize=self.optimize,
+                                                     geometry=edition.get('format', 'a4'),
+                                                     shared=self.protos[script], **self.options)
+        pdf.generate_complete(edition['data'], openings=openings)
+        return pdf.page_num
+
+    def run(self, workers=None):
+        log = io.StringIO()
+        with redirect_stdout(log):           # sorties des générateurs : seuls les avertissements sont gardés
+            wall = self.graph.run(workers)
+        for line in dict.fromkeys(line for line in log.getvalue().splitlines() if line.startswith('⚠️')):
+            print(line)
+        return wall
+
+    def report(self, wall):
+        """Travail demandé par les éditions (chacune pour soi) vs travail exécuté une fois"""
+        requested = {kind: [0, 0.0] for kind in KINDS}
+        for assemble in self.assembles.values():
+            for task in self.graph.closure(assemble):
+                requested[task.kind][0] += 1
+                requested[task.kind][1] += task.seconds
+        executed = {kind: [0, 0.0] for kind in KINDS}
+        for task in self.graph.tasks.values():
+            executed[task.kind][0] += 1
+            executed[task.kind][1] += task.seconds
+        print(f"📊 {len(self.editions)} éditions, {len(self.graph.tasks)} tâches exécutées, mur {wall:.2f} s")
+        for kind in KINDS:
+            (n_req, s_req), (n_run, s_run) = requested[kind], executed[kind]
+            print(f"   {kind:<9} {n_run:>5} / {n_req:<5} tâches  {s_run:6.2f} s au lieu de {s_req:6.2f} s")
+        total_req = sum(s for _, s in requested.values())
+        total_run = sum(s for _, s in executed.values())
+        print(f"   ✅ Déduplication : {total_req - total_run:.2f} s de travail évitées "
+              f"({total_run:.2f} s exécutées pour {total_req:.2f} s demandées)")
+        for name, assemble in self.assembles.items():
+            print(f"   📄 {name} : {assemble.args[1]} ({assemble.result} pages)")
+        for name, output in self.resumed.items():
+            print(f"   ♻️ {name} : {output} (run précédent, sha256 vérifié)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build de toutes les éditions en un graphe de tâches")
+    parser.add_argument('job', nargs='?', default=JOB_FILE)
+    parser.add_argument('--out', default='.', help="répertoire des PDF")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--compression', default='default', choices=('draft', 'default', 'release'))
+    parser.add_argument('--no-optimize', action='store_true', help="sans linéarisation (plus rapide)")
+    parser.add_argument('--journal', help="journal de reprise (défaut : <out>/editions.journal)")
+    parser.add_argument('--restart', action='store_true', help="ignore le journal et refait tout")
+    args = parser.parse_args()
+    os.makedirs(args.out, exist_ok=True)
+    journal_path = args.journal or os.path.join(args.out, 'editions.journal')
+    if args.restart and os.path.exists(journal_path):
+        os.remove(journal_path)
+    with BuildJournal(journal_path) as journal:
+        plan = EditionPlan(args.job, args.out, not args.no_optimize, journal, compression=args.compression)
+        plan.report(plan.run(args.workers))
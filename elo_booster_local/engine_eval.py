@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Évaluations moteur
+Analyse par lot des positions du corpus (fin de ligne principale, de chaque variante,
+position de chaque piège) avec un pool de moteurs UCI persistants, un par cœur.
+Cache persistant indexé par FEN : une position déjà analysée n'est jamais relancée.
+Seules les valeurs `eval` modifiées sont réécrites, la mise en forme des JSON est conservée.
+"""
+import argparse, glob, json, os, queue, subprocess, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import chess
+from build_cache import CACHE_DIR, atomic_write
+from corpus import patch_json
+
+EVAL_CACHE = os.path.join(CACHE_DIR, 'evals.json')
+
+
+def fen_key(fen):
+    """Position sans les compteurs de coups : même clé pour la même position"""
+    return ' '.join(fen.split()[:4])
+
+
+def format_eval(score):
+    """('cp', 30) → '+0.3', ('cp', 4) → '=', ('mate', -2) → '-#2' (point de vue des Blancs)"""
+    kind, value = score
+    if kind == 'mate':
+        return f"{'-' if value < 0 else ''}#{abs(value)}"
+    text = f"{value / 100:+.1f}"
+    return '=' if text in ('+0.0', '-0.0') else text
+
+
+class UCIEngine:
+    """Moteur UCI dans un sous-processus persistant"""
+
+    def __init__(self, path, options=None):
+        self.proc = subprocess.Popen([path], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        self.name = os.path.basename(path)
+        self.send('uci')
+        for line in self.read_until('uciok'):
+            if line.startswith('id name '):
+                self.name = line[8:].strip()
+        for name, value in (options or {}).items():
+            self.send(f'setoption name {name} value {value}')
+        self.send('isready')
+        self.read_until('readyok')
+
+    def send(self, command):
+        self.proc.stdin.write(command + '\n')
+
+    def read_until(self, token):
+        while True:
+            line = self.proc.stdout.readline()
+            if not line:
+                raise RuntimeError(f"{self.name} s'est arrêté (attendu : {token})")
+            yield line
+            if line.split()[:1] == [token]:
+                return
+
+    def evaluate(self, fen, depth):
+        """Score ('cp' | 'mate', valeur) du point de vue des Blancs"""
+        self.send(f'position fen {fen}')
+        self.send(f'go depth {depth}')
+        score = None
+        for line in self.read_until('bestmove'):
+            words = line.split()
+            if words[:1] == ['info'] and 'score' in words:
+                i = words.index('score')
+                if words[i + 1] in ('cp', 'mate') and 'upperbound' not in words and 'lowerbound' not in words:
+                    score = (words[i + 1], int(words[i + 2]))
+        if score is None:
+            raise RuntimeError(f"{self.name} : pas de score pour {fen}")
+        if fen.split()[1] == 'b':
+            score = (score[0], -score[1])
+        return score
+
+    def close(self):
+        try:
+            self.send('quit')
+            self.proc.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.proc.kill()
+
+
+class EvalCache:
+    """{fen: [profondeur, éval, moteur]} dans un fichier JSON (écriture atomique)"""
+
+    def __init__(self, path=EVAL_CACHE):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def get(self, fen, depth, engine):
+        entry = self.entries.get(fen_key(fen))
+        if entry and entry[0] >= depth and entry[2] == engine:
+            return entry[1]
+        return None
+
+    def put(self, fen, depth, engine, value):
+        self.entries[fen_key(fen)] = [depth, value, engine]
+
+    def save(self):
+        atomic_write(self.path, json.dumps(self.entries, sort_keys=True).encode('utf-8'))
+
+
+class EnginePool:
+    """Un moteur par thread de travail, démarré au premier usage et réutilisé"""
+
+    def __init__(self, path, workers=None, options=None):
+        self.path, self.options = path, options
+        self.workers = workers or os.cpu_count()
+        self.engines = queue.SimpleQueue()
+        self.started = []
+        self.lock = threading.Lock()
+        engine = self._checkout()
+        self.name = engine.name              # identifie le moteur pour le cache
+        self.engines.put(engine)
+
+    def _checkout(self):
+        try:
+            return self.engines.get_nowait()
+        except queue.Empty:
+            engine = UCIEngine(self.path, self.options)
+            with self.lock:
+                self.started.append(engine)
+            return engine
+
+    def evaluate(self, fen, depth):
+        engine = self._checkout()
+        try:
+            score = engine.evaluate(fen, depth)
+        except (RuntimeError, OSError):
+            # Moteur arrêté ou désynchronisé : écarté, un autre démarre au prochain usage
+            engine.close()
+            raise
+        self.engines.put(engine)
+        return score
+
+    def _evaluate_or_error(self, fen, depth):
+        try:
+            return self.evaluate(fen + ' 0 1', depth)
+        except (RuntimeError, OSError) as e:
+            return e
+
+    def map(self, fens, depth):
+        """(clé FEN, score ou exception) pour chaque clé, évaluées en parallèle sur le pool :
+        une position en erreur n'interrompt pas le lot"""
+        with ThreadPoolExecutor(self.workers) as pool:
+            yield from zip(fens, pool.map(lambda fen: self._evaluate_or_error(fen, depth), fens))
+
+    def close(self):
+        for engine in self.started:
+            engine.close()
+
+
+def _final_fen(uci_moves):
+    board = chess.Board()
+    for move in uci_moves.split():
+        board.push_uci(move)
+    return board.fen()
+
+
+def corpus_positions(data):
+    """[(chemin JSON de l'objet à annoter, FEN)] : ligne principale, variantes, pièges"""
+    positions = []
+    lines = [((), data, data.get('uci_moves', ''))] + [
+        (('variants', i), var, var.get('uci', '')) for i, var in enumerate(data.get('variants', []))]
+    for path, target, uci in lines:
+        try:
+            positions.append((path, _final_fen(uci)))
+        except ValueError as e:
+            print(f"⚠️ {data.get('name', '?')} / {target.get('name', '?')} ignorée : {e}")
+    positions += [(('traps', i), trap['fen']) for i, trap in enumerate(data.get('traps', [])) if trap.get('fen')]
+    return positions
+
+
+def analyse(data_dirs, engine_path, depth=18, workers=None, cache_path=EVAL_CACHE, options=None,
+            dry_run=False):
+    """Évalue toutes les positions du corpus et écrit le champ `eval` dans les JSON"""
+    cache = EvalCache(cache_path)
+    files = []
+    for data_dir in data_dirs:
+        for path in sorted(glob.glob(os.path.join(data_dir, '*.json'))):
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+            files.append((path, text, corpus_positions(json.loads(text))))
+    fens = [fen for *_, positions in files for _, fen in positions]
+
+    pool = EnginePool(engine_path, workers, options)
+    try:
+        todo = sorted({fen_key(fen) for fen in fens if cache.get(fen, depth, pool.name) is None})
+        print(f"♟️ {len(fens)} positions, {len(todo)} à analyser ({pool.name}, profondeur {depth})")
+        t0 = last_save = time.perf_counter()
+        failed = 0
+        try:
+            for fen, score in pool.map(todo, depth):
+                if isinstance(score, Exception):
+                    print(f"⚠️ {fen} : {score}")
+                    failed += 1
+                    continue
+                cache.put(fen, depth, pool.name, format_eval(score))
+                if time.perf_counter() - last_save > 30:
+                    cache.save()
+                    last_save = time.perf_counter()
+        finally:
+            # Évaluations déjà obtenues conservées même si le lot est interrompu
+            cache.save()
+        if todo:
+            print(f"   ⏱️ {len(todo) / (time.perf_counter() - t0):.1f} positions/s")
+        if failed:
+            print(f"   ⚠️ {failed} positions en erreur, réessayées au prochain passage")
+    finally:
+        pool.close()
+
+    changed = set()
+    for path, text, positions in files:
+        updates = {}
+        for target, fen in positions:
+            value = cache.get(fen, depth, pool.name)
+            if value is not None:           # erreur moteur : l'ancienne valeur reste en place
+                updates[target + ('eval',)] = value
+        patched = patch_json(text, updates)
+        if patched != text:
+            changed.add(path)
+            if not dry_run:
+                atomic_write(path, patched.encode('utf-8'))
+    return changed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Évaluations moteur du corpus")
+    parser.add_argument('engine', help="binaire UCI (stockfish, lc0...)")
+    parser.add_argument('--depth', type=int, default=18)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--threads', type=int, default=1, help="option Threads de chaque moteur")
+    parser.add_argument('--hash', type=int, default=64, help="option Hash (Mo) de chaque moteur")
+    parser.add_argument('--cache', default=EVAL_CACHE)
+    parser.add_argument('--dry-run', action='store_true', help="analyser sans réécrire les JSON")
+    args = parser.parse_args()
+    changed = analyse(['data_en', 'data_fr'], args.engine, args.depth, args.workers, args.cache,
+                      {'Threads': args.threads, 'Hash': args.hash}, args.dry_run)
+    print(f"✅ {len(changed)} fichiers {'à mettre' if args.dry_run else 'mis'} à jour")
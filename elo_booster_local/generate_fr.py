@@ -3,17 +3,53 @@
 Elo Booster - Document Complet V4
 Sommaire corrigé + Titres avec retour à la ligne
 """
-from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
 from reportlab.lib import colors
-from reportlab.pdfgen import canvas
+from reportlab import rl_config, Version as RL_VERSION
 from reportlab.lib.utils import ImageReader
-import chess, chess.svg, io, json, os, glob
+import chess, chess.svg, io, os, re
+import svglib
 from svglib.svglib import svg2rlg
 from reportlab.graphics import renderPDF, renderPM
+from pdf_output import PooledCanvas, RawImage, StreamCompressor, optimize_pdf
+from previews import export_previews
+from page_templates import PAGE_TEMPLATES, template_name
+from corpus import load_corpus
+from build_cache import content_key
+from display_list import DisplayListCache, Recorder, source_key, value_key
+from content_store import ContentStore
+from metrics import BOARDS, CACHE, OUTPUT_BYTES, PAGES, SECTIONS
+from page_geometry import GEOMETRIES
+from sheet_template import SheetPlan, load_template
+try:
+    from board_raster import BoardRaster
+except ImportError:
+    BoardRaster = None
+try:
+    from pawn_structures import PawnIndex
+except ImportError:
+    PawnIndex = None
 
-WIDTH, HEIGHT = A4
-MARGIN = 0.8 * cm
+# Flux Flate binaires (pas d'ASCII85) : images encodées plus vite, recopiées sans
+# recompression par optimize_pdf, ce qui rend chaque format supplémentaire peu coûteux
+rl_config.useA85 = 0
+
+# Code dont dépend le dessin d'une fiche : clé des listes d'affichage en cache
+LAYOUT_KEY = source_key(os.path.basename(__file__), 'page_templates.py', 'board_raster.py', 'display_list.py',
+                        'sheet_template.py', 'templates/opening_sheet.json')
+# Bibliothèques dont dépend le rendu : une mise à jour invalide aussi les listes d'affichage
+LIB_VERSIONS = (RL_VERSION, chess.__version__, getattr(svglib, '__version__', None))
+OUTPUT_PDF = 'Elo_Booster_FR_Premium.pdf'
+
+# Visuels du site : nom de fichier → page (clé de page_map)
+PREVIEWS = {
+    'cover': 'cover',
+    'sommaire': 'toc',
+    'checklist': 'checklist',
+    'sicilienne': 'sicilienne.json',
+    'italienne': 'italienne.json',
+}
+PREVIEW_SUFFIX = ''
 
 COLORS = {
     'dark': '#1A2332',
@@ -37,19 +73,22 @@ COLORS = {
 def hex_color(name):
     return colors.HexColor(COLORS.get(name, name))
 
-def load_all_openings(data_dir='data'):
-    openings = []
-    for filepath in sorted(glob.glob(os.path.join(data_dir, '*.json'))):
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            data['_file'] = os.path.basename(filepath)
-            openings.append(data)
-    return openings
+def load_all_openings(data_dir='data', **query):
+    # data_dir : répertoire JSON ou base SQLite (content_store.py, requêtes indexées)
+    if data_dir.endswith('.db'):
+        store = ContentStore(data_dir, readonly=True)
+        try:
+            return store.openings('fr', **query)
+        finally:
+            store.close()
+    if query:
+        raise ValueError("sélection (level, min_white_win, files) : base SQLite requise")
+    return load_corpus(data_dir)
 
 def categorize_and_sort(openings):
     levels = {'Débutant': [], 'Intermédiaire': [], 'Avancé': []}
     for op in openings:
-        complexity = op.get('complexity', 'Intermédiaire')
+        complexity = op.complexity
         if 'Débutant' in complexity:
             levels['Débutant'].append(op)
         elif 'Avancé' in complexity:
@@ -57,23 +96,57 @@ def categorize_and_sort(openings):
         else:
             levels['Intermédiaire'].append(op)
     for level in levels:
-        levels[level] = sorted(levels[level], key=lambda x: x.get('white_win', 50), reverse=True)
+        levels[level] = sorted(levels[level], key=lambda x: x.white_win, reverse=True)
     return levels
 
 class EloBoosterPremium:
-    def __init__(self, output_path):
-        self.c = canvas.Canvas(output_path, pagesize=A4)
+    def __init__(self, output_path, optimize=True, board_backend='raster', display_lists=True,
+                 geometry='a4', shared=None, compression='default'):
+        self.output_path = output_path
+        self.optimize = optimize
+        self.geometry = GEOMETRIES[geometry] if isinstance(geometry, str) else geometry
+        self.width, self.height, self.margin = self.geometry.width, self.geometry.height, self.geometry.margin
+        if shared:
+            # Autre format du même build : échiquiers, mesures de texte et listes d'affichage communs
+            self.raster, self.boards, self.texts = shared.raster, shared.boards, shared.texts
+            self.display_lists = shared.display_lists
+            self.compressor = shared.compressor
+        else:
+            # 'raster' : compositeur NumPy (atlas de sprites), 'svg' : chess.svg + svglib
+            self.raster = BoardRaster() if board_backend == 'raster' and BoardRaster else None
+            self.boards, self.texts = {}, {}
+            # Fiches enregistrées une fois puis rejouées (.cache/pages/)
+            self.display_lists = DisplayListCache() if display_lists else None
+            # Flux et images compressés en parallèle : 'draft' (rapide), 'default', 'release' (max)
+            self.compressor = StreamCompressor(compression)
+        # Fiche d'ouverture : gabarit compilé pour ce format (templates/opening_sheet.json)
+        self.sheet = SheetPlan(load_template('opening_sheet'), self.geometry, 'fr', COLORS)
+        self.c = PooledCanvas(output_path, self.compressor, pagesize=self.geometry.pagesize, pageCompression=1)
+        self.geometry.begin_page(self.c)
         self.page_num = 0
+        self.page_map = {}
+        self.templates = set()
+        self.page_refs = {}
         
     def hex(self, name):
         return colors.HexColor(COLORS.get(name, name))
     
     def new_page(self):
         self.c.showPage()
+        self.geometry.begin_page(self.c)
         self.page_num += 1
         
     def board_png(self, fen, green=None, red=None, size=400):
-        board = chess.Board(fen)
+        key = ('png', fen, tuple(green or ()), tuple(red or ()), size)
+        if key not in self.boards:
+            CACHE.inc(1, ('memory', 'boards', 'miss'))
+            BOARDS.inc(1, ('png', 'raster' if self.raster else 'svg'))
+            self.boards[key] = self._board_png(fen, green, red, size)
+        else:
+            CACHE.inc(1, ('memory', 'boards', 'hit'))
+        return self.boards[key]
+
+    def _board_png(self, fen, green, red, size):
         fill = {}
         for sq in (green or []):
             try: fill[chess.parse_square(sq)] = COLORS['green']
@@ -81,6 +154,9 @@ class EloBoosterPremium:
         for sq in (red or []):
             try: fill[chess.parse_square(sq)] = COLORS['red']
             except: pass
+        if self.raster:
+            return RawImage.from_array(self.raster.render(fen, fill, size, coordinates=True), self.compressor)
+        board = chess.Board(fen)
         svg = chess.svg.board(board, size=size, coordinates=True,
             colors={"square light": "#F0D9B5", "square dark": "#B58863"}, fill=fill)
         # Utiliser svglib au lieu de cairosvg
@@ -91,11 +167,23 @@ class EloBoosterPremium:
         return ImageReader(img_data)
     
     def board_mini(self, fen, highlights=None, size=300):
-        board = chess.Board(fen)
+        key = ('mini', fen, tuple(highlights or ()), size)
+        if key not in self.boards:
+            CACHE.inc(1, ('memory', 'boards', 'miss'))
+            BOARDS.inc(1, ('mini', 'raster' if self.raster else 'svg'))
+            self.boards[key] = self._board_mini(fen, highlights, size)
+        else:
+            CACHE.inc(1, ('memory', 'boards', 'hit'))
+        return self.boards[key]
+
+    def _board_mini(self, fen, highlights, size):
         fill = {}
         for sq in (highlights or []):
             try: fill[chess.parse_square(sq)] = COLORS['green']
             except: pass
+        if self.raster:
+            return RawImage.from_array(self.raster.render(fen, fill, size, coordinates=False), self.compressor)
+        board = chess.Board(fen)
         svg = chess.svg.board(board, size=size, coordinates=False,
             colors={"square light": "#F0D9B5", "square dark": "#B58863"}, fill=fill)
         # Utiliser svglib au lieu de cairosvg
@@ -105,6 +193,38 @@ class EloBoosterPremium:
         img_data.seek(0)
         return ImageReader(img_data)
     
+    def use_template(self, kind, *args):
+        """Dessine un gabarit de page, compilé en Form XObject au premier usage"""
+        if isinstance(self.c, Recorder):
+            self.c.template(kind, *args)
+            return
+        name = template_name(kind, *args)
+        if name not in self.templates:
+            self.c.beginForm(name, 0, 0, self.width, self.height)
+            PAGE_TEMPLATES[kind](self.c, self.hex, self.width, self.height, *args)
+            self.c.endForm()
+            self.templates.add(name)
+        self.c.doForm(name)
+    
+    def page_ref(self, key, x, y, font="Helvetica-Bold", size=8, color=colors.white):
+        """Numéro de page de `key` (clé de page_map), centré en (x, y).
+        Écrit comme Form XObject différé : le numéro est rempli par resolve_page_refs()"""
+        name = 'pageref_' + re.sub(r'\W', '_', key)
+        self.page_refs[name] = (key, font, size, color)
+        self.c.saveState()
+        self.c.translate(x, y)
+        self.c.doForm(name)
+        self.c.restoreState()
+    
+    def resolve_page_refs(self):
+        """Remplit les renvois de page une fois toutes les pages placées"""
+        for name, (key, font, size, color) in self.page_refs.items():
+            self.c.beginForm(name, -1*cm, -0.5*cm, 1*cm, 0.5*cm)
+            self.c.setFillColor(color)
+            self.c.setFont(font, size)
+            self.c.drawCentredString(0, 0, str(self.page_map.get(key, '?')))
+            self.c.endForm()
+    
     def draw_rect(self, x, y, w, h, color, radius=0):
         """x, y, w, h en points (pas en cm)"""
         self.c.setFillColor(self.hex(color))
@@ -116,6 +236,12 @@ class EloBoosterPremium:
     def wrap_text(self, text, font, size, max_width):
         """Retourne une liste de lignes"""
         self.c.setFont(font, size)
+        key = ('wrap', text, font, size, max_width)
+        if key not in self.texts:
+            self.texts[key] = self._wrap_text(text, font, size, max_width)
+        return list(self.texts[key])
+
+    def _wrap_text(self, text, font, size, max_width):
         words = text.split()
         lines, line = [], ""
         for w in words:
@@ -131,6 +257,12 @@ class EloBoosterPremium:
     def fit_text(self, text, font, size, max_width):
         """Tronque le texte pour qu'il tienne dans max_width"""
         self.c.setFont(font, size)
+        key = ('fit', text, font, size, max_width)
+        if key not in self.texts:
+            self.texts[key] = self._fit_text(text, font, size, max_width)
+        return self.texts[key]
+
+    def _fit_text(self, text, font, size, max_width):
         if self.c.stringWidth(text, font, size) <= max_width:
             return text
         while len(text) > 3 and self.c.stringWidth(text + "…", font, size) > max_width:
@@ -141,47 +273,48 @@ class EloBoosterPremium:
     def generate_cover(self):
         c = self.c
         self.page_num = 1
+        self.page_map['cover'] = self.page_num
         
         # Fond
         c.setFillColor(self.hex('dark'))
-        c.rect(0, 0, WIDTH, HEIGHT, fill=True, stroke=False)
+        c.rect(0, 0, self.width, self.height, fill=True, stroke=False)
         
         # Bandes dorées
         c.setFillColor(self.hex('gold'))
-        c.rect(0, HEIGHT - 3*cm, WIDTH, 0.3*cm, fill=True, stroke=False)
-        c.rect(0, 2.7*cm, WIDTH, 0.3*cm, fill=True, stroke=False)
+        c.rect(0, self.height - 3*cm, self.width, 0.3*cm, fill=True, stroke=False)
+        c.rect(0, 2.7*cm, self.width, 0.3*cm, fill=True, stroke=False)
         
         # Titre
         c.setFillColor(self.hex('gold'))
         c.setFont("Helvetica-Bold", 56)
-        c.drawCentredString(WIDTH/2, HEIGHT - 7*cm, "ELO BOOSTER")
+        c.drawCentredString(self.width/2, self.height - 7*cm, "ELO BOOSTER")
         
         c.setFillColor(colors.white)
         c.setFont("Helvetica", 20)
-        c.drawCentredString(WIDTH/2, HEIGHT - 9*cm, "Le Guide Ultime des Ouvertures")
+        c.drawCentredString(self.width/2, self.height - 9*cm, "Le Guide Ultime des Ouvertures")
         
         # Ligne
         c.setStrokeColor(self.hex('gold'))
         c.setLineWidth(2)
-        c.line(WIDTH/2 - 4*cm, HEIGHT - 10*cm, WIDTH/2 + 4*cm, HEIGHT - 10*cm)
+        c.line(self.width/2 - 4*cm, self.height - 10*cm, self.width/2 + 4*cm, self.height - 10*cm)
         
         # Cercle central
         c.setFillColor(self.hex('gold'))
-        c.circle(WIDTH/2, HEIGHT/2 - 1*cm, 3*cm, fill=True, stroke=False)
+        c.circle(self.width/2, self.height/2 - 1*cm, 3*cm, fill=True, stroke=False)
         c.setFillColor(self.hex('dark'))
         c.setFont("Helvetica-Bold", 48)
-        c.drawCentredString(WIDTH/2, HEIGHT/2 - 0.5*cm, "30")
+        c.drawCentredString(self.width/2, self.height/2 - 0.5*cm, "30")
         c.setFont("Helvetica", 14)
-        c.drawCentredString(WIDTH/2, HEIGHT/2 - 1.8*cm, "OUVERTURES")
+        c.drawCentredString(self.width/2, self.height/2 - 1.8*cm, "OUVERTURES")
         
         # 3 niveaux
-        y_level = HEIGHT/2 - 5*cm
+        y_level = self.height/2 - 5*cm
         levels_data = [
             ('green_dark', '10', 'DÉBUTANT'),
             ('yellow_dark', '10', 'INTERMÉDIAIRE'),
             ('red_dark', '10', 'AVANCÉ'),
         ]
-        x_positions = [WIDTH/2 - 5*cm, WIDTH/2, WIDTH/2 + 5*cm]
+        x_positions = [self.width/2 - 5*cm, self.width/2, self.width/2 + 5*cm]
         
         for i, (color, num, label) in enumerate(levels_data):
             x = x_positions[i]
@@ -204,28 +337,27 @@ class EloBoosterPremium:
         ]
         y_feat = 6*cm
         for feat in features:
-            c.drawCentredString(WIDTH/2, y_feat, feat)
+            c.drawCentredString(self.width/2, y_feat, feat)
             y_feat -= 0.6*cm
         
         # Footer
         c.setFillColor(self.hex('gray_light'))
         c.setFont("Helvetica", 9)
-        c.drawCentredString(WIDTH/2, 1.5*cm, "© 2025 Elo Booster")
+        c.drawCentredString(self.width/2, 1.5*cm, "© 2025 Elo Booster")
 
     # === SOMMAIRE ===
     def generate_toc(self, levels):
         self.new_page()
+        self.page_map['toc'] = self.page_num
         c = self.c
         
         # Header
-        c.setFillColor(self.hex('dark'))
-        c.rect(0, HEIGHT - 3*cm, WIDTH, 3*cm, fill=True, stroke=False)
+        self.use_template('section_header', 3*cm)
         c.setFillColor(self.hex('gold'))
         c.setFont("Helvetica-Bold", 28)
-        c.drawCentredString(WIDTH/2, HEIGHT - 2*cm, "SOMMAIRE")
+        c.drawCentredString(self.width/2, self.height - 2*cm, "SOMMAIRE")
         
-        y = HEIGHT - 4.2*cm  # Position en points
-        page = 3
+        y = self.height - 4.2*cm  # Position en points
         
         level_info = {
             'Débutant': ('green_dark', 'green_medium', 'green_bg'),
@@ -233,8 +365,10 @@ class EloBoosterPremium:
             'Avancé': ('red_dark', 'red_medium', 'red_bg')
         }
         
-        content_width = WIDTH - 2*cm
-        row_height = 0.65*cm
+        content_width = self.width - 2*cm
+        # Lignes resserrées si le format est moins haut que l'A4 (US Letter) ; sélection vide : aucune ligne
+        rows = sum(len(ops) for ops in levels.values())
+        row_height = min(0.65*cm, (y - 1.1*cm - len(levels) * 1.6*cm) / rows) if rows else 0.65*cm
         
         for level_name in ['Débutant', 'Intermédiaire', 'Avancé']:
             ops = levels[level_name]
@@ -245,7 +379,7 @@ class EloBoosterPremium:
             c.roundRect(1*cm, y - 0.2*cm, content_width, 0.9*cm, 4, fill=True, stroke=False)
             c.setFillColor(colors.white)
             c.setFont("Helvetica-Bold", 12)
-            c.drawCentredString(WIDTH/2, y + 0.1*cm, f"━━  {level_name.upper()}  ━━  {len(ops)} ouvertures  ━━")
+            c.drawCentredString(self.width/2, y + 0.1*cm, f"━━  {level_name.upper()}  ━━  {len(ops)} ouvertures  ━━")
             y -= 1.2*cm
             
             # Ouvertures
@@ -256,7 +390,7 @@ class EloBoosterPremium:
                     c.rect(1*cm, y - 0.15*cm, content_width, row_height, fill=True, stroke=False)
                 
                 # Nom (sans le nom alternatif)
-                name = op['name']
+                name = op.name
                 name = self.fit_text(name, "Helvetica-Bold", 10, 6.2*cm)
                 
                 c.setFillColor(self.hex('dark'))
@@ -264,7 +398,7 @@ class EloBoosterPremium:
                 c.drawString(1.3*cm, y, name)
                 
                 # Coups
-                moves = self.fit_text(op.get('moves', ''), "Helvetica", 9, 4.5*cm)
+                moves = self.fit_text(op.moves, "Helvetica", 9, 4.5*cm)
                 c.setFillColor(self.hex('gray'))
                 c.setFont("Helvetica", 9)
                 c.drawString(7.8*cm, y, moves)
@@ -272,339 +406,76 @@ class EloBoosterPremium:
                 # Stats
                 c.setFillColor(self.hex('dark'))
                 c.setFont("Helvetica-Bold", 9)
-                c.drawString(12.8*cm, y, f"⚪{op.get('white_win', '')}%")
+                c.drawString(12.8*cm, y, f"⚪{op.white_win}%")
                 
-                # Page dans cercle
+                # Page dans cercle (numéro réel, résolu après placement des fiches)
                 c.setFillColor(self.hex(medium))
-                c.circle(WIDTH - 1.3*cm, y + 0.1*cm, 0.3*cm, fill=True, stroke=False)
-                c.setFillColor(colors.white)
-                c.setFont("Helvetica-Bold", 8)
-                c.drawCentredString(WIDTH - 1.3*cm, y - 0.05*cm, str(page))
+                c.circle(self.width - 1.3*cm, y + 0.1*cm, 0.3*cm, fill=True, stroke=False)
+                self.page_ref(op.file, self.width - 1.3*cm, y - 0.05*cm)
+                c.linkRect('', op.file, (1*cm, y - 0.15*cm, 1*cm + content_width, y - 0.15*cm + row_height))
                 
                 y -= row_height
-                page += 1
             
             y -= 0.4*cm
         
         # Footer
         c.setFillColor(self.hex('gray'))
         c.setFont("Helvetica", 8)
-        c.drawCentredString(WIDTH/2, 0.8*cm, "— 2 —")
+        c.drawCentredString(self.width/2, 0.8*cm, f"— {self.page_num} —")
 
     # === FICHE D'OUVERTURE ===
     def generate_opening(self, data):
         self.new_page()
-        c = self.c
-        
-        # Couleur selon niveau
-        complexity = data.get('complexity', 'Intermédiaire')
-        if 'Débutant' in complexity:
-            level_color = 'green_dark'
-        elif 'Avancé' in complexity:
-            level_color = 'red_dark'
-        else:
-            level_color = 'yellow_dark'
-        
-        content_width = WIDTH - 2*MARGIN
-        
-        # === HEADER ===
-        header_h = 2.8*cm
-        c.setFillColor(self.hex('dark'))
-        c.rect(0, HEIGHT - header_h, WIDTH, header_h, fill=True, stroke=False)
-        
-        # Bande couleur niveau
-        c.setFillColor(self.hex(level_color))
-        c.rect(0, HEIGHT - header_h, 0.5*cm, header_h, fill=True, stroke=False)
-        
-        # Titre (avec retour à la ligne si nécessaire)
-        title = data['name']
-        c.setFillColor(colors.white)
-        c.setFont("Helvetica-Bold", 20)
-        
-        max_title_width = 10*cm
-        if c.stringWidth(title, "Helvetica-Bold", 20) > max_title_width:
-            # Retour à la ligne
-            lines = self.wrap_text(title, "Helvetica-Bold", 20, max_title_width)
-            c.drawString(1.2*cm, HEIGHT - 1*cm, lines[0])
-            if len(lines) > 1:
-                c.setFont("Helvetica-Bold", 18)
-                c.drawString(1.2*cm, HEIGHT - 1.6*cm, lines[1])
+        self.page_map[data.file] = self.page_num
+        self.c.bookmarkPage(data.file)
+        if self.display_lists:
+            key = self.sheet_key(data)
+            dl = self.display_lists.get(key)
+            if dl is None:
+                self.c, page = Recorder(), self.c
+                try:
+                    self.draw_opening(data)
+                finally:
+                    self.c, dl = page, self.c.display_list()
+                self.display_lists.put(key, dl)
+            dl.replay(self.c, self.use_template)
         else:
-            c.drawString(1.2*cm, HEIGHT - 1.2*cm, title)
-        
-        # Sous-titre
-        subtitle = data.get('moves', '')
-        if data.get('alt_name'):
-            subtitle = f"{data['alt_name']} • {subtitle}"
-        subtitle = self.fit_text(subtitle, "Helvetica", 10, 10*cm)
-        c.setFont("Helvetica", 10)
-        c.setFillColor(self.hex('gold'))
-        c.drawString(1.2*cm, HEIGHT - 2.1*cm, subtitle)
-        
-        # Infos droite
-        c.setFillColor(colors.white)
-        c.setFont("Helvetica", 9)
-        c.drawRightString(WIDTH - 1*cm, HEIGHT - 0.8*cm, f"Niveau: {complexity}")
-        champions = self.fit_text(data.get('champions', ''), "Helvetica", 9, 6*cm)
-        c.drawRightString(WIDTH - 1*cm, HEIGHT - 1.3*cm, f"Champions: {champions}")
-        
-        # Stats
-        c.setFillColor(colors.white)
-        c.setFont("Helvetica-Bold", 14)
-        c.drawRightString(WIDTH - 3*cm, HEIGHT - 2.2*cm, f"⚪ {data.get('white_win', '')}%")
-        c.setFillColor(colors.gray)
-        c.drawRightString(WIDTH - 1 * cm, HEIGHT - 2.2 * cm,   f"⚫ {data.get('black_win', '')}%")
-        # === POSITION + IDÉE ===
-        y = HEIGHT - header_h - 0.4*cm
-        
-        # Échiquier
-        board_size = 5.8*cm
-        try:
-            fen = data.get('uci_moves', '')
-            board = chess.Board()
-            for m in fen.split():
-                board.push_uci(m)
-            img = self.board_png(board.fen(), data.get('highlights_green'), data.get('highlights_red'), 400)
-            c.drawImage(img, MARGIN, y - board_size, board_size, board_size)
-        except: pass
-        
-        # Idée principale
-        idea_x = MARGIN + board_size + 0.3*cm
-        idea_w = content_width - board_size - 0.3*cm
-        self.draw_rect(idea_x, y - board_size, idea_w, board_size, 'light', 4)
-        
-        c.setFillColor(self.hex('dark'))
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(idea_x + 0.3*cm, y - 0.4*cm, "💡 IDÉE PRINCIPALE")
-        
-        # Ligne déco
-        c.setStrokeColor(self.hex('gold'))
-        c.setLineWidth(1.5)
-        c.line(idea_x + 0.3*cm, y - 0.65*cm, idea_x + idea_w - 0.3*cm, y - 0.65*cm)
-        
-        c.setFont("Helvetica", 9)
-        c.setFillColor(self.hex('dark'))
-        lines = self.wrap_text(data.get('idea', ''), "Helvetica", 12, idea_w - 0.6*cm)
-        ty = y - 1*cm
-        for line in lines[:12]:
-            c.drawString(idea_x + 0.3*cm, ty, line)
-            ty -= 0.38*cm
-        
-        y -= board_size + 0.4*cm
-        
-        # === ERREURS ===
-        err_h = 2.8*cm
-        col_w = content_width / 2 - 0.15*cm
-        
-        # Blancs
-        self.draw_rect(MARGIN, y - err_h, col_w, err_h, 'green', 4)
-        c.setFillColor(self.hex('dark'))
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(MARGIN + 0.3*cm, y - 0.4*cm, "⚪ ERREURS DES BLANCS")
-        c.setFont("Helvetica", 10)
-        ey = y - 0.85*cm
-        for err in data.get('errors_white', [])[:3]:
-            for line in self.wrap_text(f"• {err}", "Helvetica", 8, col_w - 0.5*cm)[:3]:
-                c.drawString(MARGIN + 0.3*cm, ey, line)
-                ey -= 0.32*cm
-            ey -= 0.08*cm
-        
-        # Noirs
-        col2_x = MARGIN + col_w + 0.3*cm
-        self.draw_rect(col2_x, y - err_h, col_w, err_h, 'red', 4)
-        c.setFillColor(self.hex('dark'))
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(col2_x + 0.3*cm, y - 0.4*cm, "⚫ ERREURS DES NOIRS")
-        c.setFont("Helvetica", 10)
-        ey = y - 0.85*cm
-        for err in data.get('errors_black', [])[:3]:
-            for line in self.wrap_text(f"• {err}", "Helvetica", 8, col_w - 0.5*cm)[:3]:
-                c.drawString(col2_x + 0.3*cm, ey, line)
-                ey -= 0.32*cm
-            ey -= 0.08*cm
-        
-        y -= err_h + 0.3*cm
-        
-        # === DÉFIS DE DÉVELOPPEMENT ===
-        dev_h = 2.0*cm
-        self.draw_rect(MARGIN, y - dev_h, content_width, dev_h, 'yellow_bg', 4)
-        
-        c.setFillColor(self.hex('dark'))
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(MARGIN + 0.3*cm, y - 0.35*cm, "🎯 DÉFIS DE DÉVELOPPEMENT")
-        
-        devs = data.get('development', [])
-        if devs:
-            c.setFont("Helvetica", 9)
-            col_w = content_width / 3
-            for i, dev in enumerate(devs[:6]):
-                col = i % 3
-                row = i // 3
-                dx = MARGIN + 0.3*cm + col * col_w
-                dy = y - 0.7*cm - row * 0.6*cm
-                
-                # dev peut être [piece_name, goal] ou {"piece_name": X, "goal": Y}
-                if isinstance(dev, list):
-                    piece_name = dev[0]
-                    goal = dev[1]
-                else:
-                    piece_name = dev.get('piece_name', '')
-                    goal = dev.get('goal', '')
-                
-                c.setFillColor(self.hex('dark'))
-                c.setFont("Helvetica-Bold", 9)
-                c.drawString(dx, dy, f"• {piece_name}:")
-                
-                c.setFont("Helvetica", 8)
-                goal_text = self.fit_text(goal, "Helvetica", 8, col_w - 0.8*cm)
-                c.drawString(dx, dy - 0.25*cm, goal_text)
-        
-        y -= dev_h + 1*cm
-        
-        # === PIÈGES ===
-        c.setFillColor(self.hex('dark'))
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(MARGIN, y, "⚠️ PIÈGES À CONNAÎTRE")
-        y -= 0.8*cm
-        
-        trap_w = content_width / 3 - 0.2*cm
-        trap_h = 3.2*cm
-        tx = MARGIN
-        
-        for trap in data.get('traps', [])[:3]:
-            self.draw_rect(tx, y - trap_h, trap_w, trap_h, 'light', 4)
-            
-            # Échiquier
-            board_mini_size = 2.2*cm
-            try:
-                img = self.board_mini(trap['fen'], trap.get('highlights'), 220)
-                c.drawImage(img, tx + 0.1*cm, y - 2.4*cm, board_mini_size, board_mini_size)
-            except: pass
-            
-            # Nom (avec retour à la ligne)
-            text_x = tx + board_mini_size + 0.2*cm
-            text_w = trap_w - board_mini_size - 0.4*cm
-            
-            c.setFillColor(self.hex('dark'))
-            c.setFont("Helvetica-Bold", 9)
-            trap_name = trap.get('name', '')
-            name_lines = self.wrap_text(trap_name, "Helvetica-Bold", 9, text_w)
-            ny = y - 0.3*cm
-            for line in name_lines[:2]:
-                c.drawString(text_x, ny, line)
-                ny -= 0.28*cm
-            
-            # Description
-            c.setFont("Helvetica", 8)
-            desc_lines = self.wrap_text(trap.get('desc', ''), "Helvetica", 8, text_w)
-            dy = ny - 0.1*cm
-            for line in desc_lines[:10]:
-                c.drawString(text_x, dy, line)
-                dy -= 0.24*cm
-            
-            tx += trap_w + 0.3*cm
-        
-        y -= trap_h + 1*cm
-        
-        # === VARIANTES ===
-        c.setFillColor(self.hex('dark'))
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(MARGIN, y, "📚 VARIANTES PRINCIPALES")
-        y -= 0.8*cm
-        
-        var_w = content_width / 3 - 0.2*cm
-        var_h = 3.8*cm
-        vx = MARGIN
-        
-        for var in data.get('variants', [])[:3]:
-            self.draw_rect(vx, y - var_h, var_w, var_h, 'light', 4)
-            
-            # Échiquier
-            board_mini_size = 2.2*cm
-            try:
-                board = chess.Board()
-                for m in var.get('uci', '').split():
-                    board.push_uci(m)
-                img = self.board_mini(board.fen(), var.get('highlights'), 220)
-                c.drawImage(img, vx + 0.1*cm, y - 2.5*cm, board_mini_size, board_mini_size)
-            except: pass
-            
-            # Infos
-            text_x = vx + board_mini_size + 0.2*cm
-            text_w = var_w - board_mini_size - 0.4*cm
-            
-            c.setFillColor(self.hex('dark'))
-            c.setFont("Helvetica-Bold", 9)
-            var_name = var.get('name', '')
-            name_lines = self.wrap_text(var_name, "Helvetica-Bold", 9, text_w)
-            ny = y - 0.25*cm
-            for line in name_lines[:2]:
-                c.drawString(text_x, ny, line)
-                ny -= 0.26*cm
-            
-            c.setFont("Helvetica", 8)
-            var_moves = self.fit_text(var.get('moves', ''), "Helvetica", 8, text_w)
-            c.drawString(text_x, ny - 0.05*cm, var_moves)
-            
-            # Stats
-            c.setFont("Helvetica-Bold", 8)
-            ww = var.get('white_win', '')
-            bw = var.get('black_win', '')
-            c.drawString(text_x, ny - 0.35*cm, f"⚪{ww}% ⚫{bw}% ")
-            
-            # Plans
-            plan_y = ny - 0.85*cm
-            
-
-            c.setFont("Helvetica-Bold", 8)
-            c.drawString(text_x, plan_y, "Blancs:")
-            
-            c.setFillColor(self.hex('dark'))
-            c.setFont("Helvetica", 8)
-            for i, line in enumerate(self.wrap_text(var.get('white_plan', ''), "Helvetica", 8, text_w)[:3]):
-                c.drawString(text_x, plan_y - 0.25*cm - i*0.22*cm, line)
-            
-            plan_y2 = plan_y - 1*cm
+            self.draw_opening(data)
 
-            c.setFont("Helvetica-Bold", 8)
-            c.drawString(text_x, plan_y2, "Noirs:")
-            
-            c.setFillColor(self.hex('dark'))
-            c.setFont("Helvetica", 5.5)
-            for i, line in enumerate(self.wrap_text(var.get('black_plan', ''), "Helvetica", 8, text_w)[:3]):
-                c.drawString(text_x, plan_y2 - 0.25*cm - i*0.22*cm, line)
-            
-            vx += var_w + 0.3*cm
-        
         # Footer
-        c.setFillColor(self.hex('gray'))
-        c.setFont("Helvetica", 9)
-        c.drawCentredString(WIDTH/2, 0.5*cm, f"— {self.page_num} —")
+        self.c.setFillColor(self.hex('gray'))
+        self.c.setFont("Helvetica", 9)
+        self.c.drawCentredString(self.width/2, 0.5*cm, f"— {self.page_num} —")
+
+    def sheet_key(self, data):
+        """Clé de la liste d'affichage d'une fiche ; les échiquiers y sont stockés compressés au niveau du build"""
+        return content_key('opening', LAYOUT_KEY, LIB_VERSIONS, self.geometry.key(), self.raster is not None,
+                           self.compressor.level, value_key(data))
+
+    def draw_opening(self, data):
+        """Contenu d'une fiche, sans le numéro de page : enregistrable en liste d'affichage"""
+        self.sheet.render(self, data)
 
     # === CHECKLIST ===
     def generate_checklist(self):
         self.new_page()
+        self.page_map['checklist'] = self.page_num
         c = self.c
         
-        # Header
-        c.setFillColor(self.hex('dark'))
-        c.rect(0, HEIGHT - 3.5*cm, WIDTH, 3.5*cm, fill=True, stroke=False)
-        
-        # Bande dorée
-        c.setFillColor(self.hex('gold'))
-        c.rect(0, HEIGHT - 3.5*cm, WIDTH, 0.4*cm, fill=True, stroke=False)
+        # Header + bande dorée
+        self.use_template('section_header', 3.5*cm, 0.4*cm)
         
         c.setFillColor(self.hex('gold'))
         c.setFont("Helvetica-Bold", 32)
-        c.drawCentredString(WIDTH/2, HEIGHT - 2*cm, "✓ CHECKLIST")
+        c.drawCentredString(self.width/2, self.height - 2*cm, "✓ CHECKLIST")
         
         c.setFillColor(colors.white)
         c.setFont("Helvetica", 14)
-        c.drawCentredString(WIDTH/2, HEIGHT - 2.8*cm, "10 questions à se poser AVANT chaque coup")
+        c.drawCentredString(self.width/2, self.height - 2.8*cm, "10 questions à se poser AVANT chaque coup")
         
         # Contenu
-        y = HEIGHT - 5*cm
-        content_width = WIDTH - 3*cm
+        y = self.height - 5*cm
+        content_width = self.width - 3*cm
         
         checklist = [
             {
@@ -712,41 +583,37 @@ class EloBoosterPremium:
             y -= item_height
         
         # Footer avec conseil
-        c.setFillColor(self.hex('gold'))
-        c.rect(1.5*cm, 1.2*cm, content_width, 1.2*cm, fill=True, stroke=False)
+        self.use_template('tip_box', 1.5*cm, 1.2*cm, content_width, 1.2*cm)
         c.setFillColor(self.hex('dark'))
         c.setFont("Helvetica-Bold", 11)
-        c.drawCentredString(WIDTH/2, 1.95*cm, "💡 ASTUCE : Mémoriser \"É-P-M-T\" (Échec, Prise, Menace, Tactique)")
+        c.drawCentredString(self.width/2, 1.95*cm, "💡 ASTUCE : Mémoriser \"É-P-M-T\" (Échec, Prise, Menace, Tactique)")
         c.setFont("Helvetica", 9)
-        c.drawCentredString(WIDTH/2, 1.5*cm, "Les 4 premiers points couvrent 80% des erreurs. Toujours les vérifier !")
+        c.drawCentredString(self.width/2, 1.5*cm, "Les 4 premiers points couvrent 80% des erreurs. Toujours les vérifier !")
         
         # Numéro de page
         c.setFillColor(self.hex('gray'))
         c.setFont("Helvetica", 9)
-        c.drawCentredString(WIDTH/2, 0.5*cm, f"— {self.page_num} —")
+        c.drawCentredString(self.width/2, 0.5*cm, f"— {self.page_num} —")
 
     # === PAGE ZONES ===
     def generate_zones(self):
         self.new_page()
+        self.page_map['zones'] = self.page_num
         c = self.c
         
-        # Header
-        c.setFillColor(self.hex('dark'))
-        c.rect(0, HEIGHT - 3*cm, WIDTH, 3*cm, fill=True, stroke=False)
-        
-        c.setFillColor(self.hex('gold'))
-        c.rect(0, HEIGHT - 3*cm, WIDTH, 0.3*cm, fill=True, stroke=False)
+        # Header + bande dorée
+        self.use_template('section_header', 3*cm, 0.3*cm)
         
         c.setFillColor(self.hex('gold'))
         c.setFont("Helvetica-Bold", 26)
-        c.drawCentredString(WIDTH/2, HEIGHT - 1.7*cm, "🗺️ LES 3 ZONES DE L'ÉCHIQUIER")
+        c.drawCentredString(self.width/2, self.height - 1.7*cm, "🗺️ LES 3 ZONES DE L'ÉCHIQUIER")
         
         c.setFillColor(colors.white)
         c.setFont("Helvetica", 11)
-        c.drawCentredString(WIDTH/2, HEIGHT - 2.4*cm, "Comprendre où se passe l'action pour mieux planifier")
+        c.drawCentredString(self.width/2, self.height - 2.4*cm, "Comprendre où se passe l'action pour mieux planifier")
         
-        y = HEIGHT - 3.8*cm
-        content_width = WIDTH - 1.6*cm
+        y = self.height - 3.8*cm
+        content_width = self.width - 1.6*cm
         zone_height = 8.5*cm
         
         zones = [
@@ -900,29 +767,26 @@ class EloBoosterPremium:
         # Footer
         c.setFillColor(self.hex('gray'))
         c.setFont("Helvetica", 9)
-        c.drawCentredString(WIDTH/2, 0.5*cm, f"— {self.page_num} —")
+        c.drawCentredString(self.width/2, 0.5*cm, f"— {self.page_num} —")
 
     # === PAGE STRUCTURES DE PIONS ===
-    def generate_pawn_structures(self):
+    def generate_pawn_structures(self, openings=None):
         self.new_page()
+        self.page_map['pawn_structures'] = self.page_num
         c = self.c
         
-        # Header
-        c.setFillColor(self.hex('dark'))
-        c.rect(0, HEIGHT - 3.2*cm, WIDTH, 3.2*cm, fill=True, stroke=False)
-        
-        c.setFillColor(self.hex('gold'))
-        c.rect(0, HEIGHT - 3.2*cm, WIDTH, 0.4*cm, fill=True, stroke=False)
+        # Header + bande dorée
+        self.use_template('section_header', 3.2*cm, 0.4*cm)
         
         c.setFillColor(self.hex('gold'))
         c.setFont("Helvetica-Bold", 28)
-        c.drawCentredString(WIDTH/2, HEIGHT - 1.8*cm, "♟️ STRUCTURES DE PIONS")
+        c.drawCentredString(self.width/2, self.height - 1.8*cm, "STRUCTURES DE PIONS")
         
         c.setFillColor(colors.white)
         c.setFont("Helvetica", 12)
-        c.drawCentredString(WIDTH/2, HEIGHT - 2.6*cm, "Les pions sont l'âme des échecs - Philidor")
+        c.drawCentredString(self.width/2, self.height - 2.6*cm, "Les pions sont l'âme des échecs - Philidor")
         
-        y = HEIGHT - 4*cm
+        y = self.height - 4*cm
         
         structures = [
             {
@@ -975,7 +839,8 @@ class EloBoosterPremium:
             },
         ]
         
-        struct_w = (WIDTH - 2.5*cm) / 2
+        index = PawnIndex.from_openings(openings) if openings and PawnIndex else None
+        struct_w = (self.width - 2.5*cm) / 2
         struct_h = 4*cm
         
         for i, struct in enumerate(structures):
@@ -1030,33 +895,41 @@ class EloBoosterPremium:
             for line in plan_lines[:2]:
                 c.drawString(sx + 0.2*cm, plan_y, line)
                 plan_y -= 0.24*cm
+            
+            # Ouvertures du corpus qui mènent vers cette structure
+            similar = index.leading_to(struct['fen'], k=3) if index else []
+            names = [name for name, _ in similar]
+            # Autant de noms que la largeur de l'encadré en laisse (format mobile)
+            while len(names) > 1 and c.stringWidth("Ouvertures : " + ', '.join(names), "Helvetica", 5.5) > struct_w - 0.4*cm:
+                names.pop()
+            if names:
+                c.setFillColor(self.hex('gray'))
+                c.setFont("Helvetica", 5.5)
+                c.drawString(sx + 0.2*cm, sy - struct_h + 0.12*cm, "Ouvertures : " + ', '.join(names))
         
         # Footer
         c.setFillColor(self.hex('gray'))
         c.setFont("Helvetica", 9)
-        c.drawCentredString(WIDTH/2, 0.5*cm, f"— {self.page_num} —")
+        c.drawCentredString(self.width/2, 0.5*cm, f"— {self.page_num} —")
 
     # === PAGE TACTIQUES ===
     def generate_tactics(self):
         self.new_page()
+        self.page_map['tactics'] = self.page_num
         c = self.c
         
-        # Header
-        c.setFillColor(self.hex('dark'))
-        c.rect(0, HEIGHT - 3*cm, WIDTH, 3*cm, fill=True, stroke=False)
-        
-        c.setFillColor(self.hex('gold'))
-        c.rect(0, HEIGHT - 3*cm, WIDTH, 0.3*cm, fill=True, stroke=False)
+        # Header + bande dorée
+        self.use_template('section_header', 3*cm, 0.3*cm)
         
         c.setFillColor(self.hex('gold'))
         c.setFont("Helvetica-Bold", 26)
-        c.drawCentredString(WIDTH/2, HEIGHT - 1.7*cm, "⚡ TACTIQUES ESSENTIELLES")
+        c.drawCentredString(self.width/2, self.height - 1.7*cm, "⚡ TACTIQUES ESSENTIELLES")
         
         c.setFillColor(colors.white)
         c.setFont("Helvetica", 11)
-        c.drawCentredString(WIDTH/2, HEIGHT - 2.4*cm, "Les motifs tactiques à reconnaître instantanément")
+        c.drawCentredString(self.width/2, self.height - 2.4*cm, "Les motifs tactiques à reconnaître instantanément")
         
-        y = HEIGHT - 3.6*cm
+        y = self.height - 3.6*cm
         
         # 8 tactiques avec échiquiers (4 lignes x 2 colonnes)
         tactics = [
@@ -1134,7 +1007,7 @@ class EloBoosterPremium:
             },
         ]
         
-        tact_w = (WIDTH - 1.6*cm) / 2 - 0.2*cm
+        tact_w = (self.width - 1.6*cm) / 2 - 0.2*cm
         tact_h = 4.8*cm
         
         for i, tact in enumerate(tactics):
@@ -1214,18 +1087,20 @@ class EloBoosterPremium:
             c.setFont("Helvetica", 8)
             c.drawString(ox + 2.5*cm, y - 0.5*cm, desc)
             ox += 4.8*cm
-            if ox > WIDTH - 4*cm:
+            if ox > self.width - 4*cm:
                 ox = 0.8*cm
                 y -= 0.5*cm
         
         # Footer
         c.setFillColor(self.hex('gray'))
         c.setFont("Helvetica", 9)
-        c.drawCentredString(WIDTH/2, 0.5*cm, f"— {self.page_num} —")
+        c.drawCentredString(self.width/2, 0.5*cm, f"— {self.page_num} —")
 
     # === GÉNÉRATION ===
-    def generate_complete(self, data_dir='data'):
-        openings = load_all_openings(data_dir)
+    def generate_complete(self, data_dir='data', previews_dir=None, all_sheets=False, query=None,
+                          openings=None):
+        if openings is None:
+            openings = load_all_openings(data_dir, **(query or {}))
         levels = categorize_and_sort(openings)
         
         print(f"📚 {len(openings)} ouvertures chargées")
@@ -1234,24 +1109,63 @@ class EloBoosterPremium:
         print(f"   🔴 {len(levels['Avancé'])} Avancé")
         
         # 1. Couverture
-        self.generate_cover()
+        with SECTIONS.time(('cover',)):
+            self.generate_cover()
         
         # 2. Sommaire
-        self.generate_toc(levels)
+        with SECTIONS.time(('toc',)):
+            self.generate_toc(levels)
         
         # 3. Fiches
         for level_name in ['Débutant', 'Intermédiaire', 'Avancé']:
             for op in levels[level_name]:
-                self.generate_opening(op)
-                print(f"   ✅ {op['name']}")
+                with SECTIONS.time(('sheet',)):
+                    self.generate_opening(op)
+                print(f"   ✅ {op.name}")
         
         # 4. Checklist
-        self.generate_checklist()
+        with SECTIONS.time(('checklist',)):
+            self.generate_checklist()
         print(f"   ✅ Checklist ajoutée")
         
-        self.c.save()
-        print(f"\n✅ Document généré: {len(openings)} fiches + checklist sur {self.page_num} pages")
+        # 5. Structures de pions, reliées aux ouvertures du corpus
+        with SECTIONS.time(('pawn_structures',)):
+            self.generate_pawn_structures(openings)
+        print(f"   ✅ Structures de pions ajoutées")
+        
+        with SECTIONS.time(('save',)):
+            self.resolve_page_refs()
+            self.c.save()
+        if self.optimize:
+            with SECTIONS.time(('optimize',)):
+                sizes = optimize_pdf(self.output_path)
+            if sizes:
+                print(f"   ✅ PDF optimisé (web) : {sizes[0]/1024:.0f} Ko → {sizes[1]/1024:.0f} Ko")
+        PAGES.inc(self.page_num, (self.geometry.name,))
+        if self.output_path != os.devnull:
+            OUTPUT_BYTES.inc(os.path.getsize(self.output_path), ('pdf',))
+        if previews_dir:
+            # Fiches absentes de la sélection (query, édition) : pas de visuel
+            targets = {name: self.page_map[key] for name, key in PREVIEWS.items() if key in self.page_map}
+            if all_sheets:
+                targets.update({op.file[:-5] + PREVIEW_SUFFIX: self.page_map[op.file]
+                                for op in openings})
+            with SECTIONS.time(('previews',)):
+                rendered, cached = export_previews(self.output_path, targets, previews_dir)
+            print(f"   ✅ Visuels : {rendered} pages rendues, {cached} depuis le cache")
+        print(f"\n✅ Document généré: {len(openings)} fiches + checklist + structures de pions sur {self.page_num} pages")
+
+def generate_formats(data_dir='data', formats=tuple(GEOMETRIES), output_path=OUTPUT_PDF,
+                     previews_dir=None, query=None, **options):
+    """Un PDF par format en un seul build : corpus chargé une fois, échiquiers, mesures de
+    texte et listes d'affichage partagés ; seul le placement dépendant du format est refait"""
+    openings = load_all_openings(data_dir, **(query or {}))
+    shared = None
+    for name in formats:
+        geometry = GEOMETRIES[name]
+        pdf = EloBoosterPremium(geometry.output_path(output_path), geometry=geometry, shared=shared, **options)
+        pdf.generate_complete(data_dir, previews_dir if name == 'a4' else None, openings=openings)
+        shared = shared or pdf
 
 if __name__ == '__main__':
-    pdf = EloBoosterPremium('Elo_Booster_FR_Premium.pdf')
-    pdf.generate_complete('data_fr')
+    generate_formats('data_fr')
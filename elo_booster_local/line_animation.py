@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Animations des lignes (GIF / WebP)
+Rejoue uci_moves de chaque ouverture et uci de chaque variante coup par coup. Les images sont
+en palette dès l'atlas : chaque case (fond, teinte, pièce) est quantifiée une fois, puis une
+image se déduit de la précédente en recopiant les seules cases modifiées (départ, arrivée,
+roque, prise en passant, marquage du dernier coup). Les lignes sont parcourues en arbre de
+préfixes : une position commune à plusieurs lignes (l'ouverture et ses variantes, les deux
+langues) n'est composée qu'une fois, et une animation identique d'une langue à l'autre n'est
+encodée qu'une fois.
+"""
+import argparse, io, os, sys, tempfile, time
+import numpy as np
+import chess
+from PIL import Image
+from board_raster import BoardRaster
+from build_cache import DiskCache, atomic_write, content_key
+from corpus import load_corpus
+from display_list import source_key
+from generate_en import COLORS
+from shard_build import LOCALES
+
+SIZE = 240
+LASTMOVE = ('#AAA23B', '#CDD16A')    # cases foncée / claire, comme chess.svg
+FRAME_MS = 600
+HOLD_MS = 2400                       # position finale surlignée
+FORMATS = ('gif', 'webp')
+ANIMATION_KEY = source_key('board_raster.py', 'line_animation.py')
+
+
+class LineAnimator:
+    """Images en palette d'une taille d'échiquier, composées case par case sur l'atlas"""
+
+    def __init__(self, raster=None, size=SIZE, coordinates=False):
+        self.atlas = (raster or BoardRaster()).atlas(size, coordinates)
+        self.palette = self._palette()
+        self.base = self._index(self.atlas.base)
+        self.tiles = {}
+        self.composed = self.copied = 0  # cases recomposées / images reprises d'un préfixe commun
+
+    def _palette(self):
+        """Palette de 256 couleurs tirée du fond et de toutes les cases possibles"""
+        samples = [self.atlas.base.reshape(-1, 3)]
+        for square in (chess.A1, chess.B1):
+            for color in (None, *LASTMOVE, COLORS['green'], COLORS['red']):
+                for symbol in (None, *'PNBRQKpnbrqk'):
+                    samples.append(self.atlas.tile(square, symbol, color).reshape(-1, 3))
+        strip = np.concatenate(samples)[:, None, :]
+        return Image.fromarray(strip).quantize(256, method=Image.Quantize.MEDIANCUT)
+
+    def _index(self, rgb):
+        return np.asarray(Image.fromarray(rgb).quantize(palette=self.palette, dither=Image.Dither.NONE))
+
+    def tile(self, square, symbol, color):
+        key = (square, symbol, color)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.tiles[key] = self._index(self.atlas.tile(square, symbol, color))
+        return tile
+
+    def state(self, board, fill):
+        pieces = board.piece_map()
+        return {sq: (pieces[sq].symbol() if sq in pieces else None, fill.get(sq))
+                for sq in set(pieces) | set(fill)}
+
+    def frame(self, parent, parent_state, state):
+        """Image de `state` déduite de celle de `parent_state` : seules les cases changées sont copiées"""
+        pixels = parent.copy()
+        for square in set(parent_state) | set(state):
+            cell = state.get(square, (None, None))
+            if cell != parent_state.get(square, (None, None)):
+                y0, y1, x0, x1 = self.atlas.box(square)
+                pixels[y0:y1, x0:x1] = self.tile(square, *cell)
+                self.composed += 1
+        return pixels
+
+    def image(self, pixels):
+        image = Image.frombytes('P', (pixels.shape[1], pixels.shape[0]), pixels.tobytes())
+        image.putpalette(self.palette.getpalette())
+        return image
+
+
+def _lastmove(move):
+    squares = (move.from_square, move.to_square)
+    return {sq: LASTMOVE[(chess.square_file(sq) + chess.square_rank(sq)) % 2] for sq in squares}
+
+
+def _highlights(green=(), red=()):
+    fill = {chess.parse_square(sq): COLORS['green'] for sq in green}
+    fill.update((chess.parse_square(sq), COLORS['red']) for sq in red)
+    return fill
+
+
+def _legal(uci):
+    """Coups jouables de la ligne ; l'animation s'arrête au premier coup illégal (signalé par corpus)"""
+    board, moves = chess.Board(), []
+    for move in uci.split():
+        try:
+            board.push_uci(move)
+        except ValueError:
+            break
+        moves.append(move)
+    return tuple(moves)
+
+
+def corpus_lines(locales=LOCALES):
+    """(nom de sortie, coups UCI, cases vertes, cases rouges) pour chaque ligne de chaque langue"""
+    lines = []
+    for script, data_dir in locales:
+        lang = data_dir.split('_')[-1]
+        for op in load_corpus(data_dir):
+            stem = os.path.join(lang, os.path.splitext(op.file)[0])
+            lines.append((stem, _legal(op.uci_moves), op.highlights_green, op.highlights_red))
+            for i, var in enumerate(op.variants, 1):
+                lines.append((f'{stem}_v{i}', _legal(var.uci), var.highlights, ()))
+    return lines
+
+
+def encode(frames, fmt):
+    """Animation en mémoire ; le GIF ne stocke de chaque image que le rectangle modifié"""
+    durations = [FRAME_MS] * (len(frames) - 1) + [HOLD_MS]
+    buf = io.BytesIO()
+    if fmt == 'gif':
+        frames[0].save(buf, 'GIF', save_all=True, append_images=frames[1:], duration=durations,
+                       loop=0, disposal=1, optimize=False)
+    else:
+        rgb = [frame.convert('RGB') for frame in frames]
+        rgb[0].save(buf, 'WEBP', save_all=True, append_images=rgb[1:], duration=durations,
+                    loop=0, lossless=True, method=1)   # libwebp ne réencode que les rectangles modifiés
+    return buf.getvalue()
+
+
+def export_animations(lines, out_dir, formats=('gif',), animator=None, cache=None):
+    """Écrit <out_dir>/<langue>/<fichier>[_v<n>].<fmt> ; retourne les compteurs du build"""
+    animator = animator or LineAnimator()
+    cache = cache or DiskCache('animations')
+    stats = {'lines': len(lines), 'frames': 0, 'positions': 0, 'encoded': 0, 'cached': 0, 'shared': 0}
+
+    # Arbre des préfixes : les lignes sont parcourues dans l'ordre lexicographique des coups,
+    # la pile garde les images du chemin courant et ne recompose que ce qui diverge
+    path, encoded = [], {}                   # path : (coup, image, état) de chaque position
+    start_state = animator.state(chess.Board(), {})
+    root = (None, animator.frame(animator.base, {}, start_state), start_state)   # position initiale
+    for name, moves, green, red in sorted(lines, key=lambda line: line[1]):
+        common = 0
+        while common < min(len(path), len(moves)) and path[common][0] == moves[common]:
+            common += 1
+        del path[common:]
+        animator.copied += common
+        board = chess.Board()
+        for move in moves[:common]:
+            board.push_uci(move)
+        for move in moves[common:]:
+            _, parent, parent_state = path[-1] if path else root
+            board.push(chess.Move.from_uci(move))
+            state = animator.state(board, _lastmove(board.peek()))
+            path.append((move, animator.frame(parent, parent_state, state), state))
+            stats['positions'] += 1
+        _, parent, parent_state = path[-1] if path else root
+        final = animator.frame(parent, parent_state, animator.state(board, _highlights(green, red)))
+        frames = [root[1]] + [pixels for _, pixels, _ in path] + [final]
+        stats['frames'] += len(frames)
+
+        for fmt in formats:
+            key = content_key(ANIMATION_KEY, animator.atlas.px, FRAME_MS, HOLD_MS, fmt, moves, tuple(green), tuple(red))
+            if key in encoded:
+                stats['shared'] += 1         # même animation dans l'autre langue
+            else:
+                data = cache.get(key)
+                if data is None:
+                    data = encode([animator.image(pixels) for pixels in frames], fmt)
+                    cache.put(key, data)
+                    stats['encoded'] += 1
+                else:
+                    stats['cached'] += 1
+                encoded[key] = data
+            atomic_write(os.path.join(out_dir, f'{name}.{fmt}'), encoded[key])
+    stats['squares'] = animator.composed
+    return stats
+
+
+def _full_frames(lines, raster):
+    """Référence : chaque position recomposée entière (board_png sans encodage PNG)"""
+    count = 0
+    for _, moves, green, red in lines:
+        board = chess.Board()
+        for move in moves:
+            board.push_uci(move)
+            raster.render(board.fen(), _lastmove(board.peek()), SIZE, coordinates=False)
+            count += 1
+        raster.render(board.fen(), _highlights(green, red), SIZE, coordinates=False)
+    return count
+
+
+def benchmark(out_dir='/tmp/elo_animations'):
+    raster = BoardRaster()
+    lines = corpus_lines()
+    t0 = time.perf_counter()
+    animator = LineAnimator(raster)
+    setup = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory() as root:
+        stats = export_animations(lines, out_dir, FORMATS, animator, DiskCache('animations', root, remote=None))
+    seconds = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    full = _full_frames(lines, raster)
+    full_seconds = time.perf_counter() - t0
+    sizes = {fmt: sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(out_dir)
+                      for f in files if f.endswith('.' + fmt)) for fmt in FORMATS}
+    print(f"📊 {stats['lines']} lignes ({len(LOCALES)} langues), {stats['frames']} images : "
+          f"{stats['positions']} positions composées, {animator.copied} reprises d'un préfixe commun")
+    print(f"   ⏱️ atlas + palette {setup:.2f} s, export {seconds:.2f} s "
+          f"({stats['encoded']} encodées, {stats['shared']} partagées entre langues)")
+    print(f"   ⏱️ composition : {stats['squares']} cases copiées ; recomposer chaque position entière "
+          f"prendrait {full_seconds:.2f} s pour {full} échiquiers")
+    print("   📄 " + ', '.join(f"{fmt.upper()} {size / 1e6:.1f} Mo" for fmt, size in sizes.items()))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['benchmark']:
+        benchmark(*sys.argv[2:3])
+        sys.exit()
+    parser = argparse.ArgumentParser(description="Animations GIF / WebP des lignes de coups")
+    parser.add_argument('--out', default='../animations')
+    parser.add_argument('--format', choices=FORMATS, action='append', help="gif (défaut), webp, ou les deux")
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    stats = export_animations(corpus_lines(), args.out, tuple(args.format or ('gif',)))
+    print(f"✅ {stats['lines']} animations dans {args.out} en {time.perf_counter() - t0:.1f} s "
+          f"({stats['encoded']} encodées, {stats['cached']} en cache, {stats['shared']} partagées)")
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Métriques de génération
+Compteurs, jauges et histogrammes exposés au format OpenMetrics : endpoint HTTP pour le mode
+service, fichier pour les batchs (ELO_METRICS_FILE, écrit à la sortie du processus). Chaque
+thread écrit dans son propre dictionnaire, sans verrou ni E/S ; seule la collecte additionne
+les dictionnaires de tous les threads. Les profondeurs de file sont lues à la collecte.
+"""
+import atexit, bisect, os, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_FILE = os.environ.get('ELO_METRICS_FILE')       # {pid} : un fichier par processus
+PREFIX = 'elo_'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.shards = []                     # un dictionnaire par thread : (métrique, labels) → valeur
+        self.local = threading.local()
+        self.lock = threading.Lock()         # création des shards et collecte seulement
+
+    def shard(self):
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = {}
+            with self.lock:
+                self.shards.append(shard)
+            return shard
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"métrique {metric.name} déjà déclarée")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def merged(self):
+        """Somme des shards : {(métrique, labels): valeur ou [compteurs des buckets, somme]}"""
+        with self.lock:
+            shards = list(self.shards)
+        total = {}
+        for shard in shards:
+            for key, value in list(shard.items()):
+                if isinstance(value, list):
+                    acc = total.setdefault(key, [0] * len(value))
+                    for i, v in enumerate(value):
+                        acc[i] += v
+                else:
+                    total[key] = total.get(key, 0) + value
+        return total
+
+    def reset(self):
+        """Après un fork : l'enfant repart de zéro (il hériterait sinon des valeurs du parent)"""
+        for metric in self.metrics.values():
+            if metric.kind == 'gauge':
+                metric.values.clear()    # les sources (track) sont relues dans l'enfant
+        self.shards = []
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+
+REGISTRY = Registry()
+os.register_at_fork(after_in_child=REGISTRY.reset)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=(), registry=REGISTRY):
+        self.name, self.help, self.labels = PREFIX + name, help, tuple(labels)
+        self.registry = registry
+        registry.register(self)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, value=1, labels=()):
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        super().__init__(name, help, labels, registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        counts = shard.get(key)
+        if counts is None:
+            counts = shard[key] = [0] * (len(self.buckets) + 2)   # buckets, +Inf, somme
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def time(self, labels=()):
+        return _Timer(self, labels)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 't0')
+
+    def __init__(self, histogram, labels):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.t0, self.labels)
+
+
+class Gauge(Metric):
+    """Valeur lue à la collecte : fonction → {labels: valeur}, ou dernière valeur posée par set()"""
+    kind = 'gauge'
+
+    def __init__(self, name, help, labels=(), registry=REGISTRY):
+        super().__init__(name, help, labels, registry)
+        self.values, self.sources = {}, []
+
+    def set(self, value, labels=()):
+        self.values[labels] = value
+
+    def track(self, source):
+        self.sources.append(source)
+
+    def collect(self):
+        values = dict(self.values)
+        for source in list(self.sources):
+            for labels, value in source().items():
+                values[labels] = values.get(labels, 0) + value
+        return values
+
+
+# === MÉTRIQUES DU GÉNÉRATEUR ===
+PAGES = Counter('pages_rendered', "Pages PDF terminées", ('format',))
+BOARDS = Counter('boards_rendered', "Échiquiers dessinés (hors mémo)", ('kind', 'backend'))
+CACHE = Counter('cache_requests', "Lectures de cache par niveau", ('tier', 'cache', 'result'))
+SECTIONS = Histogram('section_seconds', "Durée de rendu par section du livre", ('section',))
+OUTPUT_BYTES = Counter('output_bytes', "Octets écrits par type de sortie", ('kind',))
+COMPRESSED_BYTES = Counter('compressed_bytes', "Octets passés par la compression des flux", ('direction',))
+QUEUE_DEPTH = Gauge('queue_depth', "Travail en attente par file", ('queue',))
+
+
+# === EXPOSITION ===
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def openmetrics(registry=REGISTRY):
+    """Texte OpenMetrics de toutes les métriques déclarées"""
+    merged = registry.merged()
+    by_metric = {}
+    for (name, labels), value in merged.items():
+        by_metric.setdefault(name, []).append((labels, value))
+    lines = []
+    for metric in registry.metrics.values():
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        if metric.kind == 'counter':
+            for labels, value in sorted(by_metric.get(metric.name, ())):
+                lines.append(f'{metric.name}_total{_labels(metric.labels, labels)} {_number(value)}')
+        elif metric.kind == 'gauge':
+            for labels, value in sorted(metric.collect().items()):
+                lines.append(f'{metric.name}{_labels(metric.labels, labels)} {_number(value)}')
+        else:
+            for labels, counts in sorted(by_metric.get(metric.name, ())):
+                cumulative = 0
+                for bound, count in zip(metric.buckets + ('+Inf',), counts[:-1]):
+                    cumulative += count
+                    le = bound if isinstance(bound, str) else repr(float(bound))
+                    lines.append(f'{metric.name}_bucket{_labels(metric.labels, labels, [("le", le)])} {cumulative}')
+                lines.append(f'{metric.name}_count{_labels(metric.labels, labels)} {cumulative}')
+                lines.append(f'{metric.name}_sum{_labels(metric.labels, labels)} {_number(float(counts[-1]))}')
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+def dump(path=None, registry=REGISTRY):
+    """Fichier OpenMetrics (batchs) ; écrit d'un bloc, jamais pendant le rendu"""
+    from build_cache import atomic_write
+    path = (path or METRICS_FILE).format(pid=os.getpid())
+    atomic_write(path, openmetrics(registry).encode())
+    return path
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    server_version = 'EloBoosterMetrics/1'
+
+    def do_GET(self):
+        if self.path != '/metrics':
+            return self.send_error(404)
+        body = openmetrics(self.server.registry).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_in_thread(port=9464, host='127.0.0.1', registry=REGISTRY):
+    """Endpoint GET /metrics en arrière-plan ; retourne le serveur"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if METRICS_FILE:
+    atexit.register(dump)
+
+
+def benchmark(count=1_000_000, threads=4):
+    """Coût d'un enregistrement, seul puis en concurrence, contre un compteur protégé par un verrou"""
+    registry = Registry()
+    counter = Counter('bench', "bench", registry=registry)
+    histogram = Histogram('bench_seconds', "bench", registry=registry)
+    t0 = time.perf_counter()
+    for _ in range(count):
+        counter.inc()
+    inc = (time.perf_counter() - t0) / count
+    t0 = time.perf_counter()
+    for i in range(count):
+        histogram.observe(i * 1e-8)
+    observe = (time.perf_counter() - t0) / count
+
+    lock, locked = threading.Lock(), {'n': 0}
+
+    def with_lock():
+        for _ in range(count // threads):
+            with lock:
+                locked['n'] += 1
+
+    def per_thread():
+        for _ in range(count // threads):
+            counter.inc()
+
+    rates = {}
+    for name, target in (('verrou', with_lock), ('par thread', per_thread)):
+        workers = [threading.Thread(target=target) for _ in range(threads)]
+        t0 = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        rates[name] = (time.perf_counter() - t0) / count
+    total = registry.merged()[(counter.name, ())]
+    t0 = time.perf_counter()
+    text = openmetrics(registry)
+    collect = time.perf_counter() - t0
+    print(f"📊 inc() {inc * 1e9:.0f} ns, observe() {observe * 1e9:.0f} ns par appel")
+    print(f"   ⏱️ {threads} threads : par thread {rates['par thread'] * 1e9:.0f} ns/inc, "
+          f"compteur sous verrou {rates['verrou'] * 1e9:.0f} ns/inc (total exact : {total:,})")
+    print(f"   ⏱️ collecte OpenMetrics {collect * 1e3:.2f} ms ({len(text)} octets)")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['serve']:
+        # python metrics.py serve generate_en data_en → build sous observation, /metrics ouvert
+        script, data_dir = (sys.argv[2:4] + ['generate_en', 'data_en'][len(sys.argv[2:4]):])
+        server = serve_in_thread()
+        print(f"✅ http://127.0.0.1:{server.server_address[1]}/metrics")
+        module = __import__(script)
+        module.EloBoosterPremium(module.OUTPUT_PDF).generate_complete(data_dir)
+        print(openmetrics())
+        try:
+            threading.Event().wait()         # /metrics reste ouvert jusqu'à Ctrl+C
+        except KeyboardInterrupt:
+            pass
+    else:
+        benchmark(*map(int, sys.argv[1:3]))
@@ -0,0 +1,41 @@
+"""
+Elo Booster - Géométrie de page
+Format de sortie (A4, US Letter, mobile) : taille du papier, marge et espace de mise en page.
+Les formats étroits sont mis en page sur une largeur minimale puis réduits à l'échelle,
+pour garder les colonnes des fiches lisibles ; les autres sont mis en page à leur taille réelle.
+"""
+from reportlab.lib.pagesizes import A4, letter
+from reportlab.lib.units import cm
+
+
+class PageGeometry:
+    __slots__ = ('name', 'pagesize', 'margin', 'scale', 'width', 'height')
+
+    def __init__(self, name, pagesize, margin=0.8*cm, min_width=None):
+        self.name, self.pagesize, self.margin = name, pagesize, margin
+        self.scale = pagesize[0] / min_width if min_width and pagesize[0] < min_width else 1
+        # Dimensions de l'espace de mise en page (points avant réduction)
+        self.width, self.height = pagesize[0] / self.scale, pagesize[1] / self.scale
+
+    def key(self):
+        return (self.name, self.pagesize, self.margin, self.scale)
+
+    def begin_page(self, c):
+        """À appeler au début de chaque page : showPage réinitialise la transformation"""
+        if self.scale != 1:
+            c.scale(self.scale, self.scale)
+
+    def output_path(self, path):
+        """Nom du PDF de ce format (A4 : nom d'origine)"""
+        if self.name == 'a4':
+            return path
+        root, ext = path.rsplit('.', 1)
+        return f'{root}_{self.name}.{ext}'
+
+
+GEOMETRIES = {
+    'a4': PageGeometry('a4', A4),
+    'letter': PageGeometry('letter', letter),
+    # Écran de téléphone (≈ 9:19) ; mise en page sur 16 cm de large puis réduite
+    'mobile': PageGeometry('mobile', (10.8*cm, 22.8*cm), min_width=16*cm),
+}
@@ -0,0 +1,43 @@
+"""
+Elo Booster - Gabarits de page
+Les éléments fixes (bandeaux, bandes dorées, bande de niveau) sont compilés une fois
+par document en Form XObjects, puis réutilisés par chaque page avec doForm
+"""
+from reportlab.lib.units import cm
+
+
+def section_header(c, hex, width, height, header_h, band_h=0):
+    """Bandeau sombre en haut de page + bande dorée optionnelle à sa base"""
+    c.setFillColor(hex('dark'))
+    c.rect(0, height - header_h, width, header_h, fill=True, stroke=False)
+    if band_h:
+        c.setFillColor(hex('gold'))
+        c.rect(0, height - header_h, width, band_h, fill=True, stroke=False)
+
+
+def opening_header(c, hex, width, height, level_color):
+    """Bandeau des fiches d'ouverture avec la bande couleur du niveau"""
+    header_h = 2.8*cm
+    c.setFillColor(hex('dark'))
+    c.rect(0, height - header_h, width, header_h, fill=True, stroke=False)
+    c.setFillColor(hex(level_color))
+    c.rect(0, height - header_h, 0.5*cm, header_h, fill=True, stroke=False)
+
+
+def tip_box(c, hex, width, height, x, y, w, h):
+    """Encadré doré (bas de la checklist)"""
+    c.setFillColor(hex('gold'))
+    c.rect(x, y, w, h, fill=True, stroke=False)
+
+
+PAGE_TEMPLATES = {
+    'section_header': section_header,
+    'opening_header': opening_header,
+    'tip_box': tip_box,
+}
+
+
+def template_name(kind, *args):
+    """Nom de Form XObject stable et valide en PDF pour un gabarit paramétré"""
+    parts = [kind] + [f"{a * 100:.0f}" if isinstance(a, float) else str(a) for a in args]
+    return 'tpl_' + '_'.join(parts)
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Sortie PDF optimisée
+Compression des flux en parallèle à l'écriture, puis linéarisation (fast web view),
+object streams compressés et ressources dédoublonnées
+"""
+import hashlib, os, shutil, subprocess, sys, tempfile, time, weakref, zlib
+from concurrent.futures import ThreadPoolExecutor
+from reportlab import rl_config
+from reportlab.lib.boxstuff import aspectRatioFix
+from reportlab.lib.utils import ImageReader, _digester
+from reportlab.pdfbase import pdfdoc
+from reportlab.pdfgen import canvas
+from build_cache import atomic_path
+from metrics import COMPRESSED_BYTES, QUEUE_DEPTH
+
+try:
+    import pikepdf
+except ImportError:
+    pikepdf = None
+
+
+# Niveaux zlib : brouillon rapide, défaut de ReportLab, compression maximale pour la publication
+COMPRESSION_LEVELS = {'draft': 1, 'default': 6, 'release': 9}
+
+
+_compressors = weakref.WeakSet()
+
+
+def _after_fork():
+    """Les threads du pool ne survivent pas à fork() : chaque processus enfant repart d'un pool neuf"""
+    for compressor in _compressors:
+        compressor.pool = ThreadPoolExecutor(compressor.workers)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+# Flux en attente dans les pools, lus à la collecte des métriques
+QUEUE_DEPTH.track(lambda: {('compression',): sum(c.pool._work_queue.qsize() for c in list(_compressors))})
+
+
+def _compress(data, level):
+    out = zlib.compress(data, level)
+    COMPRESSED_BYTES.inc(len(data), ('in',))
+    COMPRESSED_BYTES.inc(len(out), ('out',))
+    return out
+
+
+class StreamCompressor:
+    """Compression zlib dans un pool de threads (zlib libère le GIL). Les images sont
+    mémorisées par empreinte : les formats d'un même build ne les compressent qu'une fois"""
+
+    def __init__(self, level='default', workers=None):
+        self.level = COMPRESSION_LEVELS.get(level, level)
+        self.workers = workers or os.cpu_count()
+        self.pool = ThreadPoolExecutor(self.workers)
+        self.images = {}
+        self.names = weakref.WeakKeyDictionary()
+        _compressors.add(self)
+
+    def submit(self, data):
+        return self.pool.submit(_compress, data, self.level)
+
+    def image(self, name, raw):
+        if name not in self.images:
+            self.images[name] = self.submit(raw)
+        return self.images[name]
+
+    def image_name(self, reader):
+        """Nom XObject calculé comme ReportLab (empreinte des pixels + masque) ; une fois par image"""
+        name = self.names.get(reader)
+        if name is None:
+            name = self.names[reader] = _digester(reader.getRGBData() + b'None')
+        return name
+
+
+class _PendingStream(pdfdoc.PDFStream):
+    """Flux Flate dont le contenu compressé est attendu au moment de l'écriture"""
+
+    def __init__(self, future):
+        super().__init__(content=b'')
+        self.dictionary['Filter'] = pdfdoc.PDFArray([pdfdoc.PDFName('FlateDecode')])
+        self.future = future
+
+    def format(self, document):
+        self.content = self.future.result()
+        return super().format(document)
+
+
+class _PendingImage(pdfdoc.PDFImageXObject):
+    def __init__(self, name, size, mode, stream):
+        self.name, self.mask = name, None
+        self.width, self.height = size
+        self.colorSpace = pdfdoc._mode2CS[mode]
+        self.bitsPerComponent = 8
+        self._filters = ('FlateDecode',)
+        self.stream = stream                 # () -> octets Flate
+
+    def format(self, document):
+        self.streamContent = self.stream()
+        return super().format(document)
+
+
+class RawImage:
+    """Bitmap RGB en mémoire remis tel quel au canvas, sans passer par un PNG.
+    `deflated` : flux Flate prêt pour le PDF (octets ou Future du pool), calculé une fois"""
+    __slots__ = ('width', 'height', 'pixels', 'deflated', 'name')
+
+    def __init__(self, width, height, pixels=None, deflated=None, name=None):
+        self.width, self.height = width, height
+        self.pixels, self.deflated = pixels, deflated
+        self.name = name or hashlib.sha256(pixels).hexdigest()
+
+    @classmethod
+    def from_array(cls, rgb, compressor=None):
+        """Tableau NumPy (h, w, 3) ; avec un compresseur, le flux est calculé en arrière-plan"""
+        pixels = rgb.tobytes()
+        return cls(rgb.shape[1], rgb.shape[0], pixels, compressor and compressor.submit(pixels))
+
+    def getSize(self):
+        return self.width, self.height
+
+    def stream(self):
+        if self.deflated is None:
+            self.deflated = zlib.compress(self.pixels)
+        elif not isinstance(self.deflated, bytes):
+            self.deflated = self.deflated.result()
+        return self.deflated
+
+    def rgb(self):
+        return self.pixels if self.pixels is not None else zlib.decompress(self.stream())
+
+
+class PooledCanvas(canvas.Canvas):
+    """Canvas dont les flux de page, formulaires et images sont compressés en arrière-plan
+    dès leur création ; save() écrit les objets dans l'ordre en attendant chaque résultat.
+    Au niveau 'default', le fichier est identique à celui de canvas.Canvas.
+    drawImage accepte aussi une RawImage, intégrée avec son flux Flate déjà calculé"""
+
+    def __init__(self, filename, compressor=None, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.compressor = compressor or StreamCompressor()
+
+    def save(self):
+        """Écrit le PDF sous un nom temporaire puis le renomme : jamais de PDF partiel sous le nom final"""
+        target = self._filename
+        if not isinstance(target, str) or target == os.devnull:
+            return super().save()
+        with atomic_path(target) as tmp:
+            self._filename = tmp
+            try:
+                super().save()
+            finally:
+                self._filename = target
+
+    def _pooled(self):
+        return not rl_config.useA85          # ASCII85 : chaîne de filtres de ReportLab
+
+    def showPage(self):
+        super().showPage()
+        page = self._doc.Pages.pages[-1]
+        if self._pooled() and page.compression and page.stream:
+            page.Contents = _PendingStream(self.compressor.submit(page.stream.encode('utf8')))
+
+    def endForm(self, **extra_attributes):
+        name = self._formData[0]
+        super().endForm(**extra_attributes)
+        form = self._doc.idToObject[self._doc.getXObjectName(name)]
+        if self._pooled() and form.compression and form.stream:
+            form.Contents = _PendingStream(self.compressor.submit(form.stream))
+
+    def drawImage(self, image, x, y, width=None, height=None, mask=None, **kwargs):
+        if isinstance(image, RawImage):
+            name = image.name
+        elif self._pooled() and isinstance(image, ImageReader) and mask is None and not kwargs:
+            name = self.compressor.image_name(image)
+            if image._dataA is not None:      # canal alpha : SMask géré par ReportLab
+                return super().drawImage(image, x, y, width, height, mask)
+        else:
+            return super().drawImage(image, x, y, width, height, mask, **kwargs)
+        reg = self._doc.getXObjectName(name)
+        if reg not in self._doc.idToObject:
+            if isinstance(image, RawImage):
+                if image.deflated is None:
+                    image.deflated = self.compressor.image(name, image.pixels)
+                img = _PendingImage(name, image.getSize(), 'RGB', image.stream)
+            else:
+                img = _PendingImage(name, image.getSize(), image.mode,
+                                    self.compressor.image(name, image.getRGBData()).result)
+            self._setXObjects(img)
+            self._doc.Reference(img, reg)
+            self._doc.addForm(name, img)
+        w, h = image.getSize()
+        x, y, width, height, _ = aspectRatioFix(False, 'c', x, y, width, height, w, h)
+        self._currentPageHasImages = 1
+        self.saveState()
+        self.translate(x, y)
+        self.scale(width, height)
+        self._code.append(f"/{reg} Do")
+        self.restoreState()
+        self._formsinuse.append(name)
+        return w, h
+
+
+def _resource_key(obj):
+    """Empreinte d'un objet PDF partageable (stream, police...) ou None"""
+    if isinstance(obj, pikepdf.Stream):
+        meta = {k: v for k, v in obj.items() if k != '/Length'}
+        return hashlib.sha256(obj.read_raw_bytes() + repr(sorted(
+            (k, v.unparse() if hasattr(v, 'unparse') else str(v)) for k, v in meta.items()
+        )).encode()).hexdigest()
+    if isinstance(obj, pikepdf.Dictionary) and obj.get('/Type') in ('/Font', '/FontDescriptor', '/ExtGState'):
+        return hashlib.sha256(obj.unparse(resolved=True)).hexdigest()
+    return None
+
+
+def _relink(container, duplicates, seen):
+    """Remplace récursivement les références vers un doublon par l'objet canonique"""
+    if container.is_indirect:
+        if container.objgen in seen:
+            return
+        seen.add(container.objgen)
+    if isinstance(container, (pikepdf.Dictionary, pikepdf.Stream)):
+        items = list(container.items())
+        for key, val in items:
+            if val.is_indirect and val.objgen in duplicates:
+                container[key] = duplicates[val.objgen]
+            elif isinstance(val, (pikepdf.Dictionary, pikepdf.Array, pikepdf.Stream)):
+                _relink(val, duplicates, seen)
+    elif isinstance(container, pikepdf.Array):
+        for i, val in enumerate(list(container)):
+            if val.is_indirect and val.objgen in duplicates:
+                container[i] = duplicates[val.objgen]
+            elif isinstance(val, (pikepdf.Dictionary, pikepdf.Array, pikepdf.Stream)):
+                _relink(val, duplicates, seen)
+
+
+def dedupe_resources(pdf):
+    """Fusionne les images, polices et états graphiques identiques. Retourne le nombre de doublons"""
+    canonical, duplicates = {}, {}
+    for obj in pdf.objects:
+        if not isinstance(obj, (pikepdf.Dictionary, pikepdf.Stream)):
+            continue
+        key = _resource_key(obj)
+        if key is None:
+            continue
+        if key in canonical:
+            duplicates[obj.objgen] = canonical[key]
+        else:
+            canonical[key] = obj
+    if duplicates:
+        seen = set()
+        for page in pdf.pages:
+            _relink(page.obj, duplicates, seen)
+    return len(duplicates)
+
+
+def _ascii_streams(pdf):
+    """Vrai si des flux sont encodés en ASCII85 (rl_config.useA85) : il faut les réencoder"""
+    return any('/ASCII85Decode' in str(obj.get('/Filter', '')) for obj in pdf.objects
+               if isinstance(obj, pikepdf.Stream))
+
+
+def optimize_pdf(path, linearize=True):
+    """Réécrit le PDF sur place : linéarisé, object streams + xref streams, ressources dédoublonnées.
+    Retourne (taille_avant, taille_après), ou None si le PDF est laissé tel quel"""
+    before = os.path.getsize(path)
+    if pikepdf is None and not shutil.which('qpdf'):
+        print("⚠️ pikepdf/qpdf introuvable : PDF laissé tel quel (pip install pikepdf)")
+        return None
+    with atomic_path(path) as tmp:
+        if pikepdf is not None:
+            with pikepdf.open(path) as pdf:
+                # Flux déjà en Flate binaire : recopiés tels quels (la recompression coûte
+                # plusieurs secondes pour quelques Ko)
+                recompress = _ascii_streams(pdf)
+                dedupe_resources(pdf)
+                pdf.remove_unreferenced_resources()
+                pdf.save(tmp, linearize=linearize,
+                         object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                         compress_streams=recompress,
+                         stream_decode_level=pikepdf.StreamDecodeLevel.generalized if recompress
+                         else pikepdf.StreamDecodeLevel.none)
+        else:
+            cmd = ['qpdf', '--object-streams=generate', '--compress-streams=y']
+            if linearize:
+                cmd.append('--linearize')
+            subprocess.run(cmd + [path, tmp], check=True)
+    return before, os.path.getsize(path)
+
+
+def benchmark(script='generate_en', data_dir='data_en'):
+    """Compare la sortie actuelle (c.save() seul) et la sortie optimisée : taille et temps"""
+    module = __import__(script)
+    fd, work = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    try:
+        t0 = time.perf_counter()
+        module.EloBoosterPremium(work, optimize=False).generate_complete(data_dir)
+        build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        sizes = optimize_pdf(work)
+        elapsed = time.perf_counter() - t0
+        if sizes is None:
+            return
+        before, after = sizes
+        linearized = ''
+        if pikepdf is not None:
+            with pikepdf.open(work) as pdf:
+                linearized = '✅ linéarisé' if pdf.is_linearized else '❌ non linéarisé'
+    finally:
+        os.remove(work)
+    print(f"\n📊 {script}: génération {build:.2f} s, optimisation {elapsed*1000:.0f} ms")
+    print(f"   {before/1024:.1f} Ko → {after/1024:.1f} Ko ({100*(before-after)/before:.1f}% en moins) {linearized}")
+
+
+def _synthetic_boards(count):
+    """Échiquiers de 400 px distincts (pièces en dégradé, bords anticrénelés), générés hors chrono"""
+    import numpy as np
+    from PIL import Image
+    rng = np.random.default_rng(0)
+    squares = (np.indices((8, 8)).sum(0) % 2).repeat(50, 0).repeat(50, 1)[..., None]
+    yy, xx = np.mgrid[0:50, 0:50]
+    disc = np.clip(22 - np.hypot(yy - 25, xx - 25), 0, 1)[..., None]
+    shade = (1 - np.hypot(yy - 18, xx - 18) / 60)[..., None]
+    boards = []
+    for _ in range(count):
+        rgb = np.where(squares, [181, 136, 99], [240, 217, 181]).astype(float)
+        for _ in range(16):
+            r, f = rng.integers(0, 8, 2) * 50
+            square = rgb[r:r+50, f:f+50]
+            square[:] = square * (1 - disc) + rng.integers(0, 256, 3) * shade * disc
+        boards.append(Image.fromarray(rgb.astype(np.uint8)))
+    return boards
+
+
+def _synthetic_book(c, boards):
+    """Une page par paire d'échiquiers, avec 40 lignes de texte"""
+    for page in range(len(boards) // 2):
+        for i, x in enumerate((40, 300)):
+            c.drawImage(ImageReader(boards[2 * page + i]), x, 560, 250, 250)
+        c.setFont('Helvetica', 8)
+        for line in range(40):
+            c.drawString(40, 530 - line * 12, f"Page {page} ligne {line} : 1.e4 e5 2.Nf3 Nc6 3.Bb5 a6 {line * page}")
+        c.rect(30, 30, 530, 790)
+        c.showPage()
+
+
+def benchmark_save(pages=300, workers=None):
+    """Temps de la phase d'écriture sur un livre synthétique : canvas ReportLab (séquentiel)
+    vs PooledCanvas à chaque niveau. Chez ReportLab les images sont compressées pendant le
+    dessin : le temps total (dessin + save) est aussi affiché"""
+    rl_config.useA85 = 0                     # comme les générateurs : Flate binaire
+    boards = _synthetic_boards(2 * pages)
+    print(f"📊 Livre synthétique de {pages} pages, {workers or os.cpu_count()} thread(s)")
+    fd, work = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    try:
+        for label, level in (('reportlab', None),) + tuple((name, name) for name in COMPRESSION_LEVELS):
+            if level is None:
+                c = canvas.Canvas(work, pageCompression=1)
+            else:
+                c = PooledCanvas(work, StreamCompressor(level, workers), pageCompression=1)
+            t0 = time.perf_counter()
+            _synthetic_book(c, boards)
+            t1 = time.perf_counter()
+            c.save()
+            t2 = time.perf_counter()
+            print(f"   ⏱️ {label:<9} save {(t2 - t1) * 1000:6.0f} ms, dessin + save {t2 - t0:5.2f} s, "
+                  f"{os.path.getsize(work) / 1024:7.0f} Ko")
+    finally:
+        os.remove(work)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['save']:
+        benchmark_save(*map(int, sys.argv[2:4]))
+    else:
+        benchmark(*sys.argv[1:3])
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Statistiques réelles depuis une base PGN
+Lit une base PGN (brute ou compressée) en flux, répartit les parties sur un pool de
+processus, rattache chaque partie aux lignes du corpus via un trie de coups SAN,
+puis réécrit white_win / black_win / draw dans les JSON. Reprise sur checkpoint.
+"""
+import argparse, bz2, glob, gzip, io, json, lzma, os, re, time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import chess
+from build_cache import atomic_write
+from corpus import patch_json
+
+BLOCK_SIZE = 8 * 1024 * 1024
+GAME_START = b'\n[Event '
+RESULTS = {b'1-0': 0, b'1/2-1/2': 1, b'0-1': 2}
+SAN_TOKEN = re.compile(rb'O-O-O|O-O|0-0-0|0-0|[NBRQK]?[a-h]?[1-8]?x?[a-h][1-8](?:=[NBRQ])?')
+CASTLING = {b'0-0': b'O-O', b'0-0-0': b'O-O-O'}       # exports qui notent le roque avec des zéros
+RESULT_TAG = re.compile(rb'\[Result "([^"]+)"\]')
+COMMENT = re.compile(rb'\{[^}]*\}|;[^\n]*')
+VARIATION = re.compile(rb'\([^()]*\)')
+
+_trie = None
+_depth = 0
+
+
+def _san_tokens(uci_moves):
+    """Coups UCI → SAN normalisés (sans +, #, annotations)"""
+    board, tokens = chess.Board(), []
+    for move in uci_moves.split():
+        move = board.parse_uci(move)
+        tokens.append(board.san(move).rstrip('+#').encode())
+        board.push(move)
+    return tokens
+
+
+def line_key(file_id, variant=None):
+    return file_id if variant is None else f"{file_id}#{variant}"
+
+
+def build_trie(data_dir):
+    """Trie {token: sous-trie} ; la clé None d'un nœud liste les lignes qui s'y terminent"""
+    trie, depth = {}, 0
+    for path in sorted(glob.glob(os.path.join(data_dir, '*.json'))):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        file_id = os.path.basename(path)
+        lines = [(line_key(file_id), data.get('uci_moves', ''))]
+        lines += [(line_key(file_id, i), var.get('uci', '')) for i, var in enumerate(data.get('variants', []))]
+        for key, uci in lines:
+            try:
+                tokens = _san_tokens(uci)
+            except ValueError as e:
+                print(f"⚠️ {key} ignorée : {e}")
+                continue
+            node = trie
+            for tok in tokens:
+                node = node.setdefault(tok, {})
+            node.setdefault(None, []).append(key)
+            depth = max(depth, len(tokens))
+    return trie, depth
+
+
+def _init_worker(trie, depth):
+    global _trie, _depth
+    _trie, _depth = trie, depth
+
+
+def _movetext(game):
+    end = game.rfind(b']\n')
+    text = game[end + 2:] if end >= 0 else game
+    text = COMMENT.sub(b' ', text)
+    while b'(' in text:
+        stripped = VARIATION.sub(b' ', text)
+        if stripped == text:
+            break
+        text = stripped
+    return text
+
+
+def count_chunk(chunk):
+    """Compte (blancs, nulles, noirs) par ligne du corpus pour un bloc de parties"""
+    counts, games = {}, 0
+    for game in chunk.split(GAME_START):
+        tag = RESULT_TAG.search(game)
+        if not tag:
+            continue
+        games += 1
+        result = RESULTS.get(tag.group(1))
+        if result is None:
+            continue
+        node = _trie
+        for i, match in enumerate(SAN_TOKEN.finditer(_movetext(game))):
+            if i >= _depth:
+                break
+            token = match.group()
+            node = node.get(CASTLING.get(token, token))
+            if node is None:
+                break
+            for key in node.get(None, ()):
+                counts.setdefault(key, [0, 0, 0])[result] += 1
+    return games, counts
+
+
+def open_pgn(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    if path.endswith('.xz'):
+        return lzma.open(path, 'rb')
+    if path.endswith('.zst'):
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+    return open(path, 'rb')
+
+
+def read_chunks(f, skip=0):
+    """Blocs de parties complètes ; (bloc, octets consommés) en flux décompressé"""
+    if skip and isinstance(f, io.BufferedReader):
+        f.seek(skip)
+        skip = 0
+    while skip:
+        skip -= len(f.read(min(skip, BLOCK_SIZE)))
+    leftover = b''
+    while True:
+        data = f.read(BLOCK_SIZE)
+        buf = leftover + data
+        if not data:
+            if buf.strip():
+                yield buf, len(buf)
+            return
+        cut = buf.rfind(GAME_START)
+        if cut <= 0:
+            leftover = buf
+            continue
+        yield buf[:cut + 1], cut + 1
+        leftover = buf[cut + 1:]
+
+
+def _source_id(path):
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_size, int(st.st_mtime)]
+
+
+def load_checkpoint(path, source):
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('source') == source:
+            return state
+    return {'source': source, 'offset': 0, 'games': 0, 'counts': {}}
+
+
+def save_checkpoint(path, state):
+    atomic_write(path, json.dumps(state).encode())
+
+
+def ingest(pgn_path, data_dir='data_en', workers=None, checkpoint=None, every=30):
+    """Parcourt la base et retourne l'état final {'games', 'counts': {ligne: [b, n, n]}}"""
+    trie, depth = build_trie(data_dir)
+    state = load_checkpoint(checkpoint, _source_id(pgn_path))
+    if state['offset']:
+        print(f"↩️ Reprise à {state['offset']/1e6:.0f} Mo ({state['games']} parties déjà comptées)")
+    counts = state['counts']
+    workers = workers or os.cpu_count()
+    t0 = last_save = time.perf_counter()
+    games_before = state['games']
+    with open_pgn(pgn_path) as f, ProcessPoolExecutor(workers, initializer=_init_worker,
+                                                      initargs=(trie, depth)) as pool:
+        pending = deque()
+
+        def collect():
+            fut, size = pending.popleft()
+            games, chunk_counts = fut.result()
+            for key, (w, d, b) in chunk_counts.items():
+                tot = counts.setdefault(key, [0, 0, 0])
+                tot[0] += w; tot[1] += d; tot[2] += b
+            state['games'] += games
+            state['offset'] += size
+
+        for chunk, size in read_chunks(f, state['offset']):
+            pending.append((pool.submit(count_chunk, chunk), size))
+            if len(pending) >= 2 * workers:
+                collect()
+                if checkpoint and time.perf_counter() - last_save > every:
+                    save_checkpoint(checkpoint, state)
+                    last_save = time.perf_counter()
+        while pending:
+            collect()
+    if checkpoint:
+        save_checkpoint(checkpoint, state)
+    elapsed = time.perf_counter() - t0
+    rate = (state['games'] - games_before) / elapsed * 60 if elapsed else 0
+    print(f"♟️ {state['games']} parties, {len(counts)} lignes rattachées — {rate:,.0f} parties/min")
+    return state
+
+
+def _percentages(w, d, b):
+    total = w + d + b
+    return round(100 * w / total), round(100 * b / total), round(100 * d / total)
+
+
+def write_back(counts, data_dirs, min_games=50):
+    """Réécrit white_win / black_win / draw (en %) et games dans chaque JSON ;
+    seules ces valeurs changent, la mise en forme manuelle des fichiers est conservée"""
+    for data_dir in data_dirs:
+        for path in sorted(glob.glob(os.path.join(data_dir, '*.json'))):
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+            data = json.loads(text)
+            file_id = os.path.basename(path)
+            updates = {}
+            for prefix, key in [((), line_key(file_id))] + [
+                    (('variants', i), line_key(file_id, i)) for i in range(len(data.get('variants', [])))]:
+                w, d, b = counts.get(key, (0, 0, 0))
+                if w + d + b < min_games:
+                    continue
+                for field, value in zip(('white_win', 'black_win', 'draw', 'games'),
+                                        _percentages(w, d, b) + (w + d + b,)):
+                    updates[prefix + (field,)] = value
+            patched = patch_json(text, updates)
+            if patched != text:
+                atomic_write(path, patched.encode('utf-8'))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Statistiques d'ouvertures depuis une base PGN")
+    parser.add_argument('pgn', help="fichier .pgn, .pgn.gz, .pgn.bz2, .pgn.xz ou .pgn.zst")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--checkpoint', help="fichier de reprise (JSON)")
+    parser.add_argument('--min-games', type=int, default=50)
+    parser.add_argument('--dry-run', action='store_true', help="compter sans réécrire les JSON")
+    args = parser.parse_args()
+    state = ingest(args.pgn, 'data_en', args.workers, args.checkpoint or args.pgn + '.checkpoint.json')
+    if not args.dry_run:
+        write_back(state['counts'], ['data_en', 'data_fr'], args.min_games)
+        print("✅ JSON mis à jour (data_en, data_fr)")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Visuels marketing
+Rasterise les pages du PDF (couverture, sommaire, checklist, fiches) en JPEG/WebP
+multi-tailles, en parallèle, avec cache par empreinte de contenu de page
+"""
+import io, os, re, shutil, subprocess, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from build_cache import DiskCache, atomic_write, content_key
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+PREVIEW_WIDTH = 1241            # A4 à 150 dpi, comme les visuels actuels du site
+RESPONSIVE_WIDTHS = (320, 640, 960)
+FORMATS = ('jpg', 'webp')
+QUALITY = 85
+
+
+_REF = re.compile(rb'(\d+) 0 R')
+
+
+def _object_key(doc, xref, memo):
+    """Empreinte d'un objet PDF et de tout ce qu'il référence (formes imbriquées, images, polices) :
+    chaque renvoi « n 0 R » est remplacé par l'empreinte de l'objet visé, pas par son numéro"""
+    if xref not in memo:
+        memo[xref] = b'cycle'
+        text = doc.xref_object(xref, compressed=True).encode()
+        parts = [_REF.sub(lambda m: _object_key(doc, int(m[1]), memo), text)]
+        if doc.xref_is_stream(xref):
+            parts.append(doc.xref_stream_raw(xref))
+        memo[xref] = content_key(*parts).encode()
+    return memo[xref]
+
+
+def page_fingerprints(pdf_path, pages):
+    """Empreinte de contenu par page : flux de contenu + ressources suivies récursivement
+    (renvois de page et gabarits sont des Form XObjects, absents du flux de la page)"""
+    if pymupdf is None:
+        with open(pdf_path, 'rb') as f:
+            whole = content_key(f.read())
+        return {n: content_key(whole, n) for n in pages}
+    prints, memo = {}, {}
+    with pymupdf.open(pdf_path) as doc:
+        for n in pages:
+            page = doc[n - 1]
+            kind, value = doc.xref_get_key(page.xref, 'Resources')
+            resources = value.encode() if kind != 'xref' else b'%d 0 R' % int(value.split()[0])
+            resources = _REF.sub(lambda m: _object_key(doc, int(m[1]), memo), resources)
+            prints[n] = content_key(page.read_contents(), page.rect.width, page.rect.height, resources)
+    return prints
+
+
+def _rasterize(pdf_path, page_no, width):
+    if pymupdf is not None:
+        with pymupdf.open(pdf_path) as doc:
+            page = doc[page_no - 1]
+            zoom = width / page.rect.width
+            pix = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+    if not shutil.which('pdftoppm'):
+        raise RuntimeError("pymupdf ou pdftoppm requis (pip install pymupdf)")
+    out = subprocess.run(['pdftoppm', '-f', str(page_no), '-l', str(page_no), '-png',
+                          '-scale-to-x', str(width), '-scale-to-y', '-1', pdf_path],
+                         check=True, capture_output=True).stdout
+    return Image.open(io.BytesIO(out)).convert('RGB')
+
+
+def _encode(img, fmt, quality):
+    buf = io.BytesIO()
+    if fmt == 'webp':
+        img.save(buf, 'WEBP', quality=quality, method=4)
+    else:
+        img.save(buf, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def render_derivatives(pdf_path, page_no, width, widths, formats, quality):
+    """Une rasterisation pleine taille, puis toutes les déclinaisons en une passe"""
+    img = _rasterize(pdf_path, page_no, width)
+    outputs = {}
+    for w in (width,) + tuple(w for w in widths if w < width):
+        scaled = img if w == width else img.resize((w, round(img.height * w / img.width)), Image.LANCZOS)
+        suffix = '' if w == width else f'-{w}w'
+        for fmt in formats:
+            outputs[f'{suffix}.{fmt}'] = _encode(scaled, fmt, quality)
+    return outputs
+
+
+def _pack(outputs):
+    buf = io.BytesIO()
+    for name, data in outputs.items():
+        head = name.encode()
+        buf.write(len(head).to_bytes(2, 'little') + head + len(data).to_bytes(8, 'little') + data)
+    return buf.getvalue()
+
+
+def _unpack(blob):
+    outputs, pos = {}, 0
+    while pos < len(blob):
+        n = int.from_bytes(blob[pos:pos + 2], 'little'); pos += 2
+        name = blob[pos:pos + n].decode(); pos += n
+        size = int.from_bytes(blob[pos:pos + 8], 'little'); pos += 8
+        outputs[name] = blob[pos:pos + size]; pos += size
+    return outputs
+
+
+def export_previews(pdf_path, targets, out_dir, width=PREVIEW_WIDTH, widths=RESPONSIVE_WIDTHS,
+                    formats=FORMATS, quality=QUALITY, workers=None, cache=None):
+    """targets : {nom_fichier: numéro_de_page}. Écrit <nom>.<fmt> et <nom>-<w>w.<fmt> dans out_dir.
+    Retourne (pages rendues, pages servies par le cache)"""
+    cache = cache or DiskCache('previews')
+    pages = sorted(set(targets.values()))
+    prints = page_fingerprints(pdf_path, pages)
+    keys = {n: content_key(prints[n], width, tuple(widths), tuple(formats), quality) for n in pages}
+
+    results = {}
+    for n in pages:
+        blob = cache.get(keys[n])
+        if blob is not None:
+            results[n] = _unpack(blob)
+    todo = [n for n in pages if n not in results]
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {n: pool.submit(render_derivatives, pdf_path, n, width, widths, formats, quality)
+                       for n in todo}
+            for n, fut in futures.items():
+                results[n] = fut.result()
+                cache.put(keys[n], _pack(results[n]))
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name, n in targets.items():
+        for suffix, data in results[n].items():
+            atomic_write(os.path.join(out_dir, name + suffix), data)
+    return len(todo), len(pages) - len(todo)
+
+
+if __name__ == '__main__':
+    # python previews.py generate_en data_en ..   → régénère le livre puis les visuels
+    script, data_dir = (sys.argv[1:3] + ['generate_en', 'data_en'][len(sys.argv[1:3]):])
+    out_dir = sys.argv[3] if len(sys.argv) > 3 else '..'
+    module = __import__(script)
+    pdf = module.EloBoosterPremium(module.OUTPUT_PDF)
+    t0 = time.perf_counter()
+    pdf.generate_complete(data_dir, previews_dir=out_dir)
+    print(f"⏱️ {time.perf_counter() - t0:.1f} s")
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Index de recherche plein texte
+Ouvertures (nom, idée, erreurs), pièges (nom, description) et variantes (nom, plans) de toutes
+les langues dans un index inversé compact, écrit d'un bloc sur disque et lu par mmap : le site
+et le service local ouvrent le même fichier sans le charger. Accents et ligatures repliés
+(« défense » = « defense »), préfixe sur le dernier mot, fautes de frappe (une édition) via
+un index de suppressions, classement BM25F avec poids par champ. Les scores BM25 de chaque
+(terme, document) sont calculés à la construction : une requête ne fait qu'additionner.
+"""
+import argparse, bisect, hashlib, json, mmap, os, random, re, struct, sys, tempfile, time, unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+from build_cache import atomic_write
+from corpus import load_corpus
+from content_store import LOCALES
+
+MAGIC = b'ELOIDX01'
+FIELD_BOOSTS = {'name': 3.0, 'idea': 1.5, 'errors_white': 1.0, 'errors_black': 1.0,
+                'desc': 1.2, 'white_plan': 1.0, 'black_plan': 1.0}
+K1, B = 1.2, 0.75
+PREFIX_TERMS = 64                    # termes au plus pour un préfixe (les plus fréquents)
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+FUZZY_MIN = 4                        # pas de faute de frappe tolérée sous 4 lettres
+SNIPPET = 160
+MAX_K = 100                          # résultats au plus par requête du service
+TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def fold(text):
+    """Minuscules sans accents ni ligatures"""
+    text = unicodedata.normalize('NFKD', text.lower().replace('œ', 'oe').replace('æ', 'ae'))
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def tokens(text):
+    return [t for t in TOKEN.findall(fold(text)) if len(t) > 1 or t.isdigit()]
+
+
+def _deletes(term):
+    return {term} | {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'little')
+
+
+def _one_edit(a, b):
+    """Au plus une insertion, suppression, substitution ou transposition de voisins"""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i:i + 2] == b[i:i + 2][::-1] and a[i + 2:] == b[i + 2:])
+    return a[i + 1:] == b[i:] if len(a) > len(b) else a[i:] == b[i + 1:]
+
+
+# === DOCUMENTS ===
+def corpus_documents(locales=LOCALES):
+    """Un document par ouverture, piège et variante : (métadonnées, {champ: texte})"""
+    docs = []
+    for locale, data_dir in locales.items():
+        for op in load_corpus(data_dir):
+            meta = {'locale': locale, 'file': op.file, 'opening': op.name}
+            docs.append(({**meta, 'kind': 'opening', 'title': op.name},
+                         {'name': f'{op.name} {op.alt_name or ""}', 'idea': op.idea or '',
+                          'errors_white': ' '.join(op.errors_white), 'errors_black': ' '.join(op.errors_black)}))
+            for i, trap in enumerate(op.traps):
+                docs.append(({**meta, 'kind': 'trap', 'index': i, 'title': trap.name},
+                             {'name': trap.name, 'desc': trap.desc}))
+            for i, var in enumerate(op.variants):
+                docs.append(({**meta, 'kind': 'variant', 'index': i, 'title': var.name},
+                             {'name': var.name, 'white_plan': var.white_plan or '', 'black_plan': var.black_plan or ''}))
+    return docs
+
+
+# === CONSTRUCTION ===
+def build_index(docs, path):
+    """Écrit l'index de `docs` dans `path` ; retourne (documents, termes, postings)"""
+    locales = sorted({meta['locale'] for meta, _ in docs})
+    field_tf, lengths = [], {f: [] for f in FIELD_BOOSTS}
+    for _, fields in docs:
+        per_field = {}
+        for field in FIELD_BOOSTS:
+            words = tokens(fields.get(field, ''))
+            lengths[field].append(len(words))
+            counts = per_field[field] = {}
+            for word in words:
+                counts[word] = counts.get(word, 0) + 1
+        field_tf.append(per_field)
+    avg = {f: (sum(n) / len(n) or 1.0) if n else 1.0 for f, n in lengths.items()}
+
+    # BM25F : tf de chaque champ normalisée par sa longueur, pondérée, puis saturée une fois
+    postings = {}
+    for doc_id, per_field in enumerate(field_tf):
+        weighted = {}
+        for field, counts in per_field.items():
+            norm = 1 - B + B * lengths[field][doc_id] / avg[field]
+            for word, tf in counts.items():
+                weighted[word] = weighted.get(word, 0.0) + FIELD_BOOSTS[field] * tf / norm
+        for word, tf in weighted.items():
+            postings.setdefault(word, []).append((doc_id, tf / (K1 + tf)))
+    n = len(docs)
+    terms = sorted(postings)
+    term_blob = [t.encode() for t in terms]
+    term_off = np.zeros(len(terms) + 1, np.uint32)
+    term_off[1:] = np.cumsum([len(t) for t in term_blob])
+    post_off = np.zeros(len(terms) + 1, np.uint32)
+    post_off[1:] = np.cumsum([len(postings[t]) for t in terms])
+    post_docs = np.empty(post_off[-1], np.uint32)
+    post_scores = np.empty(post_off[-1], np.float32)
+    for i, term in enumerate(terms):
+        plist = postings[term]
+        idf = np.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+        post_docs[post_off[i]:post_off[i + 1]] = [d for d, _ in plist]
+        post_scores[post_off[i]:post_off[i + 1]] = [idf * s * (K1 + 1) for _, s in plist]
+
+    # Index de suppressions (SymSpell, distance 1) : hash de chaque variante → terme
+    pairs = sorted((_hash(v), i) for i, t in enumerate(terms) if len(t) >= FUZZY_MIN for v in _deletes(t))
+    del_hash = np.array([h for h, _ in pairs], np.uint64)
+    del_term = np.array([i for _, i in pairs], np.uint32)
+
+    doc_blob, doc_off = [], np.zeros(n + 1, np.uint32)
+    for i, (meta, fields) in enumerate(docs):
+        text = max(fields.values(), key=len) if fields else ''
+        doc_blob.append(json.dumps({**meta, 'text': text[:SNIPPET]}, ensure_ascii=False).encode())
+        doc_off[i + 1] = doc_off[i] + len(doc_blob[-1])
+    doc_locale = np.array([locales.index(meta['locale']) for meta, _ in docs], np.uint8)
+
+    sections = {'term_off': term_off, 'terms': np.frombuffer(b''.join(term_blob), np.uint8),
+                'post_off': post_off, 'post_docs': post_docs, 'post_scores': post_scores,
+                'del_hash': del_hash, 'del_term': del_term, 'doc_locale': doc_locale,
+                'doc_off': doc_off, 'docs': np.frombuffer(b''.join(doc_blob), np.uint8)}
+    header = {'version': 1, 'documents': n, 'terms': len(terms), 'locales': locales,
+              'boosts': FIELD_BOOSTS, 'sections': {}}
+    body, offset = [], 0
+    for name, array in sections.items():
+        offset = -(-offset // 8) * 8     # sections alignées sur 8 octets (vues NumPy / typed arrays)
+        header['sections'][name] = [offset, array.dtype.str, len(array)]
+        body.append((offset, array.tobytes()))
+        offset += array.nbytes
+    head = json.dumps(header).encode()
+    start = -(-(len(MAGIC) + 4 + len(head)) // 8) * 8
+    out = bytearray(start + offset)
+    out[:len(MAGIC) + 4 + len(head)] = MAGIC + struct.pack('<I', len(head)) + head
+    for pos, data in body:
+        out[start + pos:start + pos + len(data)] = data
+    atomic_write(path, bytes(out))
+    return n, len(terms), int(post_off[-1])
+
+
+# === LECTURE ===
+class SearchIndex:
+    """Index ouvert par mmap : les sections sont des vues NumPy sur le fichier, sans copie"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} : pas un index Elo Booster")
+        size = struct.unpack_from('<I', self.map, len(MAGIC))[0]
+        self.header = json.loads(self.map[len(MAGIC) + 4:len(MAGIC) + 4 + size])
+        start = -(-(len(MAGIC) + 4 + size) // 8) * 8
+        for name, (offset, dtype, count) in self.header['sections'].items():
+            setattr(self, name, np.frombuffer(self.map, dtype, count, start + offset))
+        self.locales = self.header['locales']
+        self.count = len(self.term_off) - 1
+        self._terms = _TermList(self)
+
+    def term(self, i):
+        return self.terms[self.term_off[i]:self.term_off[i + 1]].tobytes().decode()
+
+    def lookup(self, word):
+        i = bisect.bisect_left(self._terms, word)
+        return i if i < self.count and self.term(i) == word else None
+
+    def prefixed(self, prefix):
+        """Termes commençant par `prefix`, les plus fréquents d'abord"""
+        lo = bisect.bisect_left(self._terms, prefix)
+        hi = bisect.bisect_left(self._terms, prefix + '\uffff', lo)
+        ids = np.arange(lo, hi)
+        if len(ids) > PREFIX_TERMS:
+            df = self.post_off[ids + 1] - self.post_off[ids]
+            ids = ids[np.argpartition(-df.astype(np.int64), PREFIX_TERMS)[:PREFIX_TERMS]]
+        return ids
+
+    def fuzzy(self, word):
+        """Termes à une faute de frappe de `word`"""
+        if len(word) < FUZZY_MIN:
+            return []
+        found = set()
+        for variant in _deletes(word):
+            h = np.uint64(_hash(variant))
+            lo = np.searchsorted(self.del_hash, h, 'left')
+            hi = np.searchsorted(self.del_hash, h, 'right')
+            found.update(int(i) for i in self.del_term[lo:hi])
+        return [i for i in found if self.term(i) != word and _one_edit(word, self.term(i))]
+
+    def search(self, query, k=10, locale=None, prefix=True, fuzzy=True):
+        """[(score, document)] les mieux classés ; mots en OU, préfixe sur le dernier mot"""
+        words = tokens(query)
+        if not words:
+            return []
+        scores = np.zeros(len(self.doc_locale), np.float32)
+        for n, word in enumerate(words):
+            matched = {}
+            exact = self.lookup(word)
+            if exact is not None:
+                matched[exact] = 1.0
+            if prefix and n == len(words) - 1:
+                for i in self.prefixed(word):
+                    matched.setdefault(int(i), PREFIX_WEIGHT)
+            if fuzzy and exact is None:
+                for i in self.fuzzy(word):
+                    matched.setdefault(i, FUZZY_WEIGHT)
+            if len(matched) == 1:
+                (i, weight), = matched.items()
+                lo, hi = self.post_off[i], self.post_off[i + 1]
+                scores[self.post_docs[lo:hi]] += self.post_scores[lo:hi] * weight
+                continue
+            best = np.zeros_like(scores)     # un mot compte une fois, par son meilleur terme
+            for i, weight in matched.items():
+                lo, hi = self.post_off[i], self.post_off[i + 1]
+                docs = self.post_docs[lo:hi]
+                best[docs] = np.maximum(best[docs], self.post_scores[lo:hi] * weight)
+            scores += best
+        hits = np.flatnonzero(scores > 0)    # masque booléen : bien plus rapide que nonzero sur des flottants
+        if locale is not None:               # filtre sur les seuls résultats, pas sur tout le corpus
+            hits = hits[self.doc_locale[hits] == self.locales.index(locale)]
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind='stable')]
+        return [(float(scores[d]), self.document(d)) for d in hits]
+
+    def document(self, i):
+        return json.loads(self.docs[self.doc_off[i]:self.doc_off[i + 1]].tobytes())
+
+    def close(self):
+        for name in self.header['sections']:
+            delattr(self, name)              # plus aucune vue : la projection peut être fermée
+        self._terms = None
+        self.map.close()
+
+
+class _TermList:
+    """Séquence triée des termes, décodés à la demande pour bisect"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.count
+
+    def __getitem__(self, i):
+        return self.index.term(i)
+
+
+# === SERVICE LOCAL ===
+class SearchHandler(BaseHTTPRequestHandler):
+    server_version = 'EloBoosterSearch/1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/search':
+            return self.send_error(404)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        locale, k = params.get('locale'), params.get('k', '10')
+        if locale is not None and locale not in self.server.index.locales:
+            return self.send_error(400, 'locale inconnue', f"locales : {', '.join(self.server.index.locales)}")
+        if not k.isdigit() or not 1 <= int(k) <= MAX_K:
+            return self.send_error(400, 'k invalide', f"k : entier de 1 à {MAX_K}")
+        hits = self.server.index.search(params.get('q', ''), int(k), locale)
+        body = json.dumps([{'score': round(s, 3), **doc} for s, doc in hits], ensure_ascii=False).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# === BENCHMARK ===
+def synthetic_documents(sheets=10_000, seed=0):
+    """Corpus synthétique : fiches réelles dont les mots sont rebrassés et en partie inventés"""
+    rng = random.Random(seed)
+    real = corpus_documents()
+    vocab = sorted({w for _, fields in real for text in fields.values() for w in text.split()})
+    vocab += [f'{rng.choice(vocab)}{rng.randint(0, 999)}' for _ in range(len(vocab))]
+    docs, per_sheet = [], len(real) / len({(m['locale'], m['file']) for m, _ in real})
+    while len(docs) < sheets * per_sheet:
+        meta, fields = rng.choice(real)
+        fields = {f: ' '.join(rng.choice(vocab) if rng.random() < 0.3 else w for w in text.split())
+                  for f, text in fields.items()}
+        docs.append(({**meta, 'title': f"{meta['title']} #{len(docs)}"}, fields))
+    return docs
+
+
+QUERIES = ('sicilian dragon', 'défense française', 'defense francaise', 'fianchetto', 'gambit dame',
+           'fourchette cavalier', 'knight fork f7', 'fiancheto', 'clouage', 'pion isolé', 'castl',
+           'caro kann', 'attaque minorité', 'king safety', 'développement')
+
+
+# Assez de mesures pour que le p99 ne soit pas la 3e plus lente d'entre elles
+ROUNDS = 200
+
+
+def benchmark(sheets=10_000):
+    docs = synthetic_documents(sheets)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'search.idx')
+        t0 = time.perf_counter()
+        n, terms, posts = build_index(docs, path)
+        build = time.perf_counter() - t0
+        size = os.path.getsize(path)
+        index = SearchIndex(path)
+        for query in QUERIES:
+            index.search(query)
+        times = []
+        for _ in range(ROUNDS):
+            for query in QUERIES:
+                t0 = time.perf_counter()
+                index.search(query)
+                times.append(time.perf_counter() - t0)
+        times.sort()
+        print(f"📊 {sheets:,} fiches synthétiques : {n:,} documents, {terms:,} termes, {posts:,} postings")
+        print(f"   ⏱️ construction {build:.1f} s, index {size / 1e6:.1f} Mo (mmap)")
+        print(f"   ⏱️ requête : médiane {times[len(times) // 2] * 1000:.3f} ms, "
+              f"p99 {times[int(len(times) * 0.99)] * 1000:.3f} ms, max {times[-1] * 1000:.3f} ms "
+              f"({len(QUERIES)} requêtes × {ROUNDS})")
+        index.close()
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['benchmark']:
+        benchmark(*map(int, sys.argv[2:3]))
+        sys.exit()
+    parser = argparse.ArgumentParser(description="Index de recherche plein texte du corpus")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('build', help="construit l'index depuis data_en/ et data_fr/")
+    p.add_argument('--out', default='search.idx')
+    p = sub.add_parser('query', help="interroge un index")
+    p.add_argument('query')
+    p.add_argument('--index', default='search.idx')
+    p.add_argument('--locale', choices=sorted(LOCALES))
+    p.add_argument('-k', type=int, default=10)
+    p = sub.add_parser('serve', help="GET /search?q=...&locale=fr&k=10")
+    p.add_argument('--index', default='search.idx')
+    p.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        t0 = time.perf_counter()
+        n, terms, posts = build_index(corpus_documents(), args.out)
+        print(f"✅ {args.out} : {n} documents, {terms} termes, {posts} postings, "
+              f"{os.path.getsize(args.out) / 1e3:.0f} Ko en {time.perf_counter() - t0:.2f} s")
+    elif args.command == 'query':
+        index = SearchIndex(args.index)
+        t0 = time.perf_counter()
+        hits = index.search(args.query, args.k, args.locale)
+        print(f"🔎 {len(hits)} résultats en {(time.perf_counter() - t0) * 1000:.2f} ms")
+        for score, doc in hits:
+            print(f"   {score:6.2f}  [{doc['locale']}] {doc['opening']} › {doc['title']} ({doc['kind']})")
+    else:
+        server = ThreadingHTTPServer(('127.0.0.1', args.port), SearchHandler)
+        server.index = SearchIndex(args.index)
+        print(f"✅ Recherche servie sur http://127.0.0.1:{args.port}/search?q=...")
+        server.serve_forever()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Build réparti
+Un coordinateur découpe le build (langues × formats × variantes de contenu) en unités :
+lots de fiches d'ouverture, puis assemblage de chaque PDF. Les unités sont déposées dans une
+file SQLite (fichier sur disque partagé) ; des workers, processus locaux ou autres machines
+montant le même répertoire, les louent pour une durée limitée, les exécutent et les acquittent.
+Un bail expiré (worker tué) ou une erreur remet l'unité en file, jusqu'à MAX_ATTEMPTS essais.
+Les lots de fiches remplissent le cache partagé des listes d'affichage (.cache/pages/) ;
+l'assemblage rejoue ces fiches et dessine les pages qui dépendent de la pagination
+(couverture, sommaire, checklist). Une fiche absente du cache est simplement mise en page
+à l'assemblage : le résultat ne dépend pas du succès des lots.
+"""
+import argparse, importlib, json, os, socket, sqlite3, subprocess, sys, time, traceback
+from metrics import QUEUE_DEPTH
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MAX_ATTEMPTS = 3
+LEASE_SECONDS = 300
+BATCH = 6                                    # fiches par unité
+
+# Build de nuit par défaut : (script, données) × formats
+LOCALES = (('generate_en', 'data_en'), ('generate_fr', 'data_fr'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY, job TEXT NOT NULL, stage INTEGER NOT NULL, kind TEXT NOT NULL,
+    payload TEXT NOT NULL, state TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT, lease_until REAL, started REAL, finished REAL, error TEXT, result TEXT);
+CREATE INDEX IF NOT EXISTS units_state ON units (state, stage, id);
+CREATE INDEX IF NOT EXISTS units_job ON units (job, stage, state);
+"""
+
+
+class WorkQueue:
+    """File d'unités de travail dans une base SQLite (WAL) ; bail = (worker, échéance)"""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.db.row_factory = sqlite3.Row
+
+    def close(self):
+        self.db.close()
+
+    def put(self, job, stage, kind, payload):
+        self.db.execute('INSERT INTO units (job, stage, kind, payload) VALUES (?, ?, ?, ?)',
+                        (job, stage, kind, json.dumps(payload, ensure_ascii=False)))
+
+    def lease(self, worker, seconds=LEASE_SECONDS):
+        """Unité suivante dont les étapes précédentes du même job sont terminées, ou None"""
+        now = time.time()
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            # Bail expiré après le dernier essai : l'unité est abandonnée
+            self.db.execute("UPDATE units SET state = 'failed', error = coalesce(error, 'bail expiré') "
+                            "WHERE state = 'leased' AND lease_until < ? AND attempts >= ?", (now, MAX_ATTEMPTS))
+            row = self.db.execute("""
+                SELECT * FROM units u
+                WHERE (u.state = 'pending' OR (u.state = 'leased' AND u.lease_until < ?))
+                  AND NOT EXISTS (SELECT 1 FROM units d WHERE d.job = u.job AND d.stage < u.stage
+                                  AND d.state IN ('pending', 'leased'))
+                ORDER BY u.stage, u.id LIMIT 1""", (now,)).fetchone()
+            if row:
+                self.db.execute("UPDATE units SET state = 'leased', worker = ?, lease_until = ?, started = ?, "
+                                "attempts = attempts + 1 WHERE id = ?", (worker, now + seconds, now, row['id']))
+            self.db.execute('COMMIT')
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        return row
+
+    def complete(self, unit_id, worker, result):
+        self.db.execute("UPDATE units SET state = 'done', finished = ?, result = ?, error = NULL "
+                        "WHERE id = ? AND worker = ?", (time.time(), json.dumps(result), unit_id, worker))
+
+    def fail(self, unit_id, worker, error):
+        """Remet l'unité en file, ou l'abandonne après MAX_ATTEMPTS essais"""
+        self.db.execute("UPDATE units SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                        "error = ?, lease_until = NULL WHERE id = ? AND worker = ?",
+                        (MAX_ATTEMPTS, error, unit_id, worker))
+
+    def counts(self):
+        return dict(self.db.execute('SELECT state, count(*) FROM units GROUP BY state').fetchall())
+
+    def drained(self):
+        return not self.db.execute("SELECT 1 FROM units WHERE state IN ('pending', 'leased') LIMIT 1").fetchone()
+
+
+# === COORDINATEUR ===
+def plan(queue_path, jobs=None, formats=('a4', 'letter', 'mobile'), batch=BATCH, out_dir='.', **options):
+    """Dépose les unités du build. jobs : [(script, data_dir, query)] ; query sélectionne une
+    variante de contenu (cf. content_store). Retourne le nombre d'unités"""
+    jobs = jobs or [(script, data_dir, None) for script, data_dir in LOCALES]
+    os.makedirs(out_dir, exist_ok=True)
+    queue = WorkQueue(queue_path)
+    count = 0
+    queue.db.execute('BEGIN IMMEDIATE')
+    for script, data_dir, query in jobs:
+        module = importlib.import_module(script)
+        files = [op.file for op in module.load_all_openings(data_dir, **(query or {}))]
+        for name in formats:
+            job = f'{script}:{name}:{json.dumps(query, sort_keys=True)}'
+            base = {'script': script, 'data_dir': data_dir, 'query': query, 'format': name, 'options': options}
+            for i in range(0, len(files), batch):
+                queue.put(job, 0, 'sheets', dict(base, files=files[i:i + batch]))
+                count += 1
+            output = module.GEOMETRIES[name].output_path(module.OUTPUT_PDF)
+            queue.put(job, 1, 'assemble', dict(base, output=os.path.abspath(os.path.join(out_dir, output))))
+            count += 1
+    queue.db.execute('COMMIT')
+    queue.close()
+    return count
+
+
+# === WORKER ===
+_shared = {}
+
+
+def _generator(payload, output=os.devnull):
+    """EloBoosterPremium du format demandé ; atlas d'échiquiers, mesures et compresseur sont
+    partagés entre les unités d'un même worker"""
+    module = importlib.import_module(payload['script'])
+    key = (payload['script'], json.dumps(payload['options'], sort_keys=True))
+    pdf = module.EloBoosterPremium(output, geometry=payload['format'], shared=_shared.get(key),
+                                   optimize=output != os.devnull, **payload['options'])
+    _shared.setdefault(key, pdf)
+    return module, pdf
+
+
+def _openings(module, payload):
+    openings = module.load_all_openings(payload['data_dir'], **(payload['query'] or {}))
+    if 'files' in payload:
+        openings = [op for op in openings if op.file in set(payload['files'])]
+    return openings
+
+
+def _counter(pdf, name):
+    return getattr(pdf.display_lists, name) if pdf.display_lists else 0
+
+
+def run_unit(kind, payload):
+    """Exécute une unité ; retourne un résumé JSON"""
+    if kind == 'sheets':
+        module, pdf = _generator(payload)
+        misses = _counter(pdf, 'misses')
+        openings = _openings(module, payload)
+        for op in openings:
+            pdf.generate_opening(op)         # enregistre la liste d'affichage dans .cache/pages/
+        return {'sheets': len(openings), 'recorded': _counter(pdf, 'misses') - misses}
+    if kind == 'assemble':
+        module, pdf = _generator(payload, payload['output'])
+        hits = _counter(pdf, 'hits')
+        openings = _openings(module, payload)
+        pdf.generate_complete(payload['data_dir'], openings=openings)
+        return {'output': payload['output'], 'pages': pdf.page_num, 'replayed': _counter(pdf, 'hits') - hits}
+    raise ValueError(f"unité inconnue : {kind}")
+
+
+def run_worker(queue_path, worker=None, poll=0.2):
+    """Loue et exécute des unités jusqu'à ce que la file soit vide. Retourne le nombre d'unités faites"""
+    worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+    queue = WorkQueue(queue_path)
+    done = 0
+    while True:
+        unit = queue.lease(worker)
+        if unit is None:
+            if queue.drained():
+                break
+            time.sleep(poll)                 # assemblages en attente de lots encore loués
+            continue
+        QUEUE_DEPTH.set(queue.counts().get('pending', 0), ('shard_units',))
+        t0 = time.perf_counter()
+        try:
+            result = run_unit(unit['kind'], json.loads(unit['payload']))
+        except Exception:
+            queue.fail(unit['id'], worker, traceback.format_exc())
+            print(f"❌ {worker} : unité {unit['id']} ({unit['kind']}) en échec, essai {unit['attempts'] + 1}")
+            continue
+        result['seconds'] = round(time.perf_counter() - t0, 3)
+        queue.complete(unit['id'], worker, result)
+        done += 1
+    queue.close()
+    return done
+
+
+def run_local(queue_path, workers=4, **plan_options):
+    """Build complet sur une machine : plan, N processus workers sur la même file, rapport"""
+    if os.path.exists(queue_path):
+        os.remove(queue_path)
+    t0 = time.perf_counter()
+    units = plan(queue_path, **plan_options)
+    print(f"📋 {units} unités en file ({queue_path}), {workers} workers")
+    procs = [subprocess.Popen([sys.executable, os.path.join(HERE, 'shard_build.py'), 'work', queue_path,
+                               '--worker', f'local-{i}'], cwd=HERE, stdout=subprocess.DEVNULL)
+             for i in range(workers)]
+    for proc in procs:
+        proc.wait()
+    report(queue_path, time.perf_counter() - t0)
+
+
+def report(queue_path, wall=None):
+    queue = WorkQueue(queue_path)
+    counts = queue.counts()
+    busy = queue.db.execute("SELECT worker, count(*), sum(json_extract(result, '$.seconds')) FROM units "
+                            "WHERE state = 'done' GROUP BY worker ORDER BY worker").fetchall()
+    print(f"📊 {counts.get('done', 0)} faites, {counts.get('pending', 0)} en attente, "
+          f"{counts.get('leased', 0)} louées, {counts.get('failed', 0)} abandonnées")
+    for worker, n, seconds in busy:
+        print(f"   ⏱️ {worker} : {n} unités, {seconds:.1f} s")
+    if wall is not None:
+        total = sum(seconds for _, _, seconds in busy)
+        print(f"   ⏱️ mur {wall:.1f} s pour {total:.1f} s de travail")
+    for row in queue.db.execute("SELECT id, kind, error FROM units WHERE state = 'failed'"):
+        print(f"   ❌ unité {row['id']} ({row['kind']}) : {row['error'].strip().splitlines()[-1]}")
+    for row in queue.db.execute("SELECT result FROM units WHERE kind = 'assemble' AND state = 'done' ORDER BY id"):
+        result = json.loads(row['result'])
+        print(f"   ✅ {os.path.relpath(result['output'])} : {result['pages']} pages, "
+              f"{result['replayed']} fiches rejouées")
+    queue.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build réparti sur une file de travail SQLite")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('plan', 'work', 'status', 'local'):
+        cmd = sub.add_parser(name)
+        cmd.add_argument('queue', help="base SQLite de la file (sur un disque partagé entre machines)")
+        if name in ('plan', 'local'):
+            cmd.add_argument('--formats', nargs='+', default=['a4', 'letter', 'mobile'])
+            cmd.add_argument('--batch', type=int, default=BATCH)
+            cmd.add_argument('--out', default='.', help="répertoire des PDF")
+            cmd.add_argument('--compression', default='default', choices=('draft', 'default', 'release'))
+        if name == 'work':
+            cmd.add_argument('--worker', help="nom du worker (défaut : hôte:pid)")
+        if name == 'local':
+            cmd.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if args.command in ('plan', 'local'):
+        options = dict(formats=tuple(args.formats), batch=args.batch, out_dir=args.out, compression=args.compression)
+        if args.command == 'plan':
+            print(f"📋 {plan(args.queue, **options)} unités en file")
+        else:
+            run_local(args.queue, args.workers, **options)
+    elif args.command == 'work':
+        print(f"✅ {run_worker(args.queue, args.worker)} unités traitées")
+    else:
+        report(args.queue)
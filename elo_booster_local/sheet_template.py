@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Gabarits de fiche déclaratifs
+Un gabarit JSON (templates/) décrit une fiche : sections, rectangles, colonnes répétées,
+textes liés aux champs du corpus, échiquiers. Il est compilé une fois par format et par
+langue en un plan de rendu (coordonnées en points, couleurs, libellés et polices résolus),
+exécuté ensuite pour chaque ouverture sans réinterpréter la mise en page.
+"""
+import ast, json, operator, os, string, sys, time
+from reportlab.lib import colors
+from reportlab.lib.units import cm
+from reportlab.pdfbase import pdfmetrics
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+_FUNCTIONS = {'min': min, 'max': max}
+_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+
+
+def load_template(name):
+    with open(os.path.join(TEMPLATES_DIR, name + '.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _evaluate(expr, names):
+    """Expression arithmétique du gabarit (cm) : nombres, variables, + - * /, min, max"""
+    if isinstance(expr, (int, float)):
+        return expr
+
+    def walk(node):
+        if isinstance(node, ast.Expression):
+            return walk(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return node.value
+        if isinstance(node, ast.Name) and node.id in names:
+            return names[node.id]
+        if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+            left, right = walk(node.left), walk(node.right)
+            if isinstance(node.op, ast.Div) and not right:
+                raise ValueError(f"expression de gabarit invalide : {expr!r} (division par zéro)")
+            return _OPERATORS[type(node.op)](left, right)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return -walk(node.operand)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS:
+            return _FUNCTIONS[node.func.id](*map(walk, node.args))
+        raise ValueError(f"expression de gabarit invalide : {expr!r}")
+    return walk(ast.parse(expr, mode='eval'))
+
+
+def _fields(text):
+    return tuple(name for _, name, _, _ in string.Formatter().parse(text) if name)
+
+
+class _Text:
+    """Texte compilé : parties (format, champs), police, alignement, retour à la ligne"""
+    __slots__ = ('parts', 'items', 'font', 'size', 'color', 'draw', 'x', 'y', 'below', 'fit', 'fit_fields',
+                 'wrap', 'max_lines', 'leading', 'sizes', 'y_wrapped', 'cursor', 'max_items', 'prefix', 'item_gap')
+
+
+class SheetPlan:
+    """Plan de rendu d'un gabarit pour un format (PageGeometry) et une langue"""
+
+    def __init__(self, template, geometry, locale, palette):
+        self.palette = palette
+        self.locale = locale
+        self.labels = template['labels'][locale]
+        self.levels = [(word, color) for word, color in template['levels'][locale]]
+        W, H, M = geometry.width / cm, geometry.height / cm, geometry.margin / cm
+        self.names = {'W': W, 'H': H, 'M': M, 'CW': W - 2 * M}
+        # Variables du gabarit, évaluées dans l'ordre : chacune peut utiliser les précédentes
+        for name, expr in template.get('variables', {}).items():
+            self.names[name] = _evaluate(expr, self.names)
+        self.steps = []
+        top = H
+        for section in template['sections']:
+            self.steps += self._compile(section['elements'], 0, top, self.names)
+            top -= section['height'] + section['gap']
+
+    # === COMPILATION ===
+    def _color(self, name):
+        return colors.HexColor(self.palette[name]) if name in self.palette else colors.toColor(name)
+
+    def _compile(self, elements, ox, top, names):
+        """Éléments → [(fonction, paramètres)] en points, relatifs à l'origine du conteneur"""
+        steps = []
+        for el in elements:
+            kind = el['type']
+            ev = lambda key, default=0: _evaluate(el.get(key, default), names)
+            x, y = (ox + ev('x')) * cm, (top - ev('y')) * cm
+            if kind == 'page_template':
+                steps.append((_page_template, (el['kind'], tuple(el.get('args', ())))))
+            elif kind == 'rect':
+                h = ev('h') * cm
+                steps.append((_rect, (x, y - h, ev('w') * cm, h, self._color(el['color']), el.get('radius', 0))))
+            elif kind == 'line':
+                steps.append((_line, (x, y, (ox + ev('x2')) * cm, y, self._color(el['color']), el.get('width', 1))))
+            elif kind == 'board':
+                size = ev('size') * cm
+                if 'highlights' in el:
+                    steps.append((_board_mini, (el['fen'], el['highlights'], el['px'], x, y - size, size)))
+                else:
+                    steps.append((_board, (el['fen'], el.get('green'), el.get('red'), el['px'], x, y - size, size)))
+            elif kind == 'text':
+                steps.append((_text, (self._compile_text(el, x, y, ev),)))
+            elif kind == 'repeat':
+                inner = dict(names, w=ev('w'))
+                body = self._compile(el['elements'], 0, 0, inner)
+                cols = el.get('columns', 1)
+                offsets = tuple(((ox + ev('x') + (i % cols) * ev('dx')) * cm,
+                                 (top - ev('y') - (i // cols) * ev('dy')) * cm) for i in range(el['max']))
+                steps.append((_repeat, (el['field'], offsets, tuple(body))))
+            else:
+                raise ValueError(f"élément de gabarit inconnu : {kind}")
+        return steps
+
+    def _compile_text(self, el, x, y, ev):
+        t = _Text()
+        text = self.labels[el['label']] if 'label' in el else el.get('text', '')
+        parts = text if isinstance(text, list) else [text]
+        t.parts = tuple((part, _fields(part)) for part in parts)
+        t.items = el.get('items')
+        t.max_items, t.prefix, t.item_gap = el.get('max_items', 99), el.get('prefix', ''), el.get('item_gap', 0) * cm
+        t.font, t.size = el['font'], el['size']
+        pdfmetrics.getFont(t.font)           # police inconnue : erreur à la compilation, pas au rendu
+        t.color = self._color(el.get('color', 'dark'))
+        t.draw = {'left': 'drawString', 'right': 'drawRightString', 'centre': 'drawCentredString'}[el.get('align', 'left')]
+        t.x, t.y = x, y
+        t.below = el['below'] * cm if 'below' in el else None
+        t.fit = ev('fit') * cm if 'fit' in el else None
+        t.fit_fields = {name: _evaluate(w, self.names) * cm for name, w in el.get('fit_fields', {}).items()}
+        t.wrap = ev('wrap') * cm if 'wrap' in el else None
+        t.max_lines, t.leading = el.get('max_lines', 1), el.get('leading', 0) * cm
+        t.sizes = tuple(el.get('sizes', ()))
+        t.y_wrapped = (y + (ev('y') - ev('y_wrapped')) * cm) if 'y_wrapped' in el else None
+        t.cursor = el.get('cursor', False)
+        return t
+
+    # === RENDU ===
+    def level_color(self, data):
+        return next(color for word, color in self.levels if word in data.complexity)
+
+    def boards(self, data):
+        """Échiquiers que dessinera la fiche de `data` : [(méthode, paramètres)], dans l'ordre du rendu"""
+        return list(_boards(self.steps, data))
+
+    def render(self, pdf, data):
+        """Dessine la fiche de `data` avec les méthodes de pdf (canvas, échiquiers, mesures de texte)"""
+        state = {'level_color': self.level_color(data), 'cursor': 0}
+        for step, args in self.steps:
+            step(pdf, data, 0, 0, state, *args)
+
+
+def _format(t, obj, pdf):
+    out = []
+    for part, fields in t.parts:
+        values = {name: getattr(obj, name) for name in fields}
+        if len(t.parts) > 1 and fields and not any(values.values()):
+            continue                         # partie optionnelle (ex. "{alt_name} • ")
+        for name, width in t.fit_fields.items():
+            if name in values:
+                values[name] = pdf.fit_text(values[name], t.font, t.size, width)
+        out.append(part.format(**values))
+    return ''.join(out)
+
+
+def _page_template(pdf, obj, dx, dy, state, kind, args):
+    pdf.use_template(kind, *[arg.format(**state) for arg in args])
+
+
+def _rect(pdf, obj, dx, dy, state, x, y, w, h, color, radius):
+    pdf.c.setFillColor(color)
+    if radius:
+        pdf.c.roundRect(dx + x, dy + y, w, h, radius, fill=True, stroke=False)
+    else:
+        pdf.c.rect(dx + x, dy + y, w, h, fill=True, stroke=False)
+
+
+def _line(pdf, obj, dx, dy, state, x, y, x2, y2, color, width):
+    pdf.c.setStrokeColor(color)
+    pdf.c.setLineWidth(width)
+    pdf.c.line(dx + x, dy + y, dx + x2, dy + y2)
+
+
+def _board(pdf, obj, dx, dy, state, fen, green, red, px, x, y, size):
+    fen = getattr(obj, fen)
+    if fen:
+        img = pdf.board_png(fen, green and getattr(obj, green), red and getattr(obj, red), px)
+        pdf.c.drawImage(img, dx + x, dy + y, size, size)
+
+
+def _board_mini(pdf, obj, dx, dy, state, fen, highlights, px, x, y, size):
+    fen = getattr(obj, fen)
+    if fen:
+        pdf.c.drawImage(pdf.board_mini(fen, getattr(obj, highlights), px), dx + x, dy + y, size, size)
+
+
+def _text(pdf, obj, dx, dy, state, t):
+    c = pdf.c
+    x = dx + t.x
+    y = state['cursor'] - t.below if t.below is not None else dy + t.y
+    c.setFillColor(t.color)
+    if t.items:
+        c.setFont(t.font, t.size)
+        for item in getattr(obj, t.items)[:t.max_items]:
+            for line in pdf.wrap_text(t.prefix + item, t.font, t.size, t.wrap)[:t.max_lines]:
+                getattr(c, t.draw)(x, y, line)
+                y -= t.leading
+            y -= t.item_gap
+        return
+    text = _format(t, obj, pdf)
+    if t.fit is not None:
+        text = pdf.fit_text(text, t.font, t.size, t.fit)
+    if t.wrap is None or (t.y_wrapped is not None and c.stringWidth(text, t.font, t.size) <= t.wrap):
+        lines = [text]
+    else:
+        lines = pdf.wrap_text(text, t.font, t.size, t.wrap)[:t.max_lines]
+        if t.y_wrapped is not None:
+            y = dy + t.y_wrapped
+    draw = getattr(c, t.draw)
+    for i, line in enumerate(lines):
+        c.setFont(t.font, t.sizes[min(i, len(t.sizes) - 1)] if t.sizes else t.size)
+        draw(x, y, line)
+        y -= t.leading
+    if t.cursor:
+        state['cursor'] = y
+
+
+def _repeat(pdf, obj, dx, dy, state, field, offsets, body):
+    for item, (ox, oy) in zip(getattr(obj, field), offsets):
+        for step, args in body:
+            step(pdf, item, dx + ox, dy + oy, state, *args)
+
+
+def _boards(steps, obj):
+    for step, args in steps:
+        if step is _board and getattr(obj, args[0]):
+            fen, green, red, px = args[:4]
+            yield 'board_png', (getattr(obj, fen), green and getattr(obj, green), red and getattr(obj, red), px)
+        elif step is _board_mini and getattr(obj, args[0]):
+            fen, highlights, px = args[:3]
+            yield 'board_mini', (getattr(obj, fen), getattr(obj, highlights), px)
+        elif step is _repeat:
+            field, offsets, body = args
+            for item in getattr(obj, field)[:len(offsets)]:
+                yield from _boards(body, item)
+
+
+def benchmark(script='generate_en', data_dir='data_en', repeat=5):
+    """Compilation d'un gabarit et rendu d'une fiche à partir du plan"""
+    import importlib
+    from display_list import Recorder
+    gen = importlib.import_module(script)
+    openings = gen.load_all_openings(data_dir)
+    pdf = gen.EloBoosterPremium(os.devnull, optimize=False, display_lists=False)
+    template = load_template('opening_sheet')
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        SheetPlan(template, pdf.geometry, pdf.sheet.locale, gen.COLORS)
+    compile_ms = (time.perf_counter() - t0) * 1000 / repeat
+    for op in openings:                      # échiquiers et mesures de texte en cache
+        pdf.draw_opening(op)
+    pdf.c, page = Recorder(), pdf.c
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for op in openings:
+            pdf.draw_opening(op)
+    render_ms = (time.perf_counter() - t0) * 1000 / repeat / len(openings)
+    pdf.c = page
+    print(f"📊 {len(pdf.sheet.steps)} étapes : compilation {compile_ms:.1f} ms, rendu {render_ms:.2f} ms/fiche")
+
+
+if __name__ == '__main__':
+    benchmark(*sys.argv[1:3])
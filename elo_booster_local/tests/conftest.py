@@ -0,0 +1,4 @@
+import os, sys
+
+# Modules à plat dans elo_booster_local/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Moteur UCI de test : score déterministe tiré de la FEN, sans recherche.
+FAKE_UCI_LOG : fichier où chaque position analysée est ajoutée (une ligne par `go`).
+FAKE_UCI_CRASH : le processus s'arrête sans répondre si la FEN contient cette chaîne.
+"""
+import os, sys, zlib
+
+
+def score(fen):
+    return zlib.crc32(fen.encode()) % 201 - 100
+
+
+def main():
+    fen = None
+    for line in sys.stdin:
+        words = line.split()
+        if words == ['uci']:
+            print('id name FakeFish 1.0')
+            print('uciok')
+        elif words == ['isready']:
+            print('readyok')
+        elif words[:2] == ['position', 'fen']:
+            fen = ' '.join(words[2:])
+        elif words[:1] == ['go']:
+            if os.environ.get('FAKE_UCI_CRASH') and os.environ['FAKE_UCI_CRASH'] in fen:
+                return
+            if os.environ.get('FAKE_UCI_LOG'):
+                with open(os.environ['FAKE_UCI_LOG'], 'a') as f:
+                    f.write(fen + '\n')
+            depth = words[words.index('depth') + 1] if 'depth' in words else '1'
+            print(f'info depth {depth} score cp {score(fen)} pv e2e4')
+            print('bestmove e2e4')
+        elif words == ['quit']:
+            return
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
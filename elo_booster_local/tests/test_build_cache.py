@@ -0,0 +1,50 @@
+import marshal
+import pytest
+from build_cache import DiskCache, RemoteCache, content_key
+from cache_server import CacheServer, serve_in_thread
+from display_list import FORMAT, DisplayList, Recorder
+
+KEY = content_key('fiche', 1)
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = serve_in_thread(str(tmp_path / 'server'))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_signed_round_trip(server):
+    RemoteCache(server.url, 'clé').put('pages', KEY, b'liste')
+    assert RemoteCache(server.url, 'clé').get('pages', KEY) == b'liste'
+
+
+def test_unsigned_or_foreign_entries_are_misses(server):
+    client, store = RemoteCache(server.url, 'clé'), DiskCache('pages', root=server.root, remote=None)
+    RemoteCache(server.url, 'autre clé').put('pages', KEY, b'liste')
+    assert client.get('pages', KEY) is None
+    # Entrée déposée directement sur le serveur, sans signature
+    store.put(KEY, marshal.dumps((FORMAT, [('system', ('id',), {})], {})))
+    assert client.get('pages', KEY) is None
+    # Entrée valide recopiée sous une autre clé
+    client.put('pages', KEY, b'liste')
+    store.put(content_key('autre'), store.get(KEY))
+    assert client.get('pages', content_key('autre')) is None
+    assert client.rejected == 3
+
+
+def test_server_requires_token_off_loopback(tmp_path):
+    with pytest.raises(ValueError, match='jeton requis'):
+        CacheServer(str(tmp_path), host='0.0.0.0', port=0)
+    CacheServer(str(tmp_path), host='0.0.0.0', port=0, token='t').server_close()
+    CacheServer(str(tmp_path), host='127.0.0.1', port=0).server_close()
+
+
+def test_replay_rejects_unknown_ops():
+    ops = [('setFont', ('Helvetica', 9), {}), ('system', ('id',), {})]
+    assert DisplayList.from_bytes(marshal.dumps((FORMAT, ops, {}))) is None
+    canvas = Recorder()
+    with pytest.raises(ValueError, match="'system'"):
+        DisplayList(ops, {}).replay(canvas)
+    assert [op[0] for op in canvas.ops] == ['setFont']
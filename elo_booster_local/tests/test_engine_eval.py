@@ -0,0 +1,124 @@
+import json, os
+import chess
+import pytest
+import engine_eval
+from engine_eval import analyse, fen_key, format_eval
+from fake_uci import score
+
+FAKE_UCI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_uci.py')
+TRAP_FEN = 'r1bqkb1r/pppp1Qpp/2n2n2/4p3/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 0 4'
+
+# Mise en forme manuelle (ligne vide, tableau sur une ligne) : doit survivre à la réécriture
+OPENING = '''{
+  "name": "PARTIE ITALIENNE",
+  "uci_moves": "e2e4 e7e5 g1f3 b8c6 f1c4",
+  "eval": "+9.9",
+  "highlights_green": ["c4", "f7"],
+
+  "variants": [
+    {
+      "name": "Giuoco Piano",
+      "uci": "e2e4 e7e5 g1f3 b8c6 f1c4 f8c5",
+      "highlights": ["c5"]
+    }
+  ],
+  "traps": [
+    {"name": "Coup du berger", "fen": "%s"}
+  ]
+}
+''' % TRAP_FEN
+
+
+def expected_eval(fen):
+    # Même score que tests/fake_uci.py, ramené au point de vue des Blancs
+    fen = fen_key(fen) + ' 0 1'
+    cp = score(fen)
+    return format_eval(('cp', cp if fen.split()[1] == 'w' else -cp))
+
+
+def final_fen(uci):
+    board = chess.Board()
+    for move in uci.split():
+        board.push_uci(move)
+    return board.fen()
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    monkeypatch.setenv('FAKE_UCI_LOG', str(tmp_path / 'engine.log'))
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'italienne.json').write_text(OPENING, encoding='utf-8')
+    (data_dir / 'vide.json').write_text('{"name": "VIDE", "uci_moves": ""}\n', encoding='utf-8')
+    return tmp_path
+
+
+def run(corpus, **options):
+    return analyse([str(corpus / 'data')], FAKE_UCI, depth=5, workers=2,
+                   cache_path=str(corpus / 'evals.json'), **options)
+
+
+def analysed(corpus):
+    log = corpus / 'engine.log'
+    return log.read_text().splitlines() if log.exists() else []
+
+
+def test_miss_then_hit(corpus):
+    assert run(corpus) == {str(corpus / 'data' / 'italienne.json'), str(corpus / 'data' / 'vide.json')}
+    assert len(analysed(corpus)) == 4                    # ligne, variante, piège, position initiale
+    cache = json.loads((corpus / 'evals.json').read_text())
+    assert cache[fen_key(TRAP_FEN)] == [5, expected_eval(TRAP_FEN), 'FakeFish 1.0']
+
+    mtime = os.stat(corpus / 'data' / 'italienne.json').st_mtime_ns
+    assert run(corpus) == set()
+    assert len(analysed(corpus)) == 4                    # tout vient du cache
+    assert os.stat(corpus / 'data' / 'italienne.json').st_mtime_ns == mtime
+
+
+def test_deeper_request_misses(corpus):
+    run(corpus)
+    analyse([str(corpus / 'data')], FAKE_UCI, depth=8, cache_path=str(corpus / 'evals.json'))
+    assert len(analysed(corpus)) == 8
+
+
+def test_write_back_only_touches_eval(corpus):
+    run(corpus)
+    main_fen = final_fen('e2e4 e7e5 g1f3 b8c6 f1c4')
+    variant_fen = final_fen('e2e4 e7e5 g1f3 b8c6 f1c4 f8c5')
+    expected = (OPENING
+                .replace('"eval": "+9.9"', f'"eval": "{expected_eval(main_fen)}"')
+                .replace('"highlights": ["c5"]', f'"highlights": ["c5"],\n      "eval": "{expected_eval(variant_fen)}"')
+                .replace(f'"fen": "{TRAP_FEN}"}}', f'"fen": "{TRAP_FEN}", "eval": "{expected_eval(TRAP_FEN)}"}}'))
+    assert (corpus / 'data' / 'italienne.json').read_text(encoding='utf-8') == expected
+
+
+def test_dry_run_leaves_files(corpus):
+    assert run(corpus, dry_run=True)
+    assert (corpus / 'data' / 'italienne.json').read_text(encoding='utf-8') == OPENING
+
+
+def test_engine_error_does_not_abort_batch(corpus, monkeypatch):
+    # Le moteur meurt sur la variante : les autres positions sont évaluées et gardées en cache
+    variant_fen = final_fen('e2e4 e7e5 g1f3 b8c6 f1c4 f8c5')
+    monkeypatch.setenv('FAKE_UCI_CRASH', fen_key(variant_fen))
+    run(corpus)
+    cache = json.loads((corpus / 'evals.json').read_text())
+    assert fen_key(variant_fen) not in cache
+    assert fen_key(TRAP_FEN) in cache
+    data = json.loads((corpus / 'data' / 'italienne.json').read_text(encoding='utf-8'))
+    assert 'eval' not in data['variants'][0]
+    assert data['traps'][0]['eval'] == expected_eval(TRAP_FEN)
+
+    monkeypatch.delenv('FAKE_UCI_CRASH')
+    run(corpus)
+    assert analysed(corpus)[-1] == fen_key(variant_fen) + ' 0 1'
+
+
+def test_cache_saved_when_interrupted(corpus, monkeypatch):
+    def interrupted(self, fens, depth):
+        yield fens[0], ('cp', 10)
+        raise KeyboardInterrupt
+    monkeypatch.setattr(engine_eval.EnginePool, 'map', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        run(corpus)
+    assert len(json.loads((corpus / 'evals.json').read_text())) == 1
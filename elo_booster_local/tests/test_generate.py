@@ -0,0 +1,13 @@
+import os
+import pytest
+import generate_en, generate_fr
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('gen, data_dir', [(generate_en, 'data_en'), (generate_fr, 'data_fr')])
+def test_empty_selection(gen, data_dir, tmp_path):
+    # Aucune ouverture retenue : sommaire vide, le livre garde couverture, checklist et structures
+    pdf = gen.EloBoosterPremium(str(tmp_path / 'vide.pdf'), optimize=False)
+    pdf.generate_complete(os.path.join(HERE, data_dir), openings=[])
+    assert pdf.page_num == 4
@@ -0,0 +1,40 @@
+import chess
+import numpy as np
+import pytest
+from PIL import Image, ImageSequence
+from board_raster import BoardRaster
+from build_cache import DiskCache
+from line_animation import SIZE, LineAnimator, _highlights, _lastmove, export_animations
+
+ITALIENNE = tuple('e2e4 e7e5 g1f3 b8c6 f1c4 g8f6 e1g1'.split())
+LINES = [('fr/italienne', ITALIENNE, ('c4',), ('f7',)),
+         ('fr/italienne_v1', ITALIENNE[:5] + ('f8c5', 'c2c3'), ('c3',), ())]
+
+
+@pytest.fixture(scope='module')
+def raster():
+    return BoardRaster()
+
+
+def expected(raster, animator, moves, green, red):
+    """Chaque position recomposée entière, passée par la même palette"""
+    board, images = chess.Board(), [raster.render(chess.STARTING_FEN, None, SIZE, coordinates=False)]
+    for move in moves:
+        board.push_uci(move)
+        images.append(raster.render(board.fen(), _lastmove(board.peek()), SIZE, coordinates=False))
+    images.append(raster.render(board.fen(), _highlights(green, red), SIZE, coordinates=False))
+    return [np.asarray(animator.image(animator._index(rgb)).convert('RGB')) for rgb in images]
+
+
+def test_frames_match_full_renders(tmp_path, raster):
+    animator = LineAnimator(raster)
+    export_animations(LINES, str(tmp_path / 'out'), ('gif',), animator,
+                      DiskCache('animations', str(tmp_path / 'cache'), remote=None))
+    for name, moves, green, red in LINES:
+        with Image.open(tmp_path / 'out' / f'{name}.gif') as gif:
+            frames = [np.asarray(frame.convert('RGB')) for frame in ImageSequence.Iterator(gif)]
+        reference = expected(raster, animator, moves, green, red)
+        assert len(frames) == len(reference)
+        # Image 0 : position initiale, pas l'échiquier vide
+        for n, (frame, full) in enumerate(zip(frames, reference)):
+            assert np.array_equal(frame, full), f'{name} : image {n}'
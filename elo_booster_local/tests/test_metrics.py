@@ -0,0 +1,56 @@
+import os, threading
+import pytest
+from metrics import Counter, Gauge, Histogram, Registry, openmetrics
+
+
+def test_counter_merges_thread_shards():
+    registry = Registry()
+    counter = Counter('pages', "Pages", ('format',), registry=registry)
+
+    def work():
+        for _ in range(10_000):
+            counter.inc(labels=('a4',))
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(registry.shards) == 8
+    assert registry.merged() == {(counter.name, ('a4',)): 80_000}
+
+
+def test_openmetrics_histogram_is_cumulative():
+    registry = Registry()
+    histogram = Histogram('section_seconds', "Durée", ('section',), buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.5, 0.5, 2.0, 3.0):
+        histogram.observe(value, ('fiches',))
+    text = openmetrics(registry)
+    assert text.endswith('# EOF\n')
+    samples = {}
+    for line in text.splitlines():
+        if not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    buckets = [samples[f'elo_section_seconds_bucket{{section="fiches",le="{le}"}}'] for le in ('0.1', '1.0', '+Inf')]
+    assert buckets == [1, 3, 5]
+    assert samples['elo_section_seconds_count{section="fiches"}'] == buckets[-1]
+    assert samples['elo_section_seconds_sum{section="fiches"}'] == pytest.approx(6.05)
+
+
+def test_reset_after_fork_clears_gauges():
+    registry = Registry()
+    gauge = Gauge('queue_depth', "File", ('queue',), registry=registry)
+    gauge.set(3, ('pages',))
+    gauge.track(lambda: {('boards',): 2})
+    os.register_at_fork(after_in_child=registry.reset)
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write, repr(gauge.collect()).encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read, 1024).decode() == "{('boards',): 2}"
+    os.close(read)
+    os.close(write)
+    assert gauge.collect() == {('pages',): 3, ('boards',): 2}
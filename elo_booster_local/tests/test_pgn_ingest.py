@@ -0,0 +1,28 @@
+import json, os
+import pgn_ingest
+from pgn_ingest import build_trie, count_chunk, load_checkpoint, save_checkpoint
+
+ITALIENNE = {'name': 'PARTIE ITALIENNE', 'uci_moves': 'e2e4 e7e5 g1f3 b8c6 f1c4 g8f6 e1g1'}
+
+
+def game(movetext, result='1-0'):
+    return f'\n[Event "Test"]\n[Result "{result}"]\n\n{movetext} {result}\n'.encode()
+
+
+def test_castling_with_zeros(tmp_path, monkeypatch):
+    (tmp_path / 'italienne.json').write_text(json.dumps(ITALIENNE), encoding='utf-8')
+    trie, depth = build_trie(str(tmp_path))
+    monkeypatch.setattr(pgn_ingest, '_trie', trie)
+    monkeypatch.setattr(pgn_ingest, '_depth', depth)
+    chunk = (game('1. e4 e5 2. Nf3 Nc6 3. Bc4 Nf6 4. O-O Be7') +
+             game('1. e4 e5 2. Nf3 Nc6 3. Bc4 Nf6 4. 0-0 Bc5', '0-1'))
+    assert count_chunk(chunk) == (2, {'italienne.json': [1, 0, 1]})
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / 'ingest.json')
+    state = {'source': ['base.pgn', 10, 1], 'offset': 5, 'games': 2, 'counts': {'italienne.json': [1, 0, 1]}}
+    save_checkpoint(path, state)
+    assert load_checkpoint(path, ['base.pgn', 10, 1]) == state
+    assert load_checkpoint(path, ['autre.pgn', 10, 1])['offset'] == 0
+    assert os.listdir(tmp_path) == ['ingest.json']
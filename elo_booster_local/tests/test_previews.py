@@ -0,0 +1,28 @@
+import pytest
+from reportlab.pdfgen import canvas
+from previews import page_fingerprints
+
+pytest.importorskip('pymupdf')
+
+
+def book(path, toc_number):
+    """Sommaire dont le numéro de page est un Form XObject rempli à la fin, comme page_ref()"""
+    c = canvas.Canvas(path)
+    c.drawString(72, 700, 'Italienne')
+    c.doForm('pageref_italienne')
+    c.showPage()
+    c.drawString(72, 700, 'PARTIE ITALIENNE')
+    c.showPage()
+    c.beginForm('pageref_italienne')
+    c.drawString(400, 700, str(toc_number))
+    c.endForm()
+    c.save()
+    return page_fingerprints(path, [1, 2])
+
+
+def test_deferred_page_number_changes_fingerprint(tmp_path):
+    before = book(str(tmp_path / 'a.pdf'), 2)
+    assert book(str(tmp_path / 'b.pdf'), 2) == before
+    after = book(str(tmp_path / 'c.pdf'), 3)
+    assert after[1] != before[1]
+    assert after[2] == before[2]
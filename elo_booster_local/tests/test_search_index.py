@@ -0,0 +1,38 @@
+import json, threading, urllib.error, urllib.request
+import pytest
+from http.server import ThreadingHTTPServer
+from search_index import SearchHandler, SearchIndex, build_index
+
+DOCS = [({'locale': 'en', 'title': 'Fried Liver'}, {'name': 'Fried Liver', 'desc': 'knight fork on f7'}),
+        ({'locale': 'fr', 'title': 'Foie frit'}, {'name': 'Foie frit', 'desc': 'fourchette du cavalier en f7'}),
+        ({'locale': 'fr', 'title': 'Légal'}, {'name': 'Mat de Légal', 'desc': 'le cavalier mate'})]
+
+
+@pytest.fixture
+def url(tmp_path):
+    build_index(DOCS, str(tmp_path / 'search.idx'))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SearchHandler)
+    server.index = SearchIndex(str(tmp_path / 'search.idx'))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/search'
+    server.shutdown()
+    server.server_close()
+    server.index.close()
+
+
+def get(url):
+    with urllib.request.urlopen(url) as resp:
+        return json.loads(resp.read())
+
+
+def test_locale_filter(url):
+    assert sorted(hit['title'] for hit in get(url + '?q=cavalier&locale=fr')) == ['Foie frit', 'Légal']
+    assert get(url + '?q=cavalier&locale=en') == []
+    assert len(get(url + '?q=f7&k=1')) == 1
+
+
+@pytest.mark.parametrize('query', ['locale=de', 'k=abc', 'k=0', 'k=-3', 'k=1000'])
+def test_bad_parameters_are_400(url, query):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        get(f'{url}?q=cavalier&{query}')
+    assert error.value.code == 400
@@ -0,0 +1,40 @@
+import os
+import pytest
+from reportlab.pdfbase.pdfmetrics import stringWidth
+import generate_en, generate_fr
+from display_list import Recorder
+from page_geometry import GEOMETRIES
+from sheet_template import _evaluate
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def header_extents(ops):
+    """(bord droit des lignes du titre, bord gauche de la ligne Champions) d'une fiche enregistrée"""
+    font, title_right, champions_left = None, 0, None
+    for name, args, _ in ops:
+        if name == 'setFont':
+            font = args[:2]
+        elif name == 'drawString' and font[0] == 'Helvetica-Bold' and font[1] in (20, 18):
+            title_right = max(title_right, args[0] + stringWidth(args[2], *font))
+        elif name == 'drawRightString' and args[2].startswith('Champions: '):
+            champions_left = args[0] - stringWidth(args[2], *font)
+    return title_right, champions_left
+
+
+@pytest.mark.parametrize('gen, data_dir', [(generate_en, 'data_en'), (generate_fr, 'data_fr')])
+@pytest.mark.parametrize('geometry', sorted(GEOMETRIES))
+def test_title_stops_before_champions(gen, data_dir, geometry):
+    pdf = gen.EloBoosterPremium(os.devnull, optimize=False, display_lists=False, geometry=geometry)
+    for op in gen.load_all_openings(os.path.join(HERE, data_dir)):
+        pdf.c = Recorder()
+        pdf.draw_opening(op)
+        title_right, champions_left = header_extents(pdf.c.ops)
+        assert champions_left is not None, op.name
+        assert title_right < champions_left, op.name
+
+
+def test_division_by_zero_is_an_error():
+    with pytest.raises(ValueError, match="'CW / \\(W - 16\\)'"):
+        _evaluate('CW / (W - 16)', {'CW': 14.4, 'W': 16})
+    assert _evaluate('CW / (W - 14)', {'CW': 14.4, 'W': 16}) == pytest.approx(7.2)
@@ -0,0 +1,54 @@
+import os
+import numpy as np
+import pytest
+from reportlab.lib import colors
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+from generate_en import COLORS
+from visual_regression import _blocks_path, _check_chunk, _golden_chunk
+
+pytest.importorskip('pymupdf')
+LIGHT, DARK = '#F0D9B5', '#B58863'          # cases de board_png
+
+
+def board_page(path, highlight):
+    """Une page avec un échiquier dont la case e4 est surlignée"""
+    c = canvas.Canvas(path)
+    for rank in range(8):
+        for file in range(8):
+            color = highlight if (file, rank) == (4, 3) else LIGHT if (rank + file) % 2 else DARK
+            c.setFillColor(colors.HexColor(color))
+            c.rect(3*cm + file * cm, 10*cm + rank * cm, cm, cm, fill=True, stroke=False)
+    c.save()
+
+
+def footer_page(path, number):
+    """Numéro de page en corps 6 : 8 → 9 ne bouge aucun bloc de plus de 1"""
+    c = canvas.Canvas(path)
+    c.setFont('Helvetica', 6)
+    c.drawString(100.5, 20, f'1{number}')
+    c.save()
+
+
+def check_against_golden(tmp_path, highlight, page=board_page, golden_arg=COLORS['green']):
+    golden_dir, report_dir = str(tmp_path / 'golden'), str(tmp_path / 'report')
+    page(str(tmp_path / 'golden.pdf'), golden_arg)
+    _, entries = _golden_chunk(str(tmp_path / 'golden.pdf'), 'en', [1], golden_dir)
+    np.save(_blocks_path(golden_dir, 'en'), np.stack([entries[1][1]]))
+    page(str(tmp_path / 'current.pdf'), highlight)
+    os.makedirs(report_dir, exist_ok=True)
+    result, = _check_chunk(str(tmp_path / 'current.pdf'), 'en', [1], {1: entries[1][0]}, golden_dir, report_dir)
+    return result['status']
+
+
+def test_same_page_is_identical(tmp_path):
+    assert check_against_golden(tmp_path, COLORS['green']) == 'identique'
+
+
+def test_recoloured_highlight_is_different(tmp_path):
+    # Même luminosité moyenne (canaux permutés) : un gris moyen par bloc la tenait pour équivalente
+    assert check_against_golden(tmp_path, '#EE9090') == 'différente'
+
+
+def test_page_number_digit_is_different(tmp_path):
+    assert check_against_golden(tmp_path, 9, footer_page, 8) == 'différente'
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Vérification des pièges
+Prouve que chaque position de piège (`traps[].fen`) est atteignable depuis la ligne
+principale ou une variante de son ouverture : recherche best-first bornée à partir de
+chaque position des lignes, élaguée par signatures de matériel et de structure de pions.
+Résultats en cache par empreinte de contenu (lignes + FEN + bornes).
+"""
+import argparse, glob, heapq, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+import chess
+from build_cache import DiskCache, content_key
+
+MAX_PLIES = 10          # demi-coups ajoutés au plus à une ligne du corpus
+MAX_NODES = 4000        # positions développées au plus par piège
+PIECE_MASKS = ('pawns', 'knights', 'bishops', 'rooks', 'queens', 'kings')
+RANKS = [chess.BB_RANKS[0]]
+for _rank in chess.BB_RANKS[1:]:
+    RANKS.append(RANKS[-1] | _rank)        # RANKS[k] : rangées 1..k+1
+
+
+def position_key(board):
+    """(pions, cavaliers, fous, tours, dames, rois, pièces blanches, trait, roques) ; les six
+    premiers dans l'ordre des types de pièce de chess (PAWN = 1 ... KING = 6)"""
+    return (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings,
+            board.occupied_co[chess.WHITE], board.turn, board.castling_rights)
+
+
+def child_key(board, key, move):
+    """Clé de la position après `move`, calculée sans jouer le coup (comme Board.push) ;
+    roque, prise en passant et promotion passent par push / pop"""
+    moved = board.piece_type_at(move.from_square)
+    if move.promotion or (moved == chess.KING and board.is_castling(move)) or \
+            (moved == chess.PAWN and board.is_en_passant(move)):
+        board.push(move)
+        key = position_key(board)
+        board.pop()
+        return key
+    from_bb, to_bb = chess.BB_SQUARES[move.from_square], chess.BB_SQUARES[move.to_square]
+    pieces = list(key[:6])
+    if to_bb & board.occupied:
+        pieces[board.piece_type_at(move.to_square) - 1] &= ~to_bb
+    pieces[moved - 1] = pieces[moved - 1] & ~from_bb | to_bb
+    white = key[6] & ~from_bb | to_bb if board.turn == chess.WHITE else key[6] & ~to_bb
+    castling = key[8] & ~from_bb & ~to_bb
+    if moved == chess.KING:
+        castling &= ~(chess.BB_RANK_1 if board.turn == chess.WHITE else chess.BB_RANK_8)
+    return (*pieces, white, not board.turn, castling)
+
+
+def _knight_distances():
+    dist = [[INF] * 64 for _ in range(64)]
+    for start in chess.SQUARES:
+        dist[start][start], frontier = 0, [start]
+        while frontier:
+            nxt = []
+            for square in frontier:
+                for to in chess.scan_forward(chess.BB_KNIGHT_ATTACKS[square]):
+                    if dist[start][to] == INF:
+                        dist[start][to] = dist[start][square] + 1
+                        nxt.append(to)
+            frontier = nxt
+    return dist
+
+
+INF = 99
+KNIGHT_DISTANCES = _knight_distances()
+
+
+def _piece_moves(name, color, square, target):
+    """Coups minimum d'une pièce seule de `square` à `target` (cases bloquées ignorées)"""
+    df = abs(chess.square_file(target) - chess.square_file(square))
+    dr = chess.square_rank(target) - chess.square_rank(square)
+    if name == 'pawns':
+        start_rank = 1 if color == chess.WHITE else 6
+        dr = dr if color == chess.WHITE else -dr
+        if dr <= 0 or df > dr:
+            return INF
+        return dr - (1 if chess.square_rank(square) == start_rank and dr - df >= 2 else 0)
+    if name == 'knights':
+        return KNIGHT_DISTANCES[square][target]
+    line = df == 0 or dr == 0
+    diagonal = df == abs(dr)
+    if name == 'bishops':
+        if (df + dr) % 2:
+            return INF
+        return 1 if diagonal else 2
+    if name == 'rooks':
+        return 1 if line else 2
+    if name == 'queens':
+        return 1 if line or diagonal else 2
+    # Roi : le roque l'amène en un coup sur la colonne c ou g
+    if square in (chess.E1, chess.E8) and dr == 0 and df == 2:
+        return 1
+    return max(df, abs(dr))
+
+
+class Target:
+    """Signatures de la position cible, calculées une fois ; élagage et minorant mémoïsés
+    par groupe de pièces et par structure de pions"""
+
+    def __init__(self, board):
+        board.castling_rights = board.clean_castling_rights()
+        self.key = position_key(board)
+        self.turn = board.turn
+        self.castling = board.castling_rights
+        self.groups = {(name, color): getattr(board, name) & board.occupied_co[color]
+                       for name in PIECE_MASKS for color in chess.COLORS}
+        self.material = {color: chess.popcount(board.occupied_co[color]) for color in chess.COLORS}
+        self.pawn_files = {color: [chess.popcount(self.groups['pawns', color] & bb) for bb in chess.BB_FILES]
+                           for color in chess.COLORS}
+        self.pawn_ranks = {chess.WHITE: [chess.popcount(self.groups['pawns', chess.WHITE] & RANKS[k]) for k in range(7)],
+                           chess.BLACK: [chess.popcount(self.groups['pawns', chess.BLACK] & ~RANKS[k]) for k in range(7)]}
+        self.costs, self.sides, self.structures = {}, {}, {}
+
+    def group_cost(self, name, color, current):
+        """Coups minimum pour occuper les cases cibles d'un groupe (ex. cavaliers blancs)
+        avec les pièces présentes ; None s'il manque une pièce ou si une case est hors d'atteinte"""
+        memo_key = (name, color, current)
+        if memo_key not in self.costs:
+            wanted = self.groups[name, color]
+            cost = 0 if chess.popcount(current) >= chess.popcount(wanted) else None
+            for target in chess.scan_forward(wanted & ~current) if cost is not None else ():
+                best = min(_piece_moves(name, color, square, target) for square in chess.scan_forward(current))
+                if best == INF:
+                    cost = None
+                    break
+                cost += best
+            self.costs[memo_key] = cost
+        return self.costs[memo_key]
+
+    def side_cost(self, groups):
+        """(camp, groupes dans l'ordre de PIECE_MASKS) → somme des group_cost, None si un groupe
+        ne peut pas être complété ; mémoïsée, un coup ne change en général qu'un camp"""
+        color, total = groups[0], 0
+        for name, current in zip(PIECE_MASKS, groups[1:]):
+            cost = self.group_cost(name, color, current)
+            if cost is None:
+                total = None
+                break
+            total += cost
+        self.sides[groups] = total
+        return total
+
+    def structure_ok(self, pawns_w, pawns_b, material_w, material_b):
+        """Les pions n'avancent que, et ne changent de colonne qu'en prenant : chaque pion
+        gagné par une colonne coûte une prise, donc une pièce adverse encore à capturer"""
+        memo_key = (pawns_w, pawns_b, material_w, material_b)
+        if memo_key not in self.structures:
+            ok = True
+            for color, pawns, captures in ((chess.WHITE, pawns_w, material_b - self.material[chess.BLACK]),
+                                           (chess.BLACK, pawns_b, material_w - self.material[chess.WHITE])):
+                behind = RANKS if color == chess.WHITE else [~bb for bb in RANKS]
+                if any(chess.popcount(pawns & behind[k]) < count for k, count in enumerate(self.pawn_ranks[color])):
+                    ok = False
+                    break
+                gained = sum(max(0, count - chess.popcount(pawns & bb))
+                             for count, bb in zip(self.pawn_files[color], chess.BB_FILES))
+                if gained > captures:
+                    ok = False
+                    break
+            self.structures[memo_key] = ok
+        return self.structures[memo_key]
+
+    def plies(self, key):
+        """Minorant admissible du nombre de demi-coups depuis la position `key` (position_key),
+        None si la cible est inatteignable : chaque case cible se remplit en au moins
+        `_piece_moves` coups de son camp, le roque déplace deux pièces en un coup, chaque prise
+        restante est un coup, les camps alternent"""
+        *pieces, white, turn, castling = key
+        if self.castling & ~castling:
+            return None
+        black = (pieces[0] | pieces[1] | pieces[2] | pieces[3] | pieces[4] | pieces[5]) & ~white
+        material_w, material_b = chess.popcount(white), chess.popcount(black)
+        if not self.structure_ok(pieces[0] & white, pieces[0] & black, material_w, material_b):
+            return None
+        need = {}
+        for color, ours, captures in ((chess.WHITE, white, material_b - self.material[chess.BLACK]),
+                                      (chess.BLACK, black, material_w - self.material[chess.WHITE])):
+            groups = (color, pieces[0] & ours, pieces[1] & ours, pieces[2] & ours,
+                      pieces[3] & ours, pieces[4] & ours, pieces[5] & ours)
+            total = self.sides[groups] if groups in self.sides else self.side_cost(groups)
+            if total is None:
+                return None
+            if total and castling & ours:
+                total -= 1
+            need[color] = max(total, captures)
+        first, second = need[turn], need[not turn]
+        p = max(2 * first - 1, 2 * second, 0)
+        if p % 2 != (turn != self.turn):
+            p += 1
+        return p
+
+
+def _line_boards(uci):
+    board, boards = chess.Board(), [chess.Board()]
+    for move in uci.split():
+        board.push_uci(move)
+        boards.append(board.copy())
+    return boards
+
+
+def search(lines, fen, max_plies=MAX_PLIES, max_nodes=MAX_NODES):
+    """lines : [uci]. Chemin le plus court (en demi-coups ajoutés à une ligne) vers `fen`"""
+    try:
+        goal = chess.Board(fen)
+    except ValueError as e:
+        return {'status': 'invalid', 'error': str(e)}
+    status = goal.status()
+    if status != chess.STATUS_VALID:
+        return {'status': 'invalid', 'error': ', '.join(flag.name.lower() for flag in chess.Status
+                                                         if flag.name and flag & status)}
+    target = Target(goal)
+
+    # A* : g = demi-coups ajoutés (chaque coup coûte 1), h = target.plies (minorant admissible).
+    # Une position déjà vue est rouverte si un chemin plus court y mène (h n'est pas monotone) :
+    # le premier dépilement de la cible donne le chemin le plus court. Le tas garde
+    # (position parente, coup) : seules les positions dépilées sont construites
+    heap, parents, best, tie, bounded = [], {}, {}, 0, False
+    for index, uci in enumerate(lines):
+        try:
+            boards = _line_boards(uci)
+        except ValueError:
+            continue
+        for board in boards:
+            key = position_key(board)
+            h = target.plies(key)
+            if key in best or h is None:
+                continue
+            if h > max_plies:
+                bounded = True
+                continue
+            best[key], parents[key] = 0, (None, (index, board.move_stack))
+            heapq.heappush(heap, (h, 0, tie, key, board.copy(stack=False), None))
+            tie += 1
+
+    nodes, estimates = 0, {}
+    while heap:
+        _, neg_g, _, key, board, move = heapq.heappop(heap)
+        g = -neg_g
+        if g > best[key]:
+            continue                        # entrée périmée : un chemin plus court a été trouvé
+        if key == target.key:
+            return _result(parents, key, g, nodes)
+        nodes += 1
+        if nodes > max_nodes:
+            return {'status': 'not_found', 'nodes': nodes}
+        if move is not None:
+            board = board.copy(stack=False)
+            board.push(move)
+        for move in board.legal_moves:
+            child = child_key(board, key, move)
+            if g + 1 < best.get(child, INF):
+                h = estimates[child] if child in estimates else estimates.setdefault(child, target.plies(child))
+                if h is not None and g + 1 + h > max_plies:
+                    bounded = True
+                elif h is not None:
+                    best[child], parents[child] = g + 1, (key, move)
+                    # À f égal, les nœuds les plus profonds d'abord
+                    heapq.heappush(heap, (g + 1 + h, -(g + 1), tie, child, board, move))
+                    tie += 1
+    # Sans coupure par la borne, l'espace est épuisé : la position est impossible depuis ces lignes
+    return {'status': 'not_found' if bounded else 'unreachable', 'nodes': nodes}
+
+
+def _result(parents, key, extra, nodes):
+    moves = []
+    while True:
+        parent, step = parents[key]
+        if parent is None:
+            index, prefix = step
+            break
+        moves.append(step)
+        key = parent
+    board = chess.Board()
+    san = []
+    for move in list(prefix) + moves[::-1]:
+        san.append(board.san(move))
+        board.push(move)
+    return {'status': 'line' if extra == 0 else 'found', 'line': index, 'extra': extra,
+            'path': san, 'nodes': nodes}
+
+
+def opening_lines(data):
+    return [(data.get('name', ''), data.get('uci_moves', ''))] + \
+        [(var.get('name', ''), var.get('uci', '')) for var in data.get('variants', [])]
+
+
+def verify(data_dir, workers=None, cache=None):
+    """[(fichier, piège, résultat)] pour tous les pièges du répertoire"""
+    cache = cache or DiskCache('traps')
+    jobs, results = [], []
+    for path in sorted(glob.glob(os.path.join(data_dir, '*.json'))):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        lines = opening_lines(data)
+        for trap in data.get('traps', []):
+            key = content_key([uci for _, uci in lines], trap.get('fen', ''), MAX_PLIES, MAX_NODES)
+            jobs.append((os.path.basename(path), trap.get('name', ''), lines, trap.get('fen', ''), key))
+
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {}
+        for file_id, name, lines, fen, key in jobs:
+            if key not in futures and key not in cache:
+                futures[key] = pool.submit(search, [uci for _, uci in lines], fen)
+        for file_id, name, lines, fen, key in jobs:
+            if key in futures:
+                result = futures[key].result()
+                cache.put(key, json.dumps(result).encode())
+            else:
+                result = json.loads(cache.get(key))
+            if 'line' in result:
+                result['line'] = lines[result['line']][0]
+            results.append((file_id, name, result))
+    return results, len(futures)
+
+
+def report(results):
+    """Affiche le bilan ; retourne le nombre de pièges non prouvés"""
+    failures = 0
+    for file_id, name, result in results:
+        status = result['status']
+        if status == 'line':
+            continue
+        if status == 'found':
+            print(f"   ↪️ {file_id} / {name} : {result['line']} + {result['extra']} demi-coups "
+                  f"({' '.join(result['path'])})")
+            continue
+        failures += 1
+        if status == 'invalid':
+            detail = f"FEN invalide : {result['error']}"
+        elif status == 'unreachable':
+            detail = f"impossible depuis les lignes, {result['nodes']} positions explorées"
+        else:
+            detail = f"aucun chemin en {MAX_PLIES} demi-coups / {MAX_NODES} positions"
+        print(f"   ❌ {file_id} / {name} : {detail}")
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Vérifie que les pièges sont atteignables depuis les lignes")
+    parser.add_argument('data_dirs', nargs='*', default=['data_en', 'data_fr'])
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+    failures = 0
+    for data_dir in args.data_dirs:
+        t0 = time.perf_counter()
+        results, computed = verify(data_dir, args.workers)
+        print(f"🔎 {data_dir} : {len(results)} pièges ({computed} recherchés, "
+              f"{len(results) - computed} en cache) en {time.perf_counter() - t0:.1f} s")
+        failures += report(results)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Régression visuelle des livres
+Construit les livres EN et FR (un processus par langue, sans listes d'affichage en cache),
+rasterise chaque page en parallèle et la compare aux images de référence : empreinte exacte des
+pixels (identique), sinon différence pixel à pixel contre l'image de référence avec image des
+écarts. L'empreinte perceptuelle par blocs (moyenne de chaque canal R, G, B sur des blocs de
+BLOCK × BLOCK pixels, rangée dans un .npy lu par mmap) chiffre l'écart de chaque page au rapport
+mais ne suffit pas à la déclarer équivalente : un chiffre changé dans un numéro de page en corps 6
+ne bouge un bloc que de 1. Rapport HTML des pages différentes.
+"""
+import argparse, hashlib, html, io, json, multiprocessing, os, shutil, subprocess, sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+import numpy as np
+from PIL import Image
+from build_cache import atomic_write
+from shard_build import LOCALES
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+DPI = 72
+BLOCK = 4                   # pixels par côté de bloc de l'empreinte perceptuelle
+BLOCK_FORMAT = 2            # 2 : moyenne par canal ; 1 (gris moyen, aveugle aux teintes) : relancer update
+PIXEL_TOL = 24              # écart toléré par canal dans la différence pixel à pixel
+CHUNK = 8                   # pages par tâche de rasterisation
+GOLDEN_DIR = 'visual_golden'
+
+
+def _book_path(out_dir, script):
+    return os.path.join(out_dir, f'{script}.pdf')
+
+
+def build_book(script, data_dir, out_dir, geometry='a4'):
+    """Livre construit sans les listes d'affichage de .cache/pages : un rendu modifié hors de
+    LAYOUT_KEY y serait rejoué depuis une liste périmée et vérifié contre lui-même"""
+    module = __import__(script)
+    with redirect_stdout(io.StringIO()):
+        module.EloBoosterPremium(_book_path(out_dir, script), optimize=False, geometry=geometry,
+                                 display_lists=False).generate_complete(data_dir)
+
+
+def _locale(data_dir):
+    return data_dir.split('_')[-1]
+
+
+def _pages(pdf_path, pages):
+    """Images RGB des pages (numéros à partir de 1), document ouvert une seule fois"""
+    if pymupdf is not None:
+        with pymupdf.open(pdf_path) as doc:
+            for n in pages:
+                pix = doc[n - 1].get_pixmap(dpi=DPI, alpha=False)
+                yield n, np.frombuffer(pix.samples, np.uint8).reshape(pix.height, pix.width, 3)
+        return
+    if not shutil.which('pdftoppm'):
+        raise RuntimeError("pymupdf ou pdftoppm requis (pip install pymupdf)")
+    with tempfile.TemporaryDirectory() as tmp:
+        subprocess.run(['pdftoppm', '-f', str(pages[0]), '-l', str(pages[-1]), '-r', str(DPI), '-png',
+                        pdf_path, os.path.join(tmp, 'p')], check=True)
+        for name in sorted(os.listdir(tmp)):
+            n = int(name[2:-4])
+            yield n, np.asarray(Image.open(os.path.join(tmp, name)).convert('RGB'))
+
+
+def page_count(pdf_path):
+    if pymupdf is not None:
+        with pymupdf.open(pdf_path) as doc:
+            return len(doc)
+    out = subprocess.run(['pdfinfo', pdf_path], capture_output=True, text=True, check=True).stdout
+    return int(next(line.split()[-1] for line in out.splitlines() if line.startswith('Pages:')))
+
+
+def digest(pixels):
+    return hashlib.sha256(pixels.tobytes()).hexdigest()[:32]
+
+
+def block_hash(pixels):
+    """Empreinte perceptuelle : moyenne de chaque canal par bloc, en uint8 (un gris moyen ne
+    verrait pas un vert devenu rose de même luminosité)"""
+    h, w = pixels.shape[0] // BLOCK * BLOCK, pixels.shape[1] // BLOCK * BLOCK
+    blocks = pixels[:h, :w].reshape(h // BLOCK, BLOCK, w // BLOCK, BLOCK, 3).mean(axis=(1, 3))
+    return blocks.round().astype(np.uint8)
+
+
+def _blocks_path(golden_dir, locale):
+    return os.path.join(golden_dir, locale, 'blocks.npy')
+
+
+def _png(pixels, path):
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, 'PNG', compress_level=1)
+    atomic_write(path, buf.getvalue())
+
+
+def _diff_image(golden, current):
+    """Page courante pâlie, pixels changés en rouge"""
+    changed = (np.abs(golden.astype(np.int16) - current.astype(np.int16)) > PIXEL_TOL).any(axis=2)
+    faded = (255 - (255 - current.astype(np.uint16)) // 4).astype(np.uint8)
+    faded[changed] = (220, 30, 30)
+    return faded, changed
+
+
+# === TÂCHES (workers) ===
+def _check_chunk(pdf_path, locale, pages, digests, golden_dir, report_dir):
+    results = []
+    all_blocks = None
+    for n, pixels in _pages(pdf_path, pages):
+        result = {'locale': locale, 'page': n}
+        results.append(result)
+        if n not in digests:
+            result['status'] = 'nouvelle'
+            _png(pixels, os.path.join(report_dir, f'{locale}_p{n:03d}_current.png'))
+            continue
+        if digest(pixels) == digests[n]:
+            result['status'] = 'identique'
+            continue
+        if all_blocks is None:
+            all_blocks = np.load(_blocks_path(golden_dir, locale), mmap_mode='r')
+        blocks, golden_blocks = block_hash(pixels), all_blocks[n - 1]
+        if blocks.shape == golden_blocks.shape:
+            result['block_delta'] = int(np.abs(blocks.astype(np.int16) - golden_blocks).max())
+        # Empreintes différentes : seule la différence pixel à pixel tranche
+        golden = np.asarray(Image.open(os.path.join(golden_dir, locale, f'p{n:03d}.png')).convert('RGB'))
+        prefix = os.path.join(report_dir, f'{locale}_p{n:03d}')
+        _png(pixels, prefix + '_current.png')
+        shutil.copyfile(os.path.join(golden_dir, locale, f'p{n:03d}.png'), prefix + '_golden.png')
+        if golden.shape != pixels.shape:
+            result.update(status='différente', changed=1.0, note=f"taille {golden.shape[1]}×{golden.shape[0]} → "
+                                                                 f"{pixels.shape[1]}×{pixels.shape[0]}")
+            continue
+        diff, changed = _diff_image(golden, pixels)
+        if not changed.any():
+            result['status'] = 'équivalente'
+            continue
+        ys, xs = np.nonzero(changed)
+        _png(diff, prefix + '_diff.png')
+        result.update(status='différente', changed=float(changed.mean()), pixels=int(changed.sum()),
+                      bbox=[int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1])
+    return results
+
+
+def _golden_chunk(pdf_path, locale, pages, golden_dir):
+    entries = {}
+    for n, pixels in _pages(pdf_path, pages):
+        _png(pixels, os.path.join(golden_dir, locale, f'p{n:03d}.png'))
+        entries[n] = digest(pixels), block_hash(pixels)
+    return locale, entries
+
+
+# === ORCHESTRATION ===
+def _chunks(count):
+    pages = list(range(1, count + 1))
+    return [pages[i:i + CHUNK] for i in range(0, count, CHUNK)]
+
+
+def build_books(out_dir, jobs=LOCALES):
+    """Un processus par langue : les deux livres sont construits en parallèle"""
+    context = multiprocessing.get_context('fork')
+    procs = [context.Process(target=build_book, args=(script, data_dir, out_dir)) for script, data_dir in jobs]
+    for proc in procs:
+        proc.start()
+    for proc, (script, _) in zip(procs, jobs):
+        proc.join()
+        if proc.exitcode:
+            raise RuntimeError(f"{script} : construction du livre en échec ({proc.exitcode})")
+    return {_locale(data_dir): _book_path(out_dir, script) for script, data_dir in jobs}
+
+
+def update_golden(golden_dir=GOLDEN_DIR, jobs=LOCALES, workers=None):
+    """Reconstruit les livres et remplace les images de référence"""
+    with tempfile.TemporaryDirectory() as tmp, ProcessPoolExecutor(workers) as pool:
+        books = build_books(tmp, jobs)
+        for locale in books:
+            shutil.rmtree(os.path.join(golden_dir, locale), ignore_errors=True)
+        futures = [pool.submit(_golden_chunk, pdf, locale, pages, golden_dir)
+                   for locale, pdf in books.items() for pages in _chunks(page_count(pdf))]
+        pages = {locale: {} for locale in books}
+        for future in futures:
+            locale, entries = future.result()
+            pages[locale].update(entries)
+    manifest = {'dpi': DPI, 'block': BLOCK, 'block_format': BLOCK_FORMAT, 'pages': {}}
+    for locale, entries in pages.items():
+        order = sorted(entries)
+        manifest['pages'][locale] = {str(n): entries[n][0] for n in order}
+        buf = io.BytesIO()
+        np.save(buf, np.stack([entries[n][1] for n in order]))
+        atomic_write(_blocks_path(golden_dir, locale), buf.getvalue())
+    atomic_write(os.path.join(golden_dir, 'manifest.json'), json.dumps(manifest, indent=1).encode())
+    return {locale: len(pages) for locale, pages in manifest['pages'].items()}
+
+
+def check(golden_dir=GOLDEN_DIR, report_dir='visual_report', jobs=LOCALES, workers=None):
+    """Compare les livres aux références ; retourne (résultats par page, durées)"""
+    with open(os.path.join(golden_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest['dpi'] != DPI or manifest['block'] != BLOCK or manifest.get('block_format', 1) != BLOCK_FORMAT:
+        raise ValueError(f"{golden_dir} : références à {manifest['dpi']} dpi, blocs de {manifest['block']} px "
+                         f"(format {manifest.get('block_format', 1)}) ; relancer update")
+    shutil.rmtree(report_dir, ignore_errors=True)
+    os.makedirs(report_dir)
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp, ProcessPoolExecutor(workers) as pool:
+        t0 = time.perf_counter()
+        books = build_books(tmp, jobs)
+        timings['build'] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        futures, results = [], []
+        for locale, pdf in books.items():
+            golden = {int(n): e for n, e in manifest['pages'].get(locale, {}).items()}
+            count = page_count(pdf)
+            results += [{'locale': locale, 'page': n, 'status': 'manquante'} for n in sorted(golden) if n > count]
+            futures += [pool.submit(_check_chunk, pdf, locale, pages, {n: golden[n] for n in pages if n in golden},
+                                    golden_dir, report_dir) for pages in _chunks(count)]
+        for future in futures:
+            results += future.result()
+        timings['compare'] = time.perf_counter() - t0
+    results.sort(key=lambda r: (r['locale'], r['page']))
+    write_report(results, timings, os.path.join(report_dir, 'index.html'))
+    return results, timings
+
+
+def _changed(result):
+    if 'pixels' in result:
+        return f"{result['pixels']} pixels changés ({100 * result['changed']:.3f} %)"
+    return f"{100 * result['changed']:.0f} % des pixels" if 'changed' in result else ''
+
+
+STATUS_COLORS = {'identique': '#2E7D32', 'équivalente': '#558B2F', 'différente': '#C62828',
+                 'manquante': '#C62828', 'nouvelle': '#EF6C00'}
+
+
+def write_report(results, timings, path):
+    counts = {}
+    for r in results:
+        counts[r['status']] = counts.get(r['status'], 0) + 1
+    rows = []
+    for r in results:
+        if r['status'] in ('identique', 'équivalente'):
+            continue
+        prefix = f"{r['locale']}_p{r['page']:03d}"
+        images = ''.join(f'<figure><a href="{prefix}_{kind}.png"><img src="{prefix}_{kind}.png"></a>'
+                         f'<figcaption>{label}</figcaption></figure>'
+                         for kind, label in (('golden', 'référence'), ('current', 'actuelle'), ('diff', 'écarts'))
+                         if os.path.exists(os.path.join(os.path.dirname(path), f'{prefix}_{kind}.png')))
+        detail = _changed(r)
+        if r.get('bbox'):
+            detail += f", zone {r['bbox']}"
+        if 'block_delta' in r:
+            detail += f", écart par bloc {r['block_delta']}"
+        rows.append(f"<section><h2 style=\"color:{STATUS_COLORS[r['status']]}\">{r['locale'].upper()} page {r['page']}"
+                    f" — {r['status']}</h2><p>{html.escape(detail + (' ' + r['note'] if 'note' in r else ''))}</p>"
+                    f"<div class=\"row\">{images}</div></section>")
+    summary = ', '.join(f'<b style="color:{STATUS_COLORS[s]}">{n} {s}{"s" if n > 1 else ""}</b>'
+                        for s, n in sorted(counts.items()))
+    body = f"""<!DOCTYPE html>
+<html lang="fr"><head><meta charset="utf-8"><title>Régression visuelle</title>
+<style>body{{font-family:Helvetica,sans-serif;margin:2em;color:#1A2332}} .row{{display:flex;gap:1em}}
+figure{{margin:0}} img{{width:300px;border:1px solid #AAA}} figcaption{{text-align:center;color:#666}}</style>
+</head><body><h1>Régression visuelle</h1>
+<p>{len(results)} pages : {summary}. Construction {timings.get('build', 0):.1f} s,
+rasterisation et comparaison {timings.get('compare', 0):.1f} s ({DPI} dpi).</p>
+{''.join(rows) or '<p>Aucune page différente.</p>'}
+</body></html>
+"""
+    atomic_write(path, body.encode())
+
+
+def benchmark(workers=None):
+    """Vérification complète contre des références fraîches, puis avec une page altérée"""
+    with tempfile.TemporaryDirectory() as tmp:
+        golden, report = os.path.join(tmp, 'golden'), os.path.join(tmp, 'report')
+        t0 = time.perf_counter()
+        pages = update_golden(golden, workers=workers)
+        print(f"📊 Références : {pages} pages en {time.perf_counter() - t0:.1f} s")
+        results, timings = check(golden, report, workers=workers)
+        statuses = {s: sum(r['status'] == s for r in results) for s in STATUS_COLORS}
+        print(f"   ⏱️ vérification : construction {timings['build']:.1f} s, "
+              f"comparaison {timings['compare']:.2f} s — {statuses}")
+        # Page altérée dans la référence : le chemin lent (différence pixel à pixel) doit la trouver
+        target = os.path.join(golden, 'en', 'p002.png')
+        img = np.array(Image.open(target))
+        img[100:110, 100:160] = 0
+        Image.fromarray(img).save(target)
+        with open(os.path.join(golden, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest['pages']['en']['2'] = digest(img)
+        atomic_write(os.path.join(golden, 'manifest.json'), json.dumps(manifest).encode())
+        blocks = np.load(_blocks_path(golden, 'en'))
+        blocks[1] = block_hash(img)
+        np.save(_blocks_path(golden, 'en'), blocks)
+        results, timings = check(golden, report, workers=workers)
+        found = [(r['locale'], r['page'], r['status']) for r in results if r['status'] == 'différente']
+        print(f"   🔎 page altérée détectée : {found}, comparaison {timings['compare']:.2f} s")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['benchmark']:
+        benchmark(*map(int, sys.argv[2:3]))
+        sys.exit()
+    parser = argparse.ArgumentParser(description="Régression visuelle des livres EN / FR")
+    parser.add_argument('command', choices=('check', 'update'))
+    parser.add_argument('--golden', default=GOLDEN_DIR, help="images de référence + manifest.json")
+    parser.add_argument('--report', default='visual_report', help="rapport HTML (check)")
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    if args.command == 'update':
+        pages = update_golden(args.golden, workers=args.workers)
+        print(f"✅ Références mises à jour : {pages} pages en {time.perf_counter() - t0:.1f} s")
+        sys.exit()
+    results, timings = check(args.golden, args.report, workers=args.workers)
+    failed = [r for r in results if r['status'] not in ('identique', 'équivalente')]
+    for r in failed:
+        print(f"❌ {r['locale'].upper()} page {r['page']} : {r['status']}"
+              + (f" — {_changed(r)}" if 'changed' in r else ''))
+    print(f"{'❌' if failed else '✅'} {len(results)} pages vérifiées en {time.perf_counter() - t0:.1f} s, "
+          f"{len(failed)} différentes — {os.path.join(args.report, 'index.html')}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Elo Booster - Pool de workers pré-forkés
+Le parent paie une fois ce que chaque nouveau processus paierait avant de dessiner : imports
+(reportlab, svglib, chess, numpy), métriques des polices, corpus validé, atlas d'échiquiers,
+échiquiers du corpus, mesures de texte et listes d'affichage en mémoire. Il forke ensuite les
+workers, qui héritent de tout en copie sur écriture (gc.freeze évite que le ramasse-miettes ne
+recopie les pages). Les tableaux volumineux (fonds, sprites et cases des atlas, pixels des
+échiquiers) sont rangés dans un segment multiprocessing.shared_memory : les workers les lisent
+en vues NumPy sans copie, et un processus non forké peut s'y attacher par son nom.
+"""
+import gc, importlib, io, os, subprocess, sys, time
+import multiprocessing
+from contextlib import redirect_stdout
+from multiprocessing import shared_memory
+import numpy as np
+from reportlab.pdfbase import pdfmetrics
+from display_list import Recorder
+from page_geometry import GEOMETRIES
+from pdf_output import RawImage
+from shard_build import LOCALES
+
+FONTS = ('Helvetica', 'Helvetica-Bold', 'Helvetica-Oblique', 'Helvetica-BoldOblique')
+ALIGN = 64
+
+
+class SharedArrays:
+    """Tableaux NumPy en lecture seule regroupés dans un segment shared_memory.
+    index : clé → (offset, forme, dtype), suffisant pour s'attacher depuis un autre processus"""
+
+    def __init__(self, arrays=None, name=None, index=None):
+        if name:
+            self.shm, self.index = shared_memory.SharedMemory(name=name), index
+        else:
+            self.index, size = {}, 0
+            for key, array in arrays.items():
+                self.index[key] = (size, array.shape, array.dtype.str)
+                size += -(-array.nbytes // ALIGN) * ALIGN
+            self.shm = shared_memory.SharedMemory(create=True, size=max(size, ALIGN))
+        self.owner = not name
+        self.views = {}
+        for key, (offset, shape, dtype) in self.index.items():
+            view = np.ndarray(shape, dtype, buffer=self.shm.buf, offset=offset)
+            if self.owner:
+                view[...] = arrays[key]
+            view.flags.writeable = False
+            self.views[key] = view
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def size(self):
+        return self.shm.size
+
+    def unlink(self):
+        """Retire le nom du segment ; la projection reste valide tant que les objets préchargés
+        pointent dessus (la fermer sous des vues encore vivantes provoquerait une erreur mémoire)"""
+        if self.owner:
+            self.shm.unlink()
+
+
+# === PRÉCHARGEMENT (parent) ===
+_warm = {}        # script → (module, prototype, openings, data_dir)
+_options = {}
+
+
+def _preload(jobs, formats, options):
+    """Corpus, échiquiers, mesures de texte et listes d'affichage de chaque script, dans le parent"""
+    for font in FONTS:
+        pdfmetrics.getFont(font)
+    raster = None
+    for script, data_dir in jobs:
+        module = importlib.import_module(script)
+        openings = module.load_all_openings(data_dir)
+        proto = module.EloBoosterPremium(os.devnull, optimize=False, **options)
+        raster = proto.raster = raster or proto.raster      # un seul jeu d'atlas pour les langues
+        proto.c = Recorder()
+        for op in openings:
+            proto.draw_opening(op)           # échiquiers et mesures de texte, même si la fiche est en cache
+        for name in formats:
+            pdf = module.EloBoosterPremium(os.devnull, optimize=False, geometry=name, shared=proto, **options)
+            pdf.c = Recorder()
+            for op in openings:
+                pdf.generate_opening(op)     # listes d'affichage lues ou enregistrées, gardées en mémoire
+        for image in proto.boards.values():
+            if isinstance(image, RawImage):
+                image.stream()               # aucun Future en cours au moment du fork
+        _warm[script] = (module, proto, openings, data_dir)
+    _options.update(options)
+
+
+def _share_arrays():
+    """Déplace atlas et pixels des échiquiers dans un segment partagé ; les objets pointent sur les vues"""
+    arrays = {}
+    atlases = {id(atlas): atlas for _, proto, _, _ in _warm.values() if proto.raster
+               for atlas in proto.raster.atlases.values()}
+    for atlas in atlases.values():
+        arrays[(id(atlas), 'base')] = atlas.base
+        for symbol, sprite in atlas.sprites.items():
+            arrays[(id(atlas), 'premul', symbol)], arrays[(id(atlas), 'alpha', symbol)] = sprite
+        for key, tile in atlas.tiles.items():
+            arrays[(id(atlas), 'tile', key)] = tile
+    images = {image.name: image for _, proto, _, _ in _warm.values() for image in proto.boards.values()
+              if isinstance(image, RawImage) and image.pixels is not None}
+    for name, image in images.items():
+        arrays[('board', name)] = np.frombuffer(image.pixels, np.uint8)
+
+    shared = SharedArrays(arrays)
+    views = shared.views
+    for atlas in atlases.values():
+        atlas.base = views[(id(atlas), 'base')]
+        atlas.sprites = {s: (views[(id(atlas), 'premul', s)], views[(id(atlas), 'alpha', s)]) for s in atlas.sprites}
+        atlas.tiles = {key: views[(id(atlas), 'tile', key)] for key in atlas.tiles}
+    for name, image in images.items():
+        image.pixels = views[('board', name)].data
+    return shared
+
+
+# === TÂCHES (workers) ===
+def _build(script, geometry, output, optimize, submitted):
+    started = time.time()
+    module, proto, openings, data_dir = _warm[script]
+    pdf = module.EloBoosterPremium(output, optimize=optimize, geometry=geometry, shared=proto, **_options)
+    with redirect_stdout(io.StringIO()):
+        pdf.generate_complete(data_dir, openings=openings)
+    return {'output': output, 'pages': pdf.page_num, 'pid': os.getpid(),
+            'startup': started - submitted, 'seconds': time.time() - started}
+
+
+class WarmPool:
+    """Pool de processus forkés après préchargement ; build() retourne un AsyncResult"""
+
+    def __init__(self, jobs=LOCALES, formats=tuple(GEOMETRIES), workers=None, **options):
+        t0 = time.perf_counter()
+        _preload(jobs, formats, options)
+        self.shared = _share_arrays()
+        self.preload_seconds = time.perf_counter() - t0
+        gc.collect()
+        gc.freeze()                          # objets préchargés hors du ramasse-miettes des enfants
+        self.pool = multiprocessing.get_context('fork').Pool(workers or os.cpu_count())
+
+    def build(self, script, geometry='a4', output=None, optimize=True):
+        module = _warm[script][0]
+        output = output or GEOMETRIES[geometry].output_path(module.OUTPUT_PDF)
+        return self.pool.apply_async(_build, (script, geometry, output, optimize, time.time()))
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.shared.unlink()
+        gc.unfreeze()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_all(workers=None, **options):
+    """Tous les PDF (langues × formats) sur un pool chaud"""
+    with WarmPool(workers=workers, **options) as pool:
+        print(f"♟️ Préchargement {pool.preload_seconds:.1f} s, {pool.shared.size / 1e6:.1f} Mo partagés")
+        results = [pool.build(script, name) for script, _ in LOCALES for name in GEOMETRIES]
+        for result in results:
+            r = result.get()
+            print(f"   ✅ {r['output']} : {r['pages']} pages en {r['seconds']:.1f} s (worker {r['pid']})")
+
+
+_COLD = """
+import os, generate_en
+generate_en.EloBoosterPremium(os.devnull, optimize=False).generate_complete('data_en')
+"""
+
+
+def benchmark(workers=2):
+    """Latence de démarrage d'un job : nouveau processus vs pool chaud"""
+    t0 = time.time()
+    out = subprocess.run([sys.executable, '-c', 'import generate_en, time; print(time.time())'],
+                         capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    cold_ready = float(out.stdout.split()[-1]) - t0
+    t0 = time.time()
+    subprocess.run([sys.executable, '-c', _COLD], capture_output=True,
+                   cwd=os.path.dirname(os.path.abspath(__file__)))
+    cold = time.time() - t0
+    with WarmPool(jobs=LOCALES[:1], formats=('a4',), workers=workers) as pool:
+        runs = [pool.build('generate_en', 'a4', os.devnull, optimize=False).get() for _ in range(5)]
+        print(f"📊 Préchargement du parent : {pool.preload_seconds:.2f} s, "
+              f"{pool.shared.size / 1e6:.1f} Mo en mémoire partagée ({len(pool.shared.views)} tableaux)")
+    print(f"   ⏱️ nouveau processus : {cold_ready * 1000:.0f} ms avant de pouvoir dessiner (imports seuls), "
+          f"{cold:.2f} s pour le PDF EN")
+    startup = sorted(r['startup'] for r in runs)
+    print(f"   ⏱️ pool chaud : démarrage médian {startup[len(startup) // 2] * 1000:.1f} ms, "
+          f"PDF EN en {min(r['seconds'] for r in runs):.2f} s")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['build']:
+        build_all(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    else:
+        benchmark(*map(int, sys.argv[1:2]))